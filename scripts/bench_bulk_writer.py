@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark: per-file upsert_file() vs. the batched BulkWriter session.
+
+Generates a synthetic corpus of CMMEntity trees (no files on disk, hashes are
+supplied) and writes it to fresh databases through both paths.
+
+Usage:
+    python scripts/bench_bulk_writer.py [--files 10000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from domain import CMMEntity
+from storage import SQLiteStorage
+
+
+def make_file_entity(index: int) -> CMMEntity:
+    """A module-sized tree: 2 classes x 5 methods plus 5 functions."""
+    entities = []
+    for c in range(2):
+        methods = [
+            {
+                "name": f"method_{m}",
+                "type": "function",
+                "visibility": "public",
+                "docstring": f'"""Method {m}."""',
+                "cmm_type": "Method",
+                "method_kind": "instance",
+                "line_start": 10 * c + m,
+                "line_end": 10 * c + m + 1,
+                "dependencies": [
+                    {"name": f"helper_{(m + k) % 5}", "rel_type": "calls"}
+                    for k in range(3)
+                ],
+            }
+            for m in range(5)
+        ]
+        entities.append(
+            {
+                "name": f"Class{index}_{c}",
+                "type": "class",
+                "visibility": "public",
+                "docstring": f'"""Class {c}."""',
+                "cmm_type": "Class",
+                "dependencies": [{"name": "Base", "rel_type": "inherits"}],
+                "methods": methods,
+            }
+        )
+    for f in range(5):
+        entities.append(
+            {
+                "name": f"helper_{f}",
+                "type": "function",
+                "visibility": "public",
+                "cmm_type": "Method",
+                "dependencies": [{"name": "Class0_0", "rel_type": "calls"}],
+            }
+        )
+    return CMMEntity(schema_version="v0.3", entities=entities)
+
+
+def bench_per_file(db_path: str, corpus) -> float:
+    storage = SQLiteStorage(db_path)
+    start = time.perf_counter()
+    for file_path, cmm_entity in corpus:
+        storage.upsert_file(file_path, cmm_entity, file_hash=file_path)
+    return time.perf_counter() - start
+
+
+def bench_bulk(db_path: str, corpus) -> float:
+    storage = SQLiteStorage(db_path)
+    start = time.perf_counter()
+    with storage.bulk_writer() as writer:
+        for file_path, cmm_entity in corpus:
+            writer.upsert_file(file_path, cmm_entity, file_hash=file_path)
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--files", type=int, default=10000)
+    args = arg_parser.parse_args()
+
+    corpus = [(f"/corpus/pkg/module_{i}.py", make_file_entity(i)) for i in range(args.files)]
+    print(f"Corpus: {args.files} files, 17 entities and 37 relations per file")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        per_file = bench_per_file(os.path.join(tmpdir, "per_file.db"), corpus)
+        bulk = bench_bulk(os.path.join(tmpdir, "bulk.db"), corpus)
+
+    print(f"  per-file upsert_file: {per_file:8.2f}s  ({args.files / per_file:8.0f} files/s)")
+    print(f"  BulkWriter session:   {bulk:8.2f}s  ({args.files / bulk:8.0f} files/s)")
+    print(f"  speedup: {per_file / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
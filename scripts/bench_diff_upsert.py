@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark: entity-level diff upsert vs. delete-and-reinsert of a changed file.
+
+Stores one large synthetic module, then re-writes it after editing a single
+function (once without and once with a line shift below the edit) and
+reports rows written and WAL growth for both strategies.
+
+Usage:
+    python scripts/bench_diff_upsert.py [--functions 300]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from connection import connect
+from domain import CMMEntity
+from storage import SQLiteStorage
+
+FILE_PATH = "/corpus/pkg/big_module.py"
+
+
+def make_module(functions: int, edited: int, docstring: str, shift: int) -> CMMEntity:
+    """A module of classes with 10 methods each; lines after `edited` move by `shift`."""
+    classes = []
+    for c in range(functions // 10):
+        methods = []
+        for m in range(10):
+            index = 10 * c + m
+            line = 10 * index + (shift if index > edited else 0)
+            methods.append(
+                {
+                    "name": f"method_{m}",
+                    "type": "function",
+                    "visibility": "public",
+                    "docstring": docstring if index == edited else f'"""Method {index}."""',
+                    "cmm_type": "Method",
+                    "method_kind": "instance",
+                    "line_start": line,
+                    "line_end": line + 8,
+                    "dependencies": [
+                        {"name": f"method_{(m + k) % 10}", "rel_type": "calls"}
+                        for k in range(1, 4)
+                    ],
+                }
+            )
+        classes.append(
+            {
+                "name": f"Class{c}",
+                "type": "class",
+                "visibility": "public",
+                "cmm_type": "Class",
+                "line_start": 100 * c,
+                "line_end": 100 * c + 99 + shift,
+                "methods": methods,
+            }
+        )
+    return CMMEntity(schema_version="v0.3", entities=classes)
+
+
+def full_rewrite(storage: SQLiteStorage, cursor, cmm: CMMEntity, file_hash: str):
+    """The previous strategy: drop every entity of the file and insert again."""
+    cursor.execute(
+        "UPDATE files SET file_hash = ?, updated_at = ? WHERE file_path = ?",
+        (file_hash, datetime.now().isoformat(), FILE_PATH),
+    )
+    cursor.execute(
+        "DELETE FROM entities WHERE id IN (SELECT entity_id FROM metadata WHERE file_path = ?)",
+        (FILE_PATH,),
+    )
+    rows = storage._collect_file_rows(cmm.entities, FILE_PATH)
+    storage._insert_entities(cursor, rows, FILE_PATH, datetime.now().isoformat())
+
+
+def run(strategy: str, functions: int, shift: int, tmpdir: str):
+    db_path = os.path.join(tmpdir, f"{strategy}_{shift}.db")
+    storage = SQLiteStorage(db_path)
+    storage.upsert_file(FILE_PATH, make_module(functions, 42, "old", 0), file_hash="h1")
+
+    conn = connect(db_path, "interactive")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")  # Keep the WAL for measuring
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA foreign_keys = ON")
+    edited = make_module(functions, 42, "new", shift)
+    cursor = conn.cursor()
+    if strategy == "diff":
+        storage._write_file(cursor, FILE_PATH, edited, "h2", None)
+    else:
+        full_rewrite(storage, cursor, edited, "h2")
+    conn.commit()
+    wal_size = os.path.getsize(db_path + "-wal")
+    changes = conn.total_changes
+    conn.close()
+    return changes, wal_size
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--functions", type=int, default=300)
+    args = arg_parser.parse_args()
+
+    print(f"Module: {args.functions} methods in {args.functions // 10} classes, one docstring edited")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for shift, label in ((0, "in-place edit"), (3, "edit adding 3 lines")):
+            print(f"  {label}:")
+            for strategy in ("rewrite", "diff"):
+                changes, wal_size = run(strategy, args.functions, shift, tmpdir)
+                print(f"    {strategy:<8} {changes:6d} rows written  WAL {wal_size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Benchmark: UUID text entity keys (v0.4.1) vs. integer entity keys (v0.5).
+
+Builds a synthetic corpus in the v0.4.1 layout, copies the database and
+upgrades the copy in place to v0.5, then compares database size and the
+latency of the join-heavy queries (get_hierarchical_structure,
+resolve_dependencies) on both.
+
+Usage:
+    python scripts/bench_entity_ids.py [--files 2000] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_bulk_writer import make_file_entity
+from resolver import DependencyResolver
+from schema import SchemaManager
+from storage import SQLiteStorage
+
+
+class _StorageAsIs(SQLiteStorage):
+    """Query a database without upgrading its schema first."""
+
+    def _init_db(self):
+        pass
+
+
+def build_uuid_database(db_path: str, files: int):
+    """Write the corpus with the v0.4.1 layout (UUID text keys)."""
+    SchemaManager(db_path).upgrade(target=2)
+    conn = sqlite3.connect(db_path)
+    now = "2026-01-01T00:00:00"
+    ids_by_name = {}
+    entities, metadata, relations = [], [], []
+
+    def collect(entity, file_path, parent_id):
+        entity_id = str(uuid.uuid4())
+        ids_by_name.setdefault(entity["name"], entity_id)
+        entities.append(
+            (
+                entity_id,
+                entity["name"],
+                entity["type"],
+                entity["visibility"],
+                parent_id,
+                entity.get("line_start", 0),
+                entity.get("line_end", 0),
+            )
+        )
+        metadata.append(
+            (entity_id, file_path, entity.get("docstring"), entity["cmm_type"], now, now)
+        )
+        for dep in {(d["name"], d["rel_type"]) for d in entity["dependencies"]}:
+            relations.append((entity_id, *dep))
+        for method in entity.get("methods", []):
+            collect(method, file_path, entity_id)
+
+    for i in range(files):
+        file_path = f"/corpus/pkg/module_{i}.py"
+        conn.execute(
+            "INSERT INTO files (file_path, file_hash, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (file_path, file_path, now, now),
+        )
+        for entity in make_file_entity(i).entities:
+            collect(entity, file_path, None)
+
+    conn.executemany(
+        "INSERT INTO entities (id, name, type, visibility, parent_id, line_start, line_end) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        entities,
+    )
+    conn.executemany(
+        "INSERT INTO metadata (entity_id, file_path, raw_docstring, cmm_type, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        metadata,
+    )
+    # Every relation resolved and verified, as after a full LSP pass
+    conn.executemany(
+        "INSERT INTO relations (from_id, to_id, to_name, rel_type, is_verified) "
+        "VALUES (?, ?, ?, ?, 1)",
+        [(f, ids_by_name.get(name), name, rel) for f, name, rel in relations],
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def measure(db_path: str, files: int, repeat: int):
+    """Return (size bytes, structure seconds, resolve seconds) for a database."""
+    storage = _StorageAsIs(db_path)
+    resolver = DependencyResolver(db_path)
+    sample = [f"/corpus/pkg/module_{i}.py" for i in range(0, files, max(1, files // 50))]
+
+    structure = resolve = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        storage.get_hierarchical_structure()
+        structure = min(structure, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for file_path in sample:
+            resolver.resolve_dependencies(file_path)
+        resolve = min(resolve, (time.perf_counter() - start) / len(sample))
+
+    return os.path.getsize(db_path), structure, resolve
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--files", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        uuid_db = os.path.join(tmpdir, "uuid.db")
+        int_db = os.path.join(tmpdir, "int.db")
+        build_uuid_database(uuid_db, args.files)
+        shutil.copy2(uuid_db, int_db)
+
+        start = time.perf_counter()
+        SchemaManager(int_db).upgrade()
+        migrate = time.perf_counter() - start
+        conn = sqlite3.connect(int_db)
+        conn.execute("VACUUM")
+        conn.close()
+
+        rows = [
+            ("UUID text keys (v0.4.1)", *measure(uuid_db, args.files, args.repeat)),
+            ("integer keys (v0.5)", *measure(int_db, args.files, args.repeat)),
+        ]
+
+    print(f"Corpus: {args.files} files, 17 entities and 37 relations per file")
+    print(f"In-place migration: {migrate:.2f}s")
+    print(f"  {'layout':<24} {'size':>10} {'structure':>11} {'resolve/file':>13}")
+    for label, size, structure, resolve in rows:
+        print(
+            f"  {label:<24} {size / 1e6:8.1f}MB {structure * 1e3:9.1f}ms "
+            f"{resolve * 1e3:11.2f}ms"
+        )
+    (_, size_a, struct_a, resolve_a), (_, size_b, struct_b, resolve_b) = rows
+    print(
+        f"  ratio: size {size_b / size_a:.2f}x, structure {struct_b / struct_a:.2f}x, "
+        f"resolve {resolve_b / resolve_a:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Benchmark: byte-at-a-time LSP header parsing vs. the buffered MessageReader.
+
+Records the raw stdout of a Pyright session (initialize, then didOpen plus a
+definition and hover request for every call site of a workspace) to a
+transcript file, then replays that transcript through both readers from an
+in-memory stream and reports messages/s and MB/s.
+
+Usage:
+    python scripts/bench_lsp_framing.py [--workspace src] [--repeat 5]
+    python scripts/bench_lsp_framing.py --transcript lsp.bin   # record once, then replay
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from lsp_client import LSPClient, MessageReader
+from parser import TreeSitterParser
+
+
+class _TeeStream:
+    """Binary stream wrapper that records every byte read through it."""
+
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+
+    def readline(self):
+        data = self.stream.readline()
+        self.sink.write(data)
+        return data
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+
+class _RecordingClient(LSPClient):
+    """LSPClient that copies the server's stdout to a transcript file."""
+
+    def __init__(self, workspace_root: str, sink):
+        super().__init__(workspace_root)
+        self.sink = sink
+
+    def _attach(self, process):
+        process.stdout = _TeeStream(process.stdout, self.sink)
+        super()._attach(process)
+
+
+def legacy_read_body(stream):
+    """The previous framing: headers read byte by byte into a growing bytes."""
+    headers = b""
+    while not headers.endswith(b"\r\n\r\n"):
+        byte = stream.read(1)
+        if not byte:
+            return None
+        headers += byte
+
+    length = None
+    for line in headers.decode("utf-8").split("\r\n"):
+        if line.startswith("Content-Length:"):
+            length = int(line.split(":")[1].strip())
+            break
+
+    if length is None:
+        return None
+
+    return stream.read(length)
+
+
+def legacy_read_message(stream):
+    """The previous reader: legacy framing, body decoded before parsing."""
+    body = legacy_read_body(stream)
+    return json.loads(body.decode("utf-8")) if body is not None else None
+
+
+def record_transcript(workspace: Path, transcript: Path):
+    """Run Pyright over a workspace and save everything it wrote to stdout."""
+    parser = TreeSitterParser()
+    with open(transcript, "wb") as sink:
+        client = _RecordingClient(str(workspace.absolute()), sink)
+        if not client.start():
+            sys.exit("Pyright is not available; pass --transcript to replay a recording")
+        try:
+            for py_file in sorted(workspace.rglob("*.py")):
+                file_path = str(py_file.absolute())
+                uri = f"file://{file_path}"
+                client.open_document(uri, py_file.read_text(encoding="utf-8"))
+                positions = [
+                    (uri, site.line, site.character)
+                    for site in parser.extract_call_sites(file_path)
+                ]
+                client.get_definitions(positions)
+                client.get_hovers(positions)
+        finally:
+            client.shutdown()
+
+
+def replay(data: bytes, read_message, repeat: int):
+    """Return (messages, best seconds) for reading every message in data."""
+    best = float("inf")
+    for _ in range(repeat):
+        stream = io.BufferedReader(io.BytesIO(data))
+        messages = 0
+        start = time.perf_counter()
+        while read_message(stream) is not None:
+            messages += 1
+        best = min(best, time.perf_counter() - start)
+    return messages, best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--workspace", default=str(Path(__file__).parent.parent / "src"))
+    arg_parser.add_argument(
+        "--transcript", help="Recording to replay (recorded and kept if missing)"
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    transcript = Path(args.transcript or "lsp_transcript.bin")
+    if not transcript.exists():
+        print(f"Recording Pyright session over {args.workspace} ...")
+        record_transcript(Path(args.workspace), transcript)
+    data = transcript.read_bytes()
+
+    print(f"Transcript: {len(data) / 1e6:.1f} MB ({transcript})")
+    print(f"  {'reader':<28} {'messages':>9} {'time':>9} {'msg/s':>10} {'MB/s':>8}")
+    for stage, legacy_reader, buffered_reader in (
+        ("framing", legacy_read_body, lambda s: MessageReader(s).read_body()),
+        ("framing+json", legacy_read_message, lambda s: MessageReader(s).read_message()),
+    ):
+        rows = [
+            (f"byte-at-a-time {stage}", *replay(data, legacy_reader, args.repeat)),
+            (f"MessageReader {stage}", *replay(data, buffered_reader, args.repeat)),
+        ]
+        for label, messages, seconds in rows:
+            print(
+                f"  {label:<28} {messages:>9} {seconds * 1e3:7.1f}ms "
+                f"{messages / seconds:>10.0f} {len(data) / seconds / 1e6:>8.1f}"
+            )
+        (_, _, legacy), (_, _, buffered) = rows
+        print(f"  {stage} speedup: {legacy / buffered:.1f}x")
+
+    if not args.transcript:
+        os.remove(transcript)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark: per-call-site definition lookups vs. call hierarchy outgoing calls.
+
+Runs a full `parser scan --enable-lsp` over the same corpus once per
+--lsp-strategy, each into a fresh database, and reports the LSP requests
+sent, the wall time and whether both runs verified the same relations.
+
+Usage:
+    python scripts/bench_lsp_strategy.py [--workspace src] [--repeat 3]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CLI = Path(__file__).parent.parent / "src" / "cli.py"
+STRATEGIES = ("definition", "call-hierarchy")
+
+
+def verified_relations(db_path: str) -> set:
+    """(caller, callee) names of every verified relation."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        """
+        SELECT f.name, t.name FROM relations r
+        JOIN entities f ON r.from_id = f.id
+        JOIN entities t ON r.to_id = t.id
+        WHERE r.is_verified = 1
+    """
+    ).fetchall()
+    conn.close()
+    return set(rows)
+
+
+def run_scan(workspace: str, strategy: str, db_path: str):
+    """Return (requests sent, seconds, verified relations) of one cold scan."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(CLI),
+            "parser",
+            "scan",
+            workspace,
+            "--db-path",
+            db_path,
+            "--enable-lsp",
+            "--lsp-strategy",
+            strategy,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = time.perf_counter() - start
+    match = re.search(r"(\d+) LSP request\(s\) sent", result.stdout)
+    if not match:
+        sys.exit(f"No LSP statistics in output (is Pyright installed?):\n{result.stdout}")
+    return int(match.group(1)), seconds, verified_relations(db_path)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--workspace", default=str(Path(__file__).parent.parent / "src"))
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    best = {strategy: float("inf") for strategy in STRATEGIES}
+    requests, relations = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.repeat):
+            # Alternate the order so neither strategy always runs on a warm OS cache
+            for strategy in STRATEGIES if run % 2 == 0 else reversed(STRATEGIES):
+                db_path = os.path.join(tmp, f"{strategy}-{run}.db")
+                sent, seconds, verified = run_scan(args.workspace, strategy, db_path)
+                best[strategy] = min(best[strategy], seconds)
+                requests[strategy], relations[strategy] = sent, verified
+
+    print(f"Workspace: {args.workspace} (best of {args.repeat} cold scans)")
+    print(f"  {'strategy':<16} {'requests':>9} {'wall time':>10} {'relations':>10}")
+    for strategy in STRATEGIES:
+        print(
+            f"  {strategy:<16} {requests[strategy]:>9} {best[strategy]:>9.1f}s "
+            f"{len(relations[strategy]):>10}"
+        )
+    only_definition = relations["definition"] - relations["call-hierarchy"]
+    only_hierarchy = relations["call-hierarchy"] - relations["definition"]
+    print(
+        f"  relations only found per site: {len(only_definition)}, "
+        f"only via call hierarchy: {len(only_hierarchy)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,51 @@
 import typer
 import json
-import shutil
 import os
+import queue
+import random
+import re
+import threading
+import time
 import traceback
 from pathlib import Path
-from typing import Dict
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 from rich.tree import Tree
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
-from parser import TreeSitterParser
-from storage import SQLiteStorage
+from parser import TreeSitterParser, scan_files_parallel
+from connection import connect
+from storage import BulkWriter, SQLiteStorage, compute_content_hash
+from schema import (
+    SchemaManager,
+    SchemaVersionError,
+    label_for_version,
+    version_for_label,
+    SCHEMA_VERSION,
+)
 from resolver import DependencyResolver
-from lsp_client import LSPClient
+from lsp_client import (
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_OPEN_DOCUMENTS,
+    DEFAULT_MAX_TIMEOUTS,
+    DEFAULT_READY_TIMEOUT,
+    DEFAULT_REQUEST_TIMEOUT,
+    NO_ANSWER,
+    LSPClient,
+    Location,
+    Position,
+    TypeInfo,
+)
 from symbol_mapper import SymbolMapper
-from domain import CallSite
+from domain import CallSite, ScanResult, SourceFile
 from reporting import MarkdownIntentAdapter
-import time
 
 # Constants
 MAX_TYPE_HINT_DISPLAY_LENGTH = 50
+SCHEMA_LABEL = label_for_version(SCHEMA_VERSION)
+# Pass 2 call site resolution: per site, or per function via call hierarchy
+LSP_STRATEGIES = ("definition", "call-hierarchy")
 
 app = typer.Typer(help="Root CLI for CMM tools.")
 parser_app = typer.Typer(help="Tools for parsing source code into CMM entities.")
@@ -86,92 +112,264 @@ def _find_python_files(directory_path: Path) -> list[Path]:
     return python_files
 
 
+def _iter_changed_sources(
+    python_files: list[Path],
+    storage: SQLiteStorage,
+    writer: BulkWriter,
+    verify_hash: bool,
+    counts: Dict[str, int],
+) -> Iterator[Tuple[Path, Optional[SourceFile], Optional[str], Optional[str]]]:
+    """
+    Load each file that changed since it was last stored, reading it once.
+
+    A file whose mtime, size and inode match the stored values is trusted
+    without being read. Otherwise (or always, with verify_hash) its bytes are
+    loaded and hashed once; the same bytes are later parsed and sent to the
+    LSP, and the hash is stored with them. Unchanged files are counted in
+    counts["skipped"].
+
+    Yields:
+        (py_file, source, file_hash, error) tuples; error holds a traceback
+        if the file could not be read.
+    """
+    stored_states = storage.get_file_states()
+    touched: list[Tuple[str, os.stat_result]] = []
+
+    for py_file in python_files:
+        file_path = str(py_file.absolute())
+        stored = stored_states.get(file_path)
+        try:
+            if stored and not verify_hash and stored.matches_stat(os.stat(file_path)):
+                counts["skipped"] += 1
+                continue
+            source = SourceFile.read(file_path)
+        except OSError:
+            yield py_file, None, None, traceback.format_exc()
+            continue
+
+        file_hash = compute_content_hash(source.content)
+        if stored and stored.file_hash == file_hash:
+            counts["skipped"] += 1
+            if not stored.matches_stat(source.stat):
+                touched.append((file_path, source.stat))
+            continue
+
+        yield py_file, source, file_hash, None
+
+    writer.update_file_stats(touched)
+
+
+def _iter_parsed_files(
+    sources: Iterable[Tuple[Path, Optional[SourceFile], Optional[str], Optional[str]]],
+    parser: TreeSitterParser,
+    workers: int,
+    with_call_sites: bool,
+) -> Iterator[
+    Tuple[Path, Optional[SourceFile], Optional[str], Optional[ScanResult], Optional[str]]
+]:
+    """
+    Parse loaded files serially or across a process pool.
+
+    Yields (py_file, source, file_hash, scan_result, error), passing the
+    hash from _iter_changed_sources through. Parsed files come back in
+    discovery order either way, so the single writer in Pass 1 produces the
+    same database as a serial scan.
+    """
+    if workers <= 1:
+        return _parse_serially(sources, parser, with_call_sites)
+    return _parse_in_pool(sources, workers, with_call_sites)
+
+
+def _parse_serially(
+    sources: Iterable[Tuple[Path, Optional[SourceFile], Optional[str], Optional[str]]],
+    parser: TreeSitterParser,
+    with_call_sites: bool,
+) -> Iterator[
+    Tuple[Path, Optional[SourceFile], Optional[str], Optional[ScanResult], Optional[str]]
+]:
+    """Parse loaded files one by one in this process (see _iter_parsed_files)."""
+    for py_file, source, file_hash, error in sources:
+        if error is not None:
+            yield py_file, source, file_hash, None, error
+            continue
+        try:
+            if with_call_sites:
+                scan_result = parser.scan_file_with_call_sites(
+                    source.path, source.content
+                )
+            else:
+                scan_result = ScanResult(
+                    cmm_entity=parser.scan_file(source.path, source.content)
+                )
+            yield py_file, source, file_hash, scan_result, None
+        except Exception:
+            yield py_file, source, file_hash, None, traceback.format_exc()
+
+
+def _parse_in_pool(
+    sources: Iterable[Tuple[Path, Optional[SourceFile], Optional[str], Optional[str]]],
+    workers: int,
+    with_call_sites: bool,
+) -> Iterator[
+    Tuple[Path, Optional[SourceFile], Optional[str], Optional[ScanResult], Optional[str]]
+]:
+    """Parse loaded files across a process pool (see _iter_parsed_files)."""
+    # Read errors bypass the pool; in-flight files are matched back by path
+    read_errors: deque = deque()
+    in_flight: Dict[str, Tuple[Path, SourceFile, str]] = {}
+
+    def readable_sources() -> Iterator[Tuple[str, bytes]]:
+        for py_file, source, file_hash, error in sources:
+            if error is not None:
+                read_errors.append((py_file, error))
+                continue
+            in_flight[source.path] = (py_file, source, file_hash)
+            yield source.path, source.content
+
+    for file_path, scan_result, error in scan_files_parallel(
+        readable_sources(), workers, with_call_sites
+    ):
+        while read_errors:
+            failed_file, read_error = read_errors.popleft()
+            yield failed_file, None, None, None, read_error
+        py_file, source, file_hash = in_flight.pop(file_path)
+        yield py_file, source, file_hash, scan_result, error
+
+    while read_errors:
+        py_file, error = read_errors.popleft()
+        yield py_file, None, None, None, error
+
+
 def _run_syntax_scan(
     python_files: list[Path],
     directory_path: Path,
     parser: TreeSitterParser,
     storage: SQLiteStorage,
     verbose: bool,
-) -> int:
-    """Pass 1: Syntax scan using Tree-sitter."""
+    workers: int = 1,
+    keep_sources: bool = False,
+    verify_hash: bool = False,
+) -> Tuple[int, Dict[str, SourceFile]]:
+    """
+    Pass 1: Syntax scan using Tree-sitter.
+
+    Each changed file is read and parsed once; its entities and call sites
+    are stored together. With keep_sources, the loaded bytes are kept for
+    the LSP didOpen of Pass 2.
+
+    Returns:
+        Number of files with errors, and the loaded source of each parsed
+        file (empty unless keep_sources is set).
+    """
+    loaded_sources: Dict[str, SourceFile] = {}
+    counts = {"skipped": 0}
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         console=console,
-    ) as progress:
+    ) as progress, storage.bulk_writer() as writer:
         task = progress.add_task("Pass 1: Scanning syntax...", total=len(python_files))
 
         scanned = 0
         errors = 0
 
-        for py_file in python_files:
+        # Unchanged files are skipped before paying for a read or a parse
+        sources = _iter_changed_sources(
+            python_files, storage, writer, verify_hash, counts
+        )
+        for py_file, source, file_hash, scan_result, error in _iter_parsed_files(
+            sources, parser, workers, with_call_sites=True
+        ):
             file_path = str(py_file.absolute())
 
-            try:
-                if verbose:
-                    progress.console.print(
-                        f"  Parsing: {py_file.relative_to(directory_path)}"
-                    )
+            if verbose:
+                progress.console.print(
+                    f"  Parsing: {py_file.relative_to(directory_path)}"
+                )
 
-                cmm_entity = parser.scan_file(file_path)
-                storage.upsert_file(file_path, cmm_entity)
-                scanned += 1
+            if error is None:
+                try:
+                    writer.upsert_file(
+                        file_path,
+                        scan_result.cmm_entity,
+                        file_hash,
+                        source.stat,
+                        scan_result.call_sites,
+                    )
+                    if keep_sources:
+                        loaded_sources[file_path] = source
+                    scanned += 1
+                except Exception:
+                    error = traceback.format_exc()
 
-            except Exception as e:
+            if error is not None:
                 errors += 1
                 if verbose:
-                    traceback.print_exc()
+                    progress.console.print(error, markup=False)
                     progress.console.print(
-                        f"  [red]Error parsing {py_file.name}: {e}[/red]"
+                        f"  [red]Error parsing {py_file.name}: "
+                        f"{error.strip().splitlines()[-1]}[/red]"
                     )
 
             progress.advance(task)
 
+    skipped = counts["skipped"]
     console.print(f"\n[green]✓ Pass 1 complete: {scanned} file(s) scanned.[/green]")
+    if skipped > 0:
+        console.print(f"[dim]  {skipped} unchanged file(s) skipped.[/dim]")
     if errors > 0:
         console.print(f"[yellow]⚠ {errors} file(s) had errors.[/yellow]")
     
-    return errors
+    return errors, loaded_sources
 
 
 def _process_call_site(
     site: CallSite,
-    file_path: str,
-    lsp: LSPClient,
+    from_id: int,
+    def_loc: Optional[Location],
     symbol_mapper: SymbolMapper,
     storage: SQLiteStorage,
     verbose: bool,
     progress: Progress,
     stats: Dict[str, int],
-) -> None:
-    """Process a single call site for resolution."""
-    # 1. Who is calling?
-    from_id = symbol_mapper.find_enclosing_entity(file_path, site.line)
-    if not from_id:
-        return  # Call outside any entity (module-level)
-
-    # 2. What is defined there? (LSP)
-    def_loc = lsp.get_definition(site.file_uri, site.line, site.character)
+) -> Optional[int]:
+    """
+    Record the definition found for a call site of entity from_id.
+
+    Returns:
+        Id of the called entity, or None if the lookup failed or the
+        definition lies outside the scanned files
+    """
     if not def_loc:
         stats["failed"] += 1
         if verbose:
             progress.console.print(
                 f"  [yellow]LSP failed: {site.name} at {site.line}[/yellow]"
             )
-        return
+        return None
 
-    # 3. What UUID is that?
+    # Which entity is that?
     to_id = symbol_mapper.find_by_location(def_loc)
     if not to_id:
         stats["external"] += 1  # Definition outside scanned files
-        return
+        return None
 
-    # 4. Record verified relation
+    # Record verified relation
     storage.save_verified_relation(from_id, to_id, "calls", is_verified=True)
     stats["resolved"] += 1
+    return to_id
+
 
-    # 5. Capture type hint (Sprint 5.4)
-    type_info = lsp.get_hover(def_loc.uri, def_loc.line, 0)
+def _process_type_hint(
+    site: CallSite,
+    to_id: int,
+    type_info: Optional[TypeInfo],
+    storage: SQLiteStorage,
+    verbose: bool,
+    progress: Progress,
+) -> None:
+    """Store the hover signature of a called entity (Sprint 5.4)."""
     if type_info and type_info.signature:
         storage.save_type_hint(to_id, type_info.signature)
         if verbose:
@@ -184,79 +382,745 @@ def _process_call_site(
         )
 
 
+# Pass 2 counters, one set per LSP worker (see _print_resolution_statistics)
+_RESOLUTION_COUNTERS = (
+    "resolved",
+    "failed",
+    "unanswered",
+    "errors",
+    "external",
+    "skipped_sites",
+    "cached_definitions",
+    "hover_hits",
+    "hover_misses",
+    "requests",
+    "timeouts",
+    "restarts",
+    "triage_unique",
+    "triage_external",
+    "triage_ambiguous",
+    "audited",
+    "audit_agreed",
+)
+
+
+class _HoverCache:
+    """
+    Type hints known during a Pass 2 run, so each definition is hovered and
+    its hint written once however many call sites reach it.
+    """
+
+    def __init__(self, current_ids: Iterable[int] = ()):
+        """
+        Args:
+            current_ids: Entities whose stored hint is still current (see
+                SQLiteStorage.get_current_type_hint_ids); never hovered
+        """
+        self.current_ids = set(current_ids)
+        self.hovered: set = set()  # (definition URI, line)
+
+    def needs_hover(self, to_id: int, def_loc: Location) -> bool:
+        return (
+            to_id not in self.current_ids
+            and (def_loc.uri, def_loc.line) not in self.hovered
+        )
+
+    def add(self, to_id: int, def_loc: Location):
+        self.hovered.add((def_loc.uri, def_loc.line))
+        self.current_ids.add(to_id)
+
+
+class _Triage:
+    """
+    Pre-LSP classification of call sites by how many project entities carry
+    the callee's name (see DependencyResolver.get_name_index): "unique"
+    sites are linked to that entity as unverified relations, "external"
+    ones (no entity) skipped, "ambiguous" ones resolved by Pyright.
+    """
+
+    def __init__(self, name_index: Dict[str, list], audit_rate: float, seed: int = 0):
+        """
+        Args:
+            name_index: Entity ids per name
+            audit_rate: Fraction of unique sites looked up anyway to measure
+                the shortcut's accuracy
+            seed: Seed of the audit sample, so runs are reproducible
+        """
+        self.name_index = name_index
+        self.audit_rate = audit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # Shared by LSP workers
+
+    def classify(self, name: str) -> Tuple[str, Optional[int]]:
+        """Verdict for a callee name, with the target id of unique names."""
+        candidates = self.name_index.get(name, [])
+        if not candidates:
+            return "external", None
+        if len(candidates) == 1:
+            return "unique", candidates[0]
+        return "ambiguous", None
+
+    def should_audit(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.audit_rate
+
+    def needs_server(self, name: str) -> bool:
+        """False if a site of this callee is always settled without Pyright."""
+        verdict, _ = self.classify(name)
+        return verdict == "ambiguous" or (verdict == "unique" and self.audit_rate > 0)
+
+    def settle(
+        self,
+        misses: list[Tuple[int, CallSite]],
+        storage: SQLiteStorage,
+        stats: Dict[str, int],
+        can_audit: bool,
+    ) -> Tuple[list[Tuple[int, CallSite]], set, Dict[Tuple[int, int], int]]:
+        """
+        Settle the cache misses a callee name decides: unique names are
+        linked, external ones skipped. Verdicts are counted in stats.
+
+        Args:
+            misses: (enclosing entity id, call site) pairs without a cached
+                definition
+            can_audit: Whether a server is at hand to audit shortcuts
+
+        Returns:
+            The misses left to look up, the (line, character) of the sites
+            settled, and each audited site with its shortcut target
+        """
+        kept, settled, audited = [], set(), {}
+        for entity_id, site in misses:
+            key = (site.line, site.character)
+            verdict, to_id = self.classify(site.name)
+            stats[f"triage_{verdict}"] += 1
+            if verdict == "unique" and can_audit and self.should_audit():
+                audited[key] = to_id
+            elif verdict == "unique":
+                # A name match, not a Pyright answer: linked but unverified
+                storage.save_verified_relation(
+                    entity_id, to_id, "calls", is_verified=False
+                )
+                settled.add(key)
+                continue
+            elif verdict == "external":
+                settled.add(key)
+                continue
+            kept.append((entity_id, site))
+        return kept, settled, audited
+
+
+def _name_column(line_text: str, name: str) -> Optional[int]:
+    """Column of a def/class statement's name, or None if not on that line."""
+    match = re.search(rf"\b(?:def|class)\s+({re.escape(name)})\b", line_text)
+    return match.start(1) if match else None
+
+
+def _look_up_via_call_hierarchy(
+    lsp: LSPClient,
+    storage: SQLiteStorage,
+    file_path: str,
+    source: SourceFile,
+    sites: list[Tuple[int, CallSite]],
+) -> list[Optional[Location]]:
+    """
+    Resolve call sites with one prepareCallHierarchy and one outgoingCalls
+    request per enclosing function, instead of one definition per site.
+
+    Outgoing calls are matched to sites by their call position (Pyright
+    lists calls of nested functions under the outer one too; matching by
+    position keeps each under its innermost entity). Overloaded callees
+    are listed once per signature; the first one is kept, as with
+    textDocument/definition. Sites the hierarchy does not cover (class
+    bodies, calls it does not list) fall back to definition lookups.
+
+    Returns:
+        One Location (None if not found, NO_ANSWER if unanswered) per site,
+        in input order
+    """
+    file_uri = f"file://{file_path}"
+    entities = storage.get_entity_lines(file_path)
+    lines = source.text.splitlines()
+
+    functions: Dict[int, Position] = {}
+    for entity_id, _ in sites:
+        if entity_id in functions or entity_id not in entities:
+            continue
+        name, kind, line = entities[entity_id]
+        if kind == "function" and line < len(lines):
+            character = _name_column(lines[line], name)
+            if character is not None:
+                functions[entity_id] = (file_uri, line, character)
+
+    items = lsp.prepare_call_hierarchy(list(functions.values()))
+    outgoing = lsp.get_outgoing_calls([item for item in items if item])
+    found: Dict[Tuple[int, int], Location] = {}
+    for calls in outgoing:
+        for call in calls or []:  # Unanswered: its sites fall back below
+            for position in call.from_positions:
+                found.setdefault(position, call.target)
+
+    results = [found.get((site.line, site.character)) for _, site in sites]
+    missing = [index for index, loc in enumerate(results) if loc is None]
+    fallback = lsp.get_definitions(
+        [
+            (sites[index][1].file_uri, sites[index][1].line, sites[index][1].character)
+            for index in missing
+        ]
+    )
+    for index, loc in zip(missing, fallback):
+        results[index] = loc
+    return results
+
+
 def _resolve_one_file(
     py_file: Path,
-    lsp: LSPClient,
-    parser: TreeSitterParser,
+    lsp: Optional[LSPClient],
     symbol_mapper: SymbolMapper,
     storage: SQLiteStorage,
     verbose: bool,
     progress: Progress,
     stats: Dict[str, int],
+    stale_ids: set,
+    source: Optional[SourceFile] = None,
+    hover_cache: Optional[_HoverCache] = None,
+    cached_definitions: Optional[Dict[Tuple[int, int], Position]] = None,
+    strategy: str = "definition",
+    triage: Optional["_Triage"] = None,
 ) -> None:
-    """Process a single file for LSP resolution."""
+    """
+    Process a single file for LSP resolution.
+
+    Call sites and their enclosing entities come from the call_sites table
+    written by Pass 1; only sites inside stale entities (see
+    SQLiteStorage.get_entities_to_verify) are resolved, and those entities
+    are then marked verified - except ones with a site Pyright did not answer
+    (timeout, error, restart), left stale for the next run. The source is
+    only needed for didOpen: the bytes kept from Pass 1 are reused,
+    otherwise the file is read (not parsed).
+
+    Definition lookups for all of the file's sites not in cached_definitions
+    (see SQLiteStorage.get_cached_definitions) are pipelined and their results
+    recorded: one textDocument/definition per site, or with the
+    "call-hierarchy" strategy the outgoing calls of each function (see
+    _look_up_via_call_hierarchy). Then come the hovers of the resolved
+    definitions not already in hover_cache. lsp may be None if every site is
+    cached; nothing is hovered.
+
+    With a triage, cache misses whose callee name is unique in the project
+    are linked without a lookup (except for an audited sample, looked up and
+    compared), and names no entity carries are skipped as external.
+    """
+    if hover_cache is None:
+        hover_cache = _HoverCache()
+    if cached_definitions is None:
+        cached_definitions = {}
     file_path = str(py_file.absolute())
-    file_uri = f"file://{file_path}"
 
     try:
-        # Open document in LSP
-        with open(file_path, "r") as f:
-            lsp.open_document(file_uri, f.read())
+        stale_sites = []
+        for entity_id, site in storage.get_call_sites(file_path):
+            if entity_id in stale_ids:
+                stale_sites.append((entity_id, site))
+            else:
+                stats["skipped_sites"] += 1
+
+        misses = [
+            (entity_id, site)
+            for entity_id, site in stale_sites
+            if (site.line, site.character) not in cached_definitions
+        ]
+        stats["cached_definitions"] += len(stale_sites) - len(misses)
+
+        # Triage: a callee name carried by exactly one project entity is
+        # linked to it directly, one carried by none is external; only
+        # ambiguous names (and a sample of the shortcuts) are looked up
+        audited: Dict[Tuple[int, int], int] = {}  # site -> shortcut target
+        if triage is not None:
+            misses, triaged, audited = triage.settle(
+                misses, storage, stats, can_audit=lsp is not None
+            )
+            stale_sites = [
+                (entity_id, site)
+                for entity_id, site in stale_sites
+                if (site.line, site.character) not in triaged
+            ]
+
+        # 1. What is defined there? (cache, then LSP)
+        fresh = iter(
+            _look_up_definitions(lsp, storage, file_path, source, misses, strategy)
+        )
+        definitions = []
+        for _, site in stale_sites:
+            cached = cached_definitions.get((site.line, site.character))
+            definitions.append(Location(*cached) if cached else next(fresh))
+
+        # 2. Which entities are those? Record verified relations
+        resolved, unanswered = _record_relations(
+            stale_sites,
+            definitions,
+            audited,
+            symbol_mapper,
+            storage,
+            verbose,
+            progress,
+            stats,
+        )
 
-        # Extract call sites
-        call_sites = parser.extract_call_sites(file_path)
+        # 3. Capture type hints of called entities not hovered yet
+        if lsp is not None:
+            _capture_type_hints(
+                lsp, resolved, hover_cache, storage, verbose, progress, stats
+            )
+
+        storage.mark_verified(stale_ids - unanswered)
+
+    except Exception as e:
+        stats["errors"] += 1  # The file's entities stay stale
+        if verbose:
+            progress.console.print(f"  [red]Error resolving {py_file.name}: {e}[/red]")
+
+
+def _look_up_definitions(
+    lsp: LSPClient,
+    storage: SQLiteStorage,
+    file_path: str,
+    source: Optional[SourceFile],
+    misses: list[Tuple[int, CallSite]],
+    strategy: str,
+) -> list[Optional[Location]]:
+    """
+    Open the file in the server and look up the definitions of its cache
+    misses, recording the ones found (see _resolve_one_file). Without
+    misses, the server is not used.
+
+    Returns:
+        One Location (None if not found, NO_ANSWER if unanswered) per miss
+    """
+    if not misses:
+        return []
+    if source is None:
+        source = SourceFile.read(file_path)
+    lsp.open_document(f"file://{file_path}", source.text)
+    if strategy == "call-hierarchy":
+        looked_up = _look_up_via_call_hierarchy(lsp, storage, file_path, source, misses)
+    else:
+        looked_up = lsp.get_definitions(
+            [(site.file_uri, site.line, site.character) for _, site in misses]
+        )
+    storage.save_definitions(
+        file_path,
+        [
+            (site.line, site.character, loc.uri, loc.line, loc.character)
+            for (_, site), loc in zip(misses, looked_up)
+            if loc
+        ],
+    )
+    return looked_up
+
+
+def _record_relations(
+    stale_sites: list[Tuple[int, CallSite]],
+    definitions: list[Optional[Location]],
+    audited: Dict[Tuple[int, int], int],
+    symbol_mapper: SymbolMapper,
+    storage: SQLiteStorage,
+    verbose: bool,
+    progress: Progress,
+    stats: Dict[str, int],
+) -> Tuple[list[Tuple[CallSite, int, Location]], set]:
+    """
+    Record a verified relation for each call site whose definition is a
+    scanned entity, and compare audited triage shortcuts with Pyright.
+
+    Returns:
+        (site, called entity id, definition) of each resolved site, and the
+        entities with a site Pyright did not answer
+    """
+    resolved = []
+    unanswered = set()
+    for (entity_id, site), def_loc in zip(stale_sites, definitions):
+        if def_loc is NO_ANSWER:
+            unanswered.add(entity_id)
+            stats["unanswered"] += 1
+            continue
+        to_id = _process_call_site(
+            site,
+            entity_id,
+            def_loc,
+            symbol_mapper,
+            storage,
+            verbose,
+            progress,
+            stats,
+        )
+        if to_id:
+            resolved.append((site, to_id, def_loc))
+        if (site.line, site.character) in audited:
+            stats["audited"] += 1
+            stats["audit_agreed"] += to_id == audited[(site.line, site.character)]
+    return resolved, unanswered
+
+
+def _capture_type_hints(
+    lsp: LSPClient,
+    resolved: list[Tuple[CallSite, int, Location]],
+    hover_cache: _HoverCache,
+    storage: SQLiteStorage,
+    verbose: bool,
+    progress: Progress,
+    stats: Dict[str, int],
+) -> None:
+    """Hover each resolved definition not in hover_cache once and store its hint."""
+    to_hover = {}
+    for site, to_id, def_loc in resolved:
+        if hover_cache.needs_hover(to_id, def_loc):
+            to_hover.setdefault((def_loc.uri, def_loc.line), (site, to_id, def_loc))
+    stats["hover_misses"] += len(to_hover)
+    stats["hover_hits"] += len(resolved) - len(to_hover)
+
+    type_infos = lsp.get_hovers(
+        [(loc.uri, loc.line, loc.character) for _, _, loc in to_hover.values()]
+    )
+    for (site, to_id, def_loc), type_info in zip(to_hover.values(), type_infos):
+        if type_info is NO_ANSWER:
+            continue  # Hovered again by the next site calling it
+        hover_cache.add(to_id, def_loc)
+        _process_type_hint(site, to_id, type_info, storage, verbose, progress)
+
+
+class _QueuedWrites:
+    """
+    Storage stand-in for LSP workers: reads go straight to SQLite, writes
+    are queued for the single writer thread (see _drain_writes).
+    """
+
+    def __init__(self, storage: SQLiteStorage, writes: "queue.Queue"):
+        self.storage = storage
+        self.writes = writes
+
+    def get_call_sites(self, file_path: str):
+        return self.storage.get_call_sites(file_path)
+
+    def get_entity_lines(self, file_path: str):
+        return self.storage.get_entity_lines(file_path)
+
+    def save_verified_relation(self, *args, **kwargs):
+        self.writes.put(("save_verified_relation", args, kwargs))
+
+    def save_type_hint(self, *args, **kwargs):
+        self.writes.put(("save_type_hint", args, kwargs))
+
+    def save_definitions(self, *args, **kwargs):
+        self.writes.put(("save_definitions", args, kwargs))
+
+    def mark_verified(self, *args, **kwargs):
+        self.writes.put(("mark_verified", args, kwargs))
+
+
+def _drain_writes(
+    storage: SQLiteStorage, writes: "queue.Queue", workers: list[threading.Thread]
+) -> None:
+    """Apply queued writes in order until every worker has finished."""
+    while any(worker.is_alive() for worker in workers):
+        try:
+            method, args, kwargs = writes.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        getattr(storage, method)(*args, **kwargs)
+    # A worker may queue a last write between the get() and its exit
+    for worker in workers:
+        worker.join()
+    while True:
+        try:
+            method, args, kwargs = writes.get_nowait()
+        except queue.Empty:
+            return
+        getattr(storage, method)(*args, **kwargs)
+
+
+def _wait_for_server(
+    lsp: LSPClient,
+    probe_file: Path,
+    loaded_sources: Dict[str, SourceFile],
+    ready_timeout: float,
+    progress: Progress,
+    indexing_times: list[float],
+) -> None:
+    """Wait for a (re)started server to index, probing with the next file to resolve."""
+    probe_path = str(probe_file.absolute())
+    probe = loaded_sources.get(probe_path) or SourceFile.read(probe_path)
+    if not lsp.wait_until_ready(f"file://{probe_path}", probe.text, ready_timeout):
+        progress.console.print(
+            f"[yellow]Pyright not ready after {ready_timeout:.0f}s; "
+            "resolving anyway.[/yellow]"
+        )
+    indexing_times.append(lsp.indexing_seconds)
+
+
+def _budget_left(deadline: Optional[float]) -> bool:
+    """True while no --lsp-budget deadline (time.monotonic) has passed."""
+    return deadline is None or time.monotonic() < deadline
+
+
+def _prepare_server(
+    lsp: LSPClient,
+    ready: bool,
+    py_file: Path,
+    deadline: Optional[float],
+    loaded_sources: Dict[str, SourceFile],
+    ready_timeout: float,
+    progress: Progress,
+    indexing_times: list[float],
+) -> bool:
+    """
+    Get a worker's server ready to resolve py_file: restart it first if it
+    needs recycling (see LSPClient.recycle_reason), then wait for a new
+    server to index, probing with py_file.
+
+    Returns:
+        False if the server failed to restart or the budget ran out while
+        it indexed; py_file is not resolved then
+    """
+    reason = lsp.recycle_reason() if ready else None
+    if reason:
+        progress.console.print(f"[dim]Restarting Pyright ({reason})...[/dim]")
+        if not lsp.restart(reopen_documents=False):
+            progress.console.print("[yellow]Failed to restart LSP server.[/yellow]")
+            return False
+    if ready and not reason:
+        return True
+    # Indexing counts against the budget
+    timeout = ready_timeout
+    if deadline is not None:
+        timeout = min(timeout, max(deadline - time.monotonic(), 0))
+    _wait_for_server(lsp, py_file, loaded_sources, timeout, progress, indexing_times)
+    return _budget_left(deadline)
+
+
+def _resolve_queued_files(
+    files: "queue.Queue",
+    deadline: Optional[float],
+    workspace_root: str,
+    lsp_options: Dict[str, Any],
+    storage: SQLiteStorage,
+    writes: "queue.Queue",
+    verbose: bool,
+    progress: Progress,
+    task,
+    stats: Dict[str, int],
+    stale_entities: Dict[str, set],
+    loaded_sources: Dict[str, SourceFile],
+    ready_timeout: float,
+    indexing_times: list[float],
+    hover_cache: _HoverCache,
+    cached_definitions: Dict[str, Dict[Tuple[int, int], Position]],
+    strategy: str,
+    triage: Optional[_Triage],
+) -> None:
+    """
+    LSP worker: take files from the shared queue, highest priority first,
+    and resolve them with its own Pyright process.
+
+    lsp_options are passed to LSPClient; strategy and triage select how call
+    sites are resolved (see _resolve_one_file). Before each file, the server is
+    restarted if it exited, stalled or hit its memory or file-count limit
+    (see LSPClient.recycle_reason), and resolution resumes with that file
+    once the new server is ready.
+    The worker stops taking files once the deadline has passed; files left
+    in the queue (also when a server fails to start) stay unverified and
+    are picked up by the next run. The time each server took to become
+    ready is appended to indexing_times; request timeouts and server
+    restarts are added to stats.
+    """
+    if files.empty() or not _budget_left(deadline):
+        return
+    lsp = LSPClient(workspace_root, **lsp_options)
+    if not lsp.start():
+        progress.console.print("[yellow]Failed to start LSP server.[/yellow]")
+        return
+
+    try:
+        # Connections are per thread
+        symbol_mapper = SymbolMapper(storage)
+        queued = _QueuedWrites(storage, writes)
+        ready = False
+        while _budget_left(deadline):
+            try:
+                py_file = files.get_nowait()
+            except queue.Empty:
+                return
+
+            if not _prepare_server(
+                lsp,
+                ready,
+                py_file,
+                deadline,
+                loaded_sources,
+                ready_timeout,
+                progress,
+                indexing_times,
+            ):
+                files.put(py_file)  # Left for the next run
+                return
+            ready = True
 
-        for site in call_sites:
-            _process_call_site(
-                site,
-                file_path,
+            file_path = str(py_file.absolute())
+            _resolve_one_file(
+                py_file,
                 lsp,
                 symbol_mapper,
-                storage,
+                queued,
                 verbose,
                 progress,
                 stats,
+                stale_entities[file_path],
+                loaded_sources.pop(file_path, None),
+                hover_cache,
+                cached_definitions[file_path],
+                strategy,
+                triage,
             )
+            progress.advance(task)
+    finally:
+        stats["requests"] += lsp.requests_sent
+        stats["timeouts"] += lsp.timeouts
+        stats["restarts"] += lsp.restarts
+        lsp.shutdown()
 
-    except Exception as e:
-        if verbose:
-            progress.console.print(f"  [red]Error resolving {py_file.name}: {e}[/red]")
+
+def _has_uncached_sites(
+    storage: SQLiteStorage,
+    file_path: str,
+    stale_entities: Dict[str, set],
+    cached_definitions: Dict[Tuple[int, int], Position],
+    triage: Optional[_Triage] = None,
+) -> bool:
+    """
+    True if a call site of a stale entity in the file may need an LSP
+    lookup: it is not cached and, with a triage, its callee name is
+    ambiguous or unique while shortcuts are being audited.
+    """
+    stale_ids = stale_entities[file_path]
+    return any(
+        entity_id in stale_ids
+        and (site.line, site.character) not in cached_definitions
+        and (triage is None or triage.needs_server(site.name))
+        for entity_id, site in storage.get_call_sites(file_path)
+    )
+
+
+def _split_by_server_need(
+    storage: SQLiteStorage,
+    stale_files: list[Path],
+    stale_entities: Dict[str, set],
+    cached_definitions: Dict[str, Dict[Tuple[int, int], Position]],
+    triage: Optional[_Triage],
+) -> Tuple[list[Path], list[Path]]:
+    """
+    Split stale files into those needing Pyright and those whose stale call
+    sites all have cached definitions (or, with a triage, unambiguous callee
+    names), keeping their order.
+    """
+    lsp_files, cached_files = [], []
+    for py_file in stale_files:
+        file_path = str(py_file.absolute())
+        if _has_uncached_sites(
+            storage, file_path, stale_entities, cached_definitions[file_path], triage
+        ):
+            lsp_files.append(py_file)
+        else:
+            cached_files.append(py_file)
+    return lsp_files, cached_files
 
 
 def _run_lsp_resolution(
     python_files: list[Path],
     directory_path: Path,
-    parser: TreeSitterParser,
     storage: SQLiteStorage,
     verbose: bool,
     db_path: str,
+    loaded_sources: Optional[Dict[str, SourceFile]] = None,
+    lsp_workers: int = 1,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    lsp_options: Optional[Dict[str, Any]] = None,
+    strategy: str = "definition",
+    triage_audit_rate: Optional[float] = None,
+    budget: Optional[float] = None,
 ) -> None:
-    """Pass 2: Semantic resolution using LSP."""
+    """
+    Pass 2: Semantic resolution using LSP.
+
+    Only files with stale entities (new, changed, or calling into changed
+    files) are resolved; if there are none, Pyright is not started at all.
+    Files whose stale call sites all have cached definitions are resolved
+    from the database alone. The other stale files are queued by priority
+    (see SQLiteStorage.get_verification_priorities) and taken by lsp_workers
+    worker threads, each with its own Pyright process; the calling thread is
+    the only database writer. Given a budget in seconds, workers stop taking
+    files when it runs out; the rest stay stale, so the next run resumes
+    with them in the same order. lsp_options
+    (request window, timeouts, memory limits) are passed to each LSPClient;
+    strategy is "definition" (per call site) or "call-hierarchy" (per function).
+    Given a triage_audit_rate, call sites are triaged by callee name first
+    (see _Triage) and that fraction of the shortcuts is audited.
+    """
+    lsp_options = lsp_options or {}
+    deadline = time.monotonic() + budget if budget else None
     console.print("\n[cyan]Starting Pass 2: LSP semantic resolution...[/cyan]")
 
-    workspace_root = str(directory_path.absolute())
-    lsp = LSPClient(workspace_root)
-
-    if not lsp.is_available():
+    stale_entities = storage.get_entities_to_verify()
+    stale_files = [
+        py_file for py_file in python_files if str(py_file.absolute()) in stale_entities
+    ]
+    unchanged_files = len(python_files) - len(stale_files)
+    if unchanged_files:
         console.print(
-            "[yellow]Pyright not available. Skipping LSP resolution.[/yellow]"
+            f"[dim]  {unchanged_files} file(s) unchanged since last verification.[/dim]"
         )
-        console.print(f"[cyan]Database: {db_path}[/cyan]")
+    if not stale_files:
+        console.print("[green]✓ Pass 2 complete: all entities already verified[/green]")
         return
+    priorities = storage.get_verification_priorities(stale_entities)
+    stale_files.sort(key=lambda f: priorities[str(f.absolute())], reverse=True)
 
-    if not lsp.start():
+    triage = None
+    if triage_audit_rate is not None:
+        triage = _Triage(DependencyResolver(db_path).get_name_index(), triage_audit_rate)
+
+    cached_definitions = {
+        str(py_file.absolute()): storage.get_cached_definitions(str(py_file.absolute()))
+        for py_file in stale_files
+    }
+    lsp_files, cached_files = _split_by_server_need(
+        storage, stale_files, stale_entities, cached_definitions, triage
+    )
+
+    workspace_root = str(directory_path.absolute())
+
+    if lsp_files and not LSPClient(workspace_root).is_available():
+        # Cached files need no server; the rest stay queued for the next run
         console.print(
-            "[yellow]Failed to start LSP server. Skipping resolution.[/yellow]"
+            "[yellow]Pyright not available. Resolving cached call sites only.[/yellow]"
         )
-        console.print(f"[cyan]Database: {db_path}[/cyan]")
-        return
+        lsp_workers = 0
 
-    # Allow Pyright to index workspace
-    console.print("[dim]Waiting for Pyright to index workspace (3s)...[/dim]")
-    time.sleep(3)
+    files: queue.Queue = queue.Queue()
+    for py_file in lsp_files:
+        files.put(py_file)
+    servers = min(lsp_workers, len(lsp_files))
+    if servers:
+        console.print(
+            f"[dim]Starting {servers} Pyright server(s), "
+            "waiting for them to index the workspace...[/dim]"
+        )
 
-    symbol_mapper = SymbolMapper(storage)
-    stats = {"resolved": 0, "failed": 0, "external": 0}
+    # One set of counters per worker, plus one for the cached files
+    worker_stats = [dict.fromkeys(_RESOLUTION_COUNTERS, 0) for _ in range(servers + 1)]
+    # Shared by all workers: a definition is hovered by whichever gets there first
+    hover_cache = _HoverCache(storage.get_current_type_hint_ids())
+    writes: queue.Queue = queue.Queue()
+    indexing_times: list[float] = []
 
     with Progress(
         SpinnerColumn(),
@@ -264,44 +1128,151 @@ def _run_lsp_resolution(
         console=console,
     ) as progress:
         task = progress.add_task(
-            "Pass 2: Resolving calls...", total=len(python_files)
+            "Pass 2: Resolving calls...", total=len(stale_files)
         )
 
-        for py_file in python_files:
+        workers = [
+            threading.Thread(
+                target=_resolve_queued_files,
+                args=(
+                    files,
+                    deadline,
+                    workspace_root,
+                    lsp_options,
+                    storage,
+                    writes,
+                    verbose,
+                    progress,
+                    task,
+                    stats,
+                    stale_entities,
+                    loaded_sources or {},
+                    ready_timeout,
+                    indexing_times,
+                    hover_cache,
+                    cached_definitions,
+                    strategy,
+                    triage,
+                ),
+                name=f"lsp-worker-{index}",
+            )
+            for index, stats in enumerate(worker_stats[:servers])
+        ]
+        for worker in workers:
+            worker.start()
+
+        # While the servers index, replay cached files (nothing is queued yet)
+        symbol_mapper = SymbolMapper(storage)
+        for py_file in cached_files:
+            file_path = str(py_file.absolute())
             _resolve_one_file(
-                py_file, lsp, parser, symbol_mapper, storage, verbose, progress, stats
+                py_file,
+                None,
+                symbol_mapper,
+                storage,
+                verbose,
+                progress,
+                worker_stats[-1],
+                stale_entities[file_path],
+                cached_definitions=cached_definitions[file_path],
+                triage=triage,
             )
             progress.advance(task)
 
-    lsp.shutdown()
+        _drain_writes(storage, writes, workers)
 
+    stats = {key: sum(s[key] for s in worker_stats) for key in worker_stats[0]}
+    _print_resolution_statistics(
+        stats, indexing_times, bool(lsp_files), triage, files.qsize(), deadline
+    )
+
+
+def _print_resolution_statistics(
+    stats: Dict[str, int],
+    indexing_times: list[float],
+    needed_server: bool,
+    triage: Optional[_Triage],
+    files_left: int,
+    deadline: Optional[float],
+) -> None:
+    """Print the Pass 2 summary from the counters summed over all workers."""
     console.print("\n[green]✓ Pass 2 complete[/green]")
     console.print("[cyan]LSP Resolution Statistics:[/cyan]")
     console.print(f"  • {stats['resolved']} relations verified")
     console.print(f"  • {stats['failed']} lookups failed")
     console.print(f"  • {stats['external']} external references")
+    console.print(
+        f"  • {stats['cached_definitions']} definition(s) served from cache"
+    )
+    console.print(
+        f"  • {stats['hover_misses']} hover request(s), "
+        f"{stats['hover_hits']} type hint(s) served from cache"
+    )
+    if indexing_times:
+        console.print(f"  • Pyright ready after {max(indexing_times):.1f}s")
+        console.print(f"  • {stats['requests']} LSP request(s) sent")
+    elif not needed_server:
+        console.print("  • Pyright not started: every call site was cached")
+    if triage is not None:
+        shortcuts = stats["triage_unique"] - stats["audited"]
+        console.print(
+            f"  • Triage: {stats['triage_unique']} unique, "
+            f"{stats['triage_external']} external, "
+            f"{stats['triage_ambiguous']} ambiguous call site(s); "
+            f"{shortcuts + stats['triage_external']} lookup(s) avoided"
+        )
+        if stats["audited"]:
+            console.print(
+                f"  • Audit: {stats['audit_agreed']}/{stats['audited']} sampled "
+                f"shortcut(s) match Pyright "
+                f"({stats['audit_agreed'] / stats['audited']:.0%})"
+            )
+    if stats["timeouts"] or stats["restarts"]:
+        console.print(
+            f"  [yellow]• {stats['timeouts']} request(s) timed out, "
+            f"{stats['restarts']} Pyright restart(s)[/yellow]"
+        )
+    if stats["unanswered"]:
+        console.print(
+            f"  [yellow]• {stats['unanswered']} call site(s) unanswered; "
+            "their entities stay stale[/yellow]"
+        )
+    if stats["errors"]:
+        console.print(
+            f"  [red]• {stats['errors']} file(s) failed to resolve; "
+            "see --verbose[/red]"
+        )
+    if stats["skipped_sites"]:
+        console.print(
+            f"  • {stats['skipped_sites']} call site(s) in unchanged entities skipped"
+        )
+    if files_left:
+        reason = "LSP budget used up" if not _budget_left(deadline) else "no LSP server"
+        console.print(
+            f"  [yellow]• {reason}: {files_left} file(s) left for the next run[/yellow]"
+        )
 
 
-
-@parser_app.command(name="scan")
-def scan_directory(
+def _scan_directory(
     directory: str,
-    db_path: str = typer.Option(
-        "./cmm.db", "--db-path", help="Path to SQLite database."
-    ),
-    verbose: bool = typer.Option(
-        False, "--verbose", "-v", help="Show detailed output."
-    ),
-    enable_lsp: bool = typer.Option(
-        False, "--enable-lsp", help="Enable LSP-based resolution (requires Pyright)."
-    ),
-):
+    db_path: str,
+    verbose: bool = False,
+    enable_lsp: bool = False,
+    workers: int = 1,
+    verify_hash: bool = False,
+    lsp_workers: int = 1,
+    lsp_ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    lsp_options: Optional[Dict[str, Any]] = None,
+    lsp_strategy: str = "definition",
+    triage_audit_rate: Optional[float] = None,
+    lsp_budget: Optional[float] = None,
+) -> None:
     """
-    Scans a directory recursively for Python files and stores results in SQLite.
+    Scan a directory into the database: Pass 1, then Pass 2 if enable_lsp.
 
-    Two-Pass Strategy (when --enable-lsp is active):
-    - Pass 1: Tree-sitter syntax scan (upsert entities)
-    - Pass 2: LSP semantic resolution (verify relations)
+    The body of `parser scan`, with plain defaults so other commands (such
+    as `parser migrate`) can call it; see _run_lsp_resolution for the LSP
+    arguments.
     """
     parser = TreeSitterParser()
     storage = SQLiteStorage(db_path)
@@ -321,7 +1292,17 @@ def scan_directory(
     console.print(f"[cyan]Found {len(python_files)} Python file(s) to scan.[/cyan]")
 
     # ========== PASS 1: Syntax Scan ==========
-    errors = _run_syntax_scan(python_files, directory_path, parser, storage, verbose)
+    # With LSP enabled, the loaded sources are kept for Pass 2's didOpen
+    errors, loaded_sources = _run_syntax_scan(
+        python_files,
+        directory_path,
+        parser,
+        storage,
+        verbose,
+        workers,
+        keep_sources=enable_lsp,
+        verify_hash=verify_hash,
+    )
 
     # ========== PASS 2: LSP Resolution ==========
     # Skip LSP if too many parsing errors (>50% failure rate)
@@ -332,11 +1313,162 @@ def scan_directory(
             )
             console.print(f"[cyan]Database: {db_path}[/cyan]")
             return
-        _run_lsp_resolution(python_files, directory_path, parser, storage, verbose, db_path)
+        _run_lsp_resolution(
+            python_files,
+            directory_path,
+            storage,
+            verbose,
+            db_path,
+            loaded_sources,
+            lsp_workers,
+            lsp_ready_timeout,
+            lsp_options,
+            lsp_strategy,
+            triage_audit_rate,
+            lsp_budget,
+        )
 
     console.print(f"[cyan]Database: {db_path}[/cyan]")
 
 
+@parser_app.command(name="scan")
+def scan_directory(
+    directory: str,
+    db_path: str = typer.Option(
+        "./cmm.db", "--db-path", help="Path to SQLite database."
+    ),
+    verbose: bool = typer.Option(
+        False, "--verbose", "-v", help="Show detailed output."
+    ),
+    enable_lsp: bool = typer.Option(
+        False, "--enable-lsp", help="Enable LSP-based resolution (requires Pyright)."
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-j",
+        min=1,
+        help="Parse files across N worker processes (Pass 1).",
+    ),
+    verify_hash: bool = typer.Option(
+        False,
+        "--verify-hash",
+        help="Hash every file instead of trusting unchanged mtime/size/inode.",
+    ),
+    lsp_window: int = typer.Option(
+        DEFAULT_MAX_IN_FLIGHT,
+        "--lsp-window",
+        min=1,
+        help="Maximum LSP requests in flight at once (Pass 2).",
+    ),
+    lsp_workers: int = typer.Option(
+        1,
+        "--lsp-workers",
+        min=1,
+        help="Spread Pass 2 across N Pyright server processes.",
+    ),
+    lsp_ready_timeout: float = typer.Option(
+        DEFAULT_READY_TIMEOUT,
+        "--lsp-ready-timeout",
+        min=0,
+        help="Seconds to wait for Pyright to finish indexing before resolving.",
+    ),
+    lsp_request_timeout: float = typer.Option(
+        DEFAULT_REQUEST_TIMEOUT,
+        "--lsp-request-timeout",
+        min=0,
+        help="Seconds before an LSP request is cancelled.",
+    ),
+    lsp_max_timeouts: int = typer.Option(
+        DEFAULT_MAX_TIMEOUTS,
+        "--lsp-max-timeouts",
+        min=1,
+        help="Restart Pyright after N request timeouts in a row.",
+    ),
+    lsp_max_open_files: int = typer.Option(
+        DEFAULT_MAX_OPEN_DOCUMENTS,
+        "--lsp-max-open-files",
+        min=1,
+        help="Documents kept open in Pyright; the least recently used is closed.",
+    ),
+    lsp_max_rss_mb: int = typer.Option(
+        0,
+        "--lsp-max-rss-mb",
+        min=0,
+        help="Restart Pyright between files once it uses more memory (MB, 0: no limit).",
+    ),
+    lsp_max_files: int = typer.Option(
+        0,
+        "--lsp-max-files",
+        min=0,
+        help="Restart Pyright after it opened N files (0: no limit).",
+    ),
+    lsp_strategy: str = typer.Option(
+        "definition",
+        "--lsp-strategy",
+        help="Resolve each call site (definition) or each function's outgoing "
+        "calls (call-hierarchy).",
+    ),
+    lsp_triage: bool = typer.Option(
+        False,
+        "--lsp-triage",
+        help="Link call sites whose callee name is unique in the project without "
+        "Pyright, and skip names no entity carries.",
+    ),
+    triage_audit_rate: float = typer.Option(
+        0.05,
+        "--triage-audit-rate",
+        min=0,
+        max=1,
+        help="Fraction of triage shortcuts checked against Pyright.",
+    ),
+    lsp_budget: float = typer.Option(
+        0,
+        "--lsp-budget",
+        min=0,
+        help="Stop Pass 2 after N seconds, most valuable files first; the next "
+        "run resumes (0: no limit).",
+    ),
+):
+    """
+    Scans a directory recursively for Python files and stores results in SQLite.
+
+    Two-Pass Strategy (when --enable-lsp is active):
+    - Pass 1: Tree-sitter syntax scan (upsert entities)
+    - Pass 2: LSP semantic resolution (verify relations)
+    """
+    # Called with parsed options only; other commands call _scan_directory,
+    # since unset Typer options arrive here as OptionInfo objects
+    if lsp_strategy not in LSP_STRATEGIES:
+        console.print(
+            f"[red]Error: Unknown LSP strategy '{lsp_strategy}' "
+            f"(known: {', '.join(LSP_STRATEGIES)}).[/red]"
+        )
+        raise typer.Exit(1)
+
+    _scan_directory(
+        directory,
+        db_path,
+        verbose,
+        enable_lsp,
+        workers,
+        verify_hash,
+        lsp_workers,
+        lsp_ready_timeout,
+        {
+            "max_in_flight": lsp_window,
+            "request_timeout": lsp_request_timeout,
+            "max_timeouts": lsp_max_timeouts,
+            "max_open_documents": lsp_max_open_files,
+            "max_rss_mb": lsp_max_rss_mb or None,
+            "max_files": lsp_max_files or None,
+        },
+        lsp_strategy,
+        triage_audit_rate if lsp_triage else None,
+        lsp_budget or None,
+    )
+
+
 @parser_app.command(name="resolve")
 def resolve_dependencies(
     file_path: str,
@@ -429,10 +1561,9 @@ def _create_backup(db_path: str, version_label: str) -> str:
     Raises:
         typer.Exit: If backup creation fails
     """
-    backup_path = f"{db_path}.{version_label}.backup"
-    console.print(f"Creating backup at {backup_path}...")
+    console.print(f"Creating backup at {db_path}.{version_label}.backup...")
     try:
-        shutil.copy2(db_path, backup_path)
+        backup_path = SchemaManager(db_path).backup(version_label)
         console.print("[green]Backup created successfully.[/green]")
         return backup_path
     except Exception as e:
@@ -452,8 +1583,6 @@ def _apply_sql_migration(db_path: str, migration_file: str, backup_path: str) ->
     Raises:
         typer.Exit: If migration fails
     """
-    import sqlite3
-    
     migration_sql_path = Path(__file__).parent / migration_file
     if not migration_sql_path.exists():
         console.print(
@@ -463,7 +1592,7 @@ def _apply_sql_migration(db_path: str, migration_file: str, backup_path: str) ->
 
     console.print("Applying schema changes...")
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path, "bulk-load")
         cursor = conn.cursor()
 
         with open(migration_sql_path, "r") as f:
@@ -478,7 +1607,7 @@ def _apply_sql_migration(db_path: str, migration_file: str, backup_path: str) ->
     except Exception as e:
         console.print(f"[red]Migration failed: {e}[/red]")
         console.print("[yellow]Restoring from backup...[/yellow]")
-        shutil.copy2(backup_path, db_path)
+        SchemaManager(db_path).restore(backup_path)
         raise typer.Exit(1)
 
 
@@ -497,7 +1626,34 @@ def _perform_rescan_migration(
     os.remove(db_path)
 
     console.print(f"Initializing {to_version} schema and re-scanning {scan_path}...")
-    scan_directory(scan_path, db_path=db_path, verbose=False)
+    _scan_directory(scan_path, db_path)
+
+
+def _perform_in_place_migration(db_path: str, target: int) -> list:
+    """
+    Upgrades the database in place, showing progress of batched backfills.
+
+    Args:
+        db_path: Path to the database file
+        target: Schema version to upgrade to
+
+    Returns:
+        The applied migrations
+    """
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        TextColumn("{task.completed}/{task.total}"),
+        console=console,
+    ) as progress:
+        tasks = {}
+
+        def report(description: str, done: int, total: int):
+            if description not in tasks:
+                tasks[description] = progress.add_task(description, total=total)
+            progress.update(tasks[description], completed=done, total=total)
+
+        return SchemaManager(db_path).upgrade(target, progress=report)
 
 
 # ========== Migration Command ==========
@@ -505,8 +1661,12 @@ def _perform_rescan_migration(
 
 @parser_app.command(name="migrate")
 def migrate_database(
-    from_version: str = typer.Option("v0.2", "--from", help="Current schema version."),
-    to_version: str = typer.Option("v0.3", "--to", help="Target schema version."),
+    from_version: str = typer.Option(
+        None, "--from", help="Current schema version (detected if omitted)."
+    ),
+    to_version: str = typer.Option(
+        SCHEMA_LABEL, "--to", help="Target schema version."
+    ),
     db_path: str = typer.Option(
         "./cmm.db", "--db-path", help="Path to SQLite database."
     ),
@@ -516,21 +1676,17 @@ def migrate_database(
 ):
     """
     Migrates the database to a new schema version.
-    
+
     Supported migrations:
     - v0.2 → v0.3: Full re-scan (backup, delete, re-scan)
-    - v0.3 → v0.4: Full re-scan (clean schema without _v3 suffix)
-    - v0.3.1 → v0.4: Full re-scan (clean schema without _v3 suffix)
+    - v0.3/v0.3.1/v0.4 → latest: In place (tables renamed, columns added,
+      rows backfilled in batches); verified relations and type hints are kept
     """
-    console.print(
-        f"[bold]Migrating database from {from_version} to {to_version}...[/bold]"
-    )
-
     db_file = Path(db_path)
-    
+
     # Handle new database creation
     if not db_file.exists():
-        if from_version != "v0.2":
+        if from_version not in (None, "v0.2"):
             console.print(
                 f"[red]Error: Database file {db_path} does not exist.[/red]"
             )
@@ -539,45 +1695,67 @@ def migrate_database(
             f"[yellow]Database file {db_path} does not exist. Creating new.[/yellow]"
         )
         console.print(f"Initializing {to_version} schema and scanning {scan_path}...")
-        scan_directory(scan_path, db_path=db_path, verbose=False)
+        _scan_directory(scan_path, db_path)
         console.print("[bold green]Migration complete![/bold green]")
         return
 
-    # Create backup
-    _backup_path = _create_backup(db_path, from_version)
+    schema = SchemaManager(db_path)
+    current_label = from_version or label_for_version(schema.current_version())
+    console.print(
+        f"[bold]Migrating database from {current_label} to {to_version}...[/bold]"
+    )
 
-    # Determine migration strategy based on version pair
-    if from_version == "v0.2" and to_version == "v0.3":
-        # Full re-scan migration
-        _perform_rescan_migration(db_path, to_version, scan_path)
-        
-    elif (from_version == "v0.3" or from_version == "v0.3.1") and to_version == "v0.4":
-        # Full re-scan migration to clean schema
-        console.print("\n[cyan]Migrating to v0.4 (clean schema without _v3 suffix)...[/cyan]")
+    if from_version == "v0.2":
+        if to_version != "v0.3":
+            console.print(
+                f"[red]Error: Unsupported migration path v0.2 → {to_version}[/red]"
+            )
+            console.print("[yellow]Migrate v0.2 → v0.3 first.[/yellow]")
+            raise typer.Exit(1)
+        # The v0.2 layout predates versioned tables: full re-scan
+        backup_path = _create_backup(db_path, from_version)
         _perform_rescan_migration(db_path, to_version, scan_path)
-        
-        console.print("\n[green]✓ Schema upgraded to v0.4[/green]")
-        console.print("[cyan]Changes:[/cyan]")
-        console.print("  • Table names cleaned: files_v3 → files, entities_v3 → entities")
-        console.print("  • All LSP enhancements included in base schema")
-        console.print("  • Database re-scanned with new schema")
-        
-    else:
-        console.print(
-            f"[red]Error: Unsupported migration path {from_version} → {to_version}[/red]"
-        )
-        console.print("[yellow]Supported migrations:[/yellow]")
-        console.print("  • v0.2 → v0.3 (full re-scan)")
-        console.print("  • v0.3 → v0.4 (full re-scan, clean schema)")
-        console.print("  • v0.3.1 → v0.4 (full re-scan, clean schema)")
+        console.print(f"[dim]Backup kept at {backup_path}[/dim]")
+        console.print("[bold green]Migration complete![/bold green]")
+        return
+
+    try:
+        target = version_for_label(to_version)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+
+    if schema.current_version() >= target:
+        console.print(f"[green]✓ Database is already at {to_version}[/green]")
+        return
+
+    backup_path = _create_backup(db_path, current_label)
+    try:
+        applied = _perform_in_place_migration(db_path, target)
+    except Exception as e:
+        console.print(f"[red]Migration failed: {e}[/red]")
+        console.print("[yellow]Restoring from backup...[/yellow]")
+        schema.restore(backup_path)
         raise typer.Exit(1)
 
+    for migration in applied:
+        console.print(f"  • {migration.label}: {migration.description}")
+    console.print(f"\n[green]✓ Schema upgraded in place to {to_version}[/green]")
     console.print("[bold green]Migration complete![/bold green]")
 
 
 # ========== Export Commands ==========
 
 
+def _open_for_export(db_path: str) -> SQLiteStorage:
+    """Open storage without migrating it; an outdated schema exits with a hint."""
+    try:
+        return SQLiteStorage(db_path, upgrade=False)
+    except SchemaVersionError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+
+
 @export_app.command(name="intent")
 def export_intent(
     db_path: str = typer.Option(
@@ -593,7 +1771,7 @@ def export_intent(
     Generates a structured view of the system's intent, highlighting 
     Public Contracts and Verified Implementation details.
     """
-    storage = SQLiteStorage(db_path=db_path)
+    storage = _open_for_export(db_path)
     adapter = MarkdownIntentAdapter()
     
     with console.status("Querying hierarchical intent..."):
@@ -641,11 +1819,10 @@ def export_structural(
     - Methods color-coded by visibility (green=public, red=private)
     - Edges styled by verification (solid=LSP, dashed=lazy)
     """
+    storage = _open_for_export(db_path)
     try:
         from graphml_adapter import PyedGraphMLAdapter
         
-        # Initialize storage
-        storage = SQLiteStorage(db_path)
         
         # Query hierarchical structure
         console.print(f"[bold blue]Querying structural data from {db_path}...[/bold blue]")
@@ -0,0 +1,79 @@
+"""
+Connection Factory: SQLite connections tuned per workload.
+
+Every module opens its connections through connect(), which applies one of
+the named storage profiles:
+
+- bulk-load:   whole-directory scans and migrations. WAL journal with
+               synchronous=NORMAL (no fsync per commit), large page cache.
+- interactive: short writes (LSP verification, single-file upserts).
+- readonly:    exports and queries. Opened read-only, so they can run while
+               a scan is writing to the same WAL database.
+
+journal_mode=WAL is persistent: the first writing connection converts the
+database file and later connections inherit it.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Union
+
+# Negative cache_size values are in KiB
+STORAGE_PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # 64 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+    },
+    "interactive": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16384,  # 16 MiB
+        "mmap_size": 67108864,  # 64 MiB
+        "temp_store": "MEMORY",
+    },
+    "readonly": {
+        "cache_size": -32768,  # 32 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+        "query_only": "ON",
+    },
+}
+
+DEFAULT_PROFILE = "interactive"
+
+
+def connect(
+    db_path: str, profile: str = DEFAULT_PROFILE, **kwargs
+) -> sqlite3.Connection:
+    """
+    Open a SQLite connection configured for a storage profile.
+
+    Args:
+        db_path: Path to the database file
+        profile: Name of an entry in STORAGE_PROFILES
+        **kwargs: Passed through to sqlite3.connect (e.g. isolation_level)
+
+    Returns:
+        The configured connection
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    try:
+        pragmas = STORAGE_PROFILES[profile]
+    except KeyError:
+        known = ", ".join(STORAGE_PROFILES)
+        raise ValueError(f"Unknown storage profile '{profile}' (known: {known})")
+
+    if profile == "readonly":
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, **kwargs)
+    else:
+        conn = sqlite3.connect(db_path, **kwargs)
+
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
@@ -1,5 +1,6 @@
+import os
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 @dataclass
@@ -40,3 +41,32 @@ class CMMEntity:
             schema_version=data.get("schema_version", "v0.3"),
             entities=data.get("entities", []),
         )
+
+
+@dataclass
+class ScanResult:
+    """Entity tree and LSP call sites produced from a single parse of a file."""
+
+    cmm_entity: CMMEntity
+    call_sites: Optional[List[CallSite]] = None  # None when not collected
+
+
+@dataclass
+class SourceFile:
+    """A file's bytes and stat metadata, loaded once and shared by a scan."""
+
+    path: str
+    content: bytes
+    stat: os.stat_result
+
+    @classmethod
+    def read(cls, path: str) -> "SourceFile":
+        """Load a file (stat first, so a concurrent edit shows up as a change)."""
+        file_stat = os.stat(path)
+        with open(path, "rb") as f:
+            return cls(path=path, content=f.read(), stat=file_stat)
+
+    @property
+    def text(self) -> str:
+        """Decoded contents, as sent to the LSP server (invalid UTF-8 becomes U+FFFD)."""
+        return self.content.decode("utf-8", errors="replace")
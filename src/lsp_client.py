@@ -2,14 +2,76 @@
 LSP Client for communicating with Pyright language server.
 
 Provides semantic analysis capabilities for deterministic dependency linking.
+
+Requests are pipelined: a reader thread matches responses to pending
+requests by id, so up to `max_in_flight` requests can be outstanding at
+once. get_definition()/get_hover() wait for one answer; get_definitions()
+and get_hovers() keep the window full for a whole batch of positions.
+
+Every request has a deadline: an overdue request is cancelled
+($/cancelRequest) and answers NO_ANSWER, as do requests that fail or reach
+a server that went away; None is kept for a server that answered "nothing
+there". After `max_timeouts` timeouts in a row the server counts as
+stalled: further requests answer NO_ANSWER at once until it is restarted.
+Server stderr is drained on its own thread, keeping only the last lines.
+
+At most `max_open_documents` documents are open at once (least recently
+used ones get didClose); recycle_reason() tells callers when the server
+stalled, exited, or its memory or file count calls for a restart between
+files.
 """
 
 import json
 import subprocess
 import os
-from typing import Optional, Dict, Any
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import BinaryIO, Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
 
+# Default number of requests kept in flight by the batch methods
+DEFAULT_MAX_IN_FLIGHT = 64
+
+# Default seconds to wait for the server to finish indexing
+DEFAULT_READY_TIMEOUT = 60.0
+
+# Default seconds a request may take before it is cancelled
+DEFAULT_REQUEST_TIMEOUT = 30.0
+
+# Default number of timeouts in a row after which the server is restarted
+DEFAULT_MAX_TIMEOUTS = 3
+
+# Default number of documents kept open on the server
+DEFAULT_MAX_OPEN_DOCUMENTS = 32
+
+# Server stderr kept for diagnostics: last lines, each cut to a maximum length
+STDERR_TAIL_LINES = 50
+STDERR_MAX_LINE_LENGTH = 500
+
+# (file URI, zero-based line, zero-based character)
+Position = Tuple[str, int, int]
+
+
+class NoAnswer:
+    """
+    Result of a request the server did not answer: it timed out, failed or
+    got an error response. Unlike None ("nothing there"), nothing is known
+    about the position, so callers should try again later. Falsy, so code
+    that only checks for a result treats it like None.
+    """
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "NO_ANSWER"
+
+
+NO_ANSWER = NoAnswer()
+
 
 @dataclass
 class Location:
@@ -72,20 +134,136 @@ class TypeInfo:
         return None
 
 
+@dataclass
+class OutgoingCall:
+    """One callee of a callHierarchy/outgoingCalls response."""
+
+    target: Location  # Start of the callee's name
+    from_positions: List[Tuple[int, int]]  # (line, character) of each call
+
+    @classmethod
+    def from_lsp_response(cls, result: Dict[str, Any]) -> "OutgoingCall":
+        """Parse one CallHierarchyOutgoingCall."""
+        to = result.get("to", {})
+        start = to.get("selectionRange", {}).get("start", {})
+        return cls(
+            target=Location(
+                uri=to.get("uri", ""),
+                line=start.get("line", 0),
+                character=start.get("character", 0),
+            ),
+            from_positions=[
+                (r["start"]["line"], r["start"]["character"])
+                for r in result.get("fromRanges", [])
+            ],
+        )
+
+
+class MessageReader:
+    """
+    JSON-RPC message framing over a buffered binary stream.
+
+    Header lines are read with readline() and each body with one read() of
+    Content-Length bytes, which json.loads() parses without decoding first.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        """
+        Args:
+            stream: Buffered binary stream (e.g. a Popen stdout pipe)
+        """
+        self.stream = stream
+
+    def read_body(self) -> Optional[bytes]:
+        """Read one message body (None at end of stream or on a malformed header)."""
+        length = None
+        while True:
+            line = self.stream.readline()
+            if not line:
+                return None
+            if line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+
+        if length is None:
+            return None
+
+        body = self.stream.read(length)
+        return body if len(body) == length else None
+
+    def read_message(self) -> Optional[Dict[str, Any]]:
+        """Read and decode one message (None at end of stream)."""
+        body = self.read_body()
+        return json.loads(body) if body is not None else None
+
+
+def _result_of(response: Optional[Dict[str, Any]]) -> Any:
+    """The result of a response message (NO_ANSWER for errors or lost responses)."""
+    if response and "result" in response:
+        return response["result"]
+    return NO_ANSWER
+
+
 class LSPClient:
     """Client for communicating with Pyright LSP server."""
 
-    def __init__(self, workspace_root: str):
+    def __init__(
+        self,
+        workspace_root: str,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        max_timeouts: int = DEFAULT_MAX_TIMEOUTS,
+        max_open_documents: int = DEFAULT_MAX_OPEN_DOCUMENTS,
+        max_rss_mb: Optional[float] = None,
+        max_files: Optional[int] = None,
+    ):
         """
         Initialize LSP client.
 
         Args:
             workspace_root: Absolute path to project root
+            max_in_flight: Maximum number of requests awaiting a response
+            request_timeout: Seconds before a request is cancelled
+            max_timeouts: Timeouts in a row after which the server is restarted
+            max_open_documents: Documents kept open before the least recently
+                used is closed
+            max_rss_mb: Server memory (resident set, MB) that calls for a
+                restart (None: no limit), see recycle_reason()
+            max_files: Documents opened by one server that call for a
+                restart (None: no limit)
         """
         self.workspace_root = workspace_root
+        self.request_timeout = request_timeout
+        self.max_timeouts = max_timeouts
+        self.max_open_documents = max_open_documents
+        self.max_rss_mb = max_rss_mb
+        self.max_files = max_files
         self.process: Optional[subprocess.Popen] = None
         self.request_id = 0
         self._initialized = False
+        # Request id -> (future, monotonic deadline)
+        self._pending: Dict[int, Tuple[Future, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._window = threading.BoundedSemaphore(max_in_flight)
+        self._reader: Optional[threading.Thread] = None
+        self._stderr_drain: Optional[threading.Thread] = None
+        self._stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+        # URI -> text of documents open on the server, least recently used first
+        self._open_documents: "OrderedDict[str, str]" = OrderedDict()
+        self.documents_opened = 0  # by the current server process
+        self._consecutive_timeouts = 0
+        self.requests_sent = 0
+        self.timeouts = 0
+        self.restarts = 0
+        # Work-done progress tokens the server has begun and not yet ended
+        self._active_progress: set = set()
+        self._progress_idle = threading.Event()
+        self._progress_idle.set()
+        self._started_at = 0.0
+        self.indexing_seconds: Optional[float] = None
 
     def is_available(self) -> bool:
         """Check if Pyright is installed and available."""
@@ -112,14 +290,18 @@ class LSPClient:
             return False
 
         try:
+            self._started_at = time.monotonic()
+            self.documents_opened = 0
             # Start pyright langserver via Python module
             # CRITICAL: Use pyright.langserver (not pyright) with --stdio flag
-            self.process = subprocess.Popen(
-                ["python", "-m", "pyright.langserver", "--stdio"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                # Binary mode for proper LSP protocol handling
+            self._attach(
+                subprocess.Popen(
+                    ["python", "-m", "pyright.langserver", "--stdio"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    # Binary mode for proper LSP protocol handling
+                )
             )
 
             # Send initialize request
@@ -134,6 +316,39 @@ class LSPClient:
             print(f"[LSP] Failed to start Pyright: {e}")
             return False
 
+    def _attach(self, process: subprocess.Popen):
+        """Talk to a started server process and start the reader threads."""
+        self.process = process
+        self._reader = threading.Thread(
+            target=self._read_loop, name="lsp-reader", daemon=True
+        )
+        self._reader.start()
+        if process.stderr:
+            self._stderr_drain = threading.Thread(
+                target=self._drain_stderr,
+                args=(process.stderr,),
+                name="lsp-stderr",
+                daemon=True,
+            )
+            self._stderr_drain.start()
+
+    def _drain_stderr(self, stream: BinaryIO):
+        """
+        Stderr thread: keep reading so a chatty server never blocks on a
+        full pipe; only the last lines are kept (see stderr_tail()).
+        """
+        try:
+            for line in iter(stream.readline, b""):
+                self._stderr_tail.append(
+                    line[:STDERR_MAX_LINE_LENGTH].decode("utf-8", "replace").rstrip()
+                )
+        except (OSError, ValueError):
+            pass  # Pipe closed on shutdown
+
+    def stderr_tail(self) -> str:
+        """The last lines the server wrote to stderr."""
+        return "\n".join(self._stderr_tail)
+
     def _initialize(self) -> bool:
         """Send LSP initialize request."""
         init_request = {
@@ -143,25 +358,81 @@ class LSPClient:
             "params": {
                 "processId": os.getpid(),
                 "rootUri": f"file://{self.workspace_root}",
-                "capabilities": {},
+                "workspaceFolders": [
+                    {
+                        "uri": f"file://{self.workspace_root}",
+                        "name": os.path.basename(self.workspace_root),
+                    }
+                ],
+                # Lets the server report indexing through $/progress and
+                # ask for settings (see _reply_to_server)
+                "capabilities": {
+                    "window": {"workDoneProgress": True},
+                    "workspace": {"configuration": True},
+                },
             },
         }
 
-        response = self._send_request(init_request)
+        # Startup is not bounded by request_timeout
+        response = self._await(self._submit(init_request, timeout=DEFAULT_READY_TIMEOUT))
         if response and "result" in response:
             # Send initialized notification
             self._send_notification(
                 {"jsonrpc": "2.0", "method": "initialized", "params": {}}
             )
             return True
-            return True
         return False
 
+    def wait_until_ready(
+        self,
+        probe_uri: Optional[str] = None,
+        probe_text: Optional[str] = None,
+        timeout: float = DEFAULT_READY_TIMEOUT,
+    ) -> bool:
+        """
+        Wait until the server has finished indexing, instead of sleeping.
+
+        First waits for every work-done progress the server reported
+        ($/progress begin ... end) to end. Then, given a probe document, opens
+        it and waits for its documentSymbol answer: Pyright only answers
+        once the file (and what it imports) has been analysed, so later
+        lookups in it do not time out or fail.
+
+        Args:
+            probe_uri: Document to probe (e.g. the first file to resolve)
+            probe_text: Its content, for didOpen
+            timeout: Seconds to wait in total
+
+        Returns:
+            True if the server became ready within the timeout. Either way,
+            indexing_seconds is set to the time since start().
+        """
+        deadline = time.monotonic() + timeout
+        ready = self._progress_idle.wait(timeout)
+
+        if ready and probe_uri is not None and self._initialized:
+            self.open_document(probe_uri, probe_text or "")
+            probe = self._submit(
+                {
+                    "jsonrpc": "2.0",
+                    "id": self._next_id(),
+                    "method": "textDocument/documentSymbol",
+                    "params": {"textDocument": {"uri": probe_uri}},
+                },
+                timeout=max(0.0, deadline - time.monotonic()),
+            )
+            ready = self._await(probe) is not None
+
+        self.indexing_seconds = time.monotonic() - self._started_at
+        return ready
+
     def open_document(self, file_uri: str, content: str):
         """
         Send textDocument/didOpen notification to LSP server.
 
         Pyright requires files to be "opened" before querying definitions.
+        Reopening an open document only marks it as recently used; beyond
+        max_open_documents, the least recently used one is closed.
 
         Args:
             file_uri: File URI (e.g., "file:///path/to/file.py")
@@ -169,6 +440,13 @@ class LSPClient:
         """
         if not self._initialized:
             return
+        if file_uri in self._open_documents:
+            self._open_documents.move_to_end(file_uri)
+            return
+        while len(self._open_documents) >= max(1, self.max_open_documents):
+            self.close_document(next(iter(self._open_documents)))
+        self._open_documents[file_uri] = content
+        self.documents_opened += 1
 
         notification = {
             "jsonrpc": "2.0",
@@ -185,6 +463,70 @@ class LSPClient:
 
         self._send_notification(notification)
 
+    def close_document(self, file_uri: str):
+        """Send textDocument/didClose so the server can drop the document's state."""
+        if self._open_documents.pop(file_uri, None) is None:
+            return
+        self._send_notification(
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/didClose",
+                "params": {"textDocument": {"uri": file_uri}},
+            }
+        )
+
+    def server_rss_mb(self) -> Optional[float]:
+        """
+        Resident memory of the server and its child processes (the langserver
+        wrapper runs node), in MB. None where /proc is not available.
+        """
+        if not self.process or not os.path.isdir("/proc"):
+            return None
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "rb") as f:
+                    # The command name may contain spaces; fields after it are fixed
+                    ppid = int(f.read().rsplit(b")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        total_kb = 0
+        stack = [self.process.pid]
+        while stack:
+            pid = stack.pop()
+            stack.extend(children.get(pid, []))
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total_kb += int(line.split()[1])
+                            break
+            except (OSError, ValueError):
+                continue
+        return total_kb / 1024
+
+    def recycle_reason(self) -> Optional[str]:
+        """
+        Why the server should be restarted before the next file, if at all:
+        it exited, stalled (max_timeouts timeouts in a row), opened
+        max_files documents, or uses more than max_rss_mb.
+        """
+        if self.process is None or self.process.poll() is not None:
+            return "server exited"
+        if self._consecutive_timeouts >= self.max_timeouts:
+            return f"{self._consecutive_timeouts} request(s) in a row timed out"
+        if self.max_files and self.documents_opened >= self.max_files:
+            return f"{self.documents_opened} files opened"
+        if self.max_rss_mb:
+            rss = self.server_rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                return f"{rss:.0f} MB resident"
+        return None
+
     def get_definition(
         self, file_uri: str, line: int, character: int
     ) -> Optional[Location]:
@@ -197,25 +539,25 @@ class LSPClient:
             character: Zero-based character offset
 
         Returns:
-            Location of definition or None if not found
+            Location of definition, None if not found, or NO_ANSWER
         """
-        if not self._initialized:
-            return None
+        return self.get_definitions([(file_uri, line, character)])[0]
 
-        request = {
-            "jsonrpc": "2.0",
-            "id": self._next_id(),
-            "method": "textDocument/definition",
-            "params": {
-                "textDocument": {"uri": file_uri},
-                "position": {"line": line, "character": character},
-            },
-        }
+    def get_definitions(self, positions: List[Position]) -> List[Optional[Location]]:
+        """
+        Get definition locations for many positions, pipelined.
 
-        response = self._send_request(request)
-        if response and "result" in response:
-            return Location.from_lsp_response(response["result"])
-        return None
+        Args:
+            positions: (file URI, line, character) tuples
+
+        Returns:
+            One Location (None if not found, NO_ANSWER if unanswered) per
+            position, in input order
+        """
+        return [
+            result if result is NO_ANSWER else Location.from_lsp_response(result)
+            for result in self._request_all("textDocument/definition", positions)
+        ]
 
     def get_hover(self, file_uri: str, line: int, character: int) -> Optional[TypeInfo]:
         """
@@ -227,25 +569,126 @@ class LSPClient:
             character: Zero-based character offset
 
         Returns:
-            TypeInfo with signature or None if not found
+            TypeInfo with signature, None if not found, or NO_ANSWER
+        """
+        return self.get_hovers([(file_uri, line, character)])[0]
+
+    def get_hovers(self, positions: List[Position]) -> List[Optional[TypeInfo]]:
+        """
+        Get type information for many positions, pipelined.
+
+        Args:
+            positions: (file URI, line, character) tuples
+
+        Returns:
+            One TypeInfo (None if not found, NO_ANSWER if unanswered) per
+            position, in input order
+        """
+        return [
+            result if result is NO_ANSWER else TypeInfo.from_lsp_response(result)
+            for result in self._request_all("textDocument/hover", positions)
+        ]
+
+    def prepare_call_hierarchy(
+        self, positions: List[Position]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get the call hierarchy item of the function at each position, pipelined.
+
+        Args:
+            positions: (file URI, line, character) of function names
+
+        Returns:
+            One CallHierarchyItem (None if there is none, NO_ANSWER if
+            unanswered) per position, in input order
+        """
+        return [
+            items if items is NO_ANSWER else items[0] if items else None
+            for items in self._request_all(
+                "textDocument/prepareCallHierarchy", positions
+            )
+        ]
+
+    def get_outgoing_calls(
+        self, items: List[Dict[str, Any]]
+    ) -> List[List[OutgoingCall]]:
+        """
+        Get the calls made by each call hierarchy item, pipelined.
+
+        Args:
+            items: Items returned by prepare_call_hierarchy()
+
+        Returns:
+            The outgoing calls of each item (NO_ANSWER if unanswered), in
+            input order
+        """
+        return [
+            calls
+            if calls is NO_ANSWER
+            else [OutgoingCall.from_lsp_response(call) for call in calls or []]
+            for calls in self._request_many(
+                "callHierarchy/outgoingCalls", [{"item": item} for item in items]
+            )
+        ]
+
+    def _request_all(self, method: str, positions: List[Position]) -> List[Any]:
+        """Send one position request per entry (see _request_many)."""
+        return self._request_many(
+            method,
+            [
+                {
+                    "textDocument": {"uri": file_uri},
+                    "position": {"line": line, "character": character},
+                }
+                for file_uri, line, character in positions
+            ],
+        )
+
+    def _request_many(self, method: str, params_list: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Send one request per params entry, keeping up to max_in_flight
+        outstanding, and collect the results in input order.
+
+        Requests that time out or fail answer NO_ANSWER. Once the server
+        stalled (see max_timeouts), the rest of the batch answers NO_ANSWER
+        at once; restarting is left to the caller (see recycle_reason()), so
+        it can wait for the new server to index first.
         """
         if not self._initialized:
-            return None
+            return [NO_ANSWER] * len(params_list)
+
+        futures = []
+        for params in params_list:
+            request = {
+                "jsonrpc": "2.0",
+                "id": self._next_id(),
+                "method": method,
+                "params": params,
+            }
+            futures.append(self._submit(request))
+        return [_result_of(self._await(future)) for future in futures]
+
+    def restart(self, reopen_documents: bool = True) -> bool:
+        """
+        Replace the server: kill it (it may be stuck) and start a new one.
 
-        request = {
-            "jsonrpc": "2.0",
-            "id": self._next_id(),
-            "method": "textDocument/hover",
-            "params": {
-                "textDocument": {"uri": file_uri},
-                "position": {"line": line, "character": character},
-            },
-        }
+        Args:
+            reopen_documents: Reopen the documents that were open, for
+                requests still to come on them
 
-        response = self._send_request(request)
-        if response and "result" in response:
-            return TypeInfo.from_lsp_response(response["result"])
-        return None
+        Returns:
+            True if the new server started
+        """
+        documents = list(self._open_documents.items()) if reopen_documents else []
+        if self._stderr_tail:
+            print(f"[LSP] Last stderr line: {self._stderr_tail[-1]}")
+        self._kill()
+        self.restarts += 1
+        if not self.start():
+            return False
+        for file_uri, content in documents:
+            self.open_document(file_uri, content)
+        return True
 
     def shutdown(self):
         """Shutdown the LSP server gracefully."""
@@ -270,30 +713,112 @@ class LSPClient:
                 if self.process:
                     self.process.kill()
             finally:
-                self.process = None
-                self._initialized = False
+                self._release_process()
+        elif self.process:
+            self._kill()
+
+    def _kill(self):
+        """Stop the server without the shutdown handshake (it may be stuck)."""
+        if self.process:
+            self.process.kill()
+            self.process.wait()
+        self._release_process()
+
+    def _release_process(self):
+        """Forget the server process once it has exited and join its threads."""
+        self.process = None
+        self._initialized = False
+        self._open_documents.clear()
+        self._consecutive_timeouts = 0
+        for thread in (self._reader, self._stderr_drain):
+            if thread:
+                thread.join(timeout=5)
+        self._reader = self._stderr_drain = None
 
     def _send_request(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Send JSON-RPC request and wait for response."""
-        if not self.process or not self.process.stdin or not self.process.stdout:
-            return None
+        """Send JSON-RPC request and wait for response (None on timeout)."""
+        return self._await(self._submit(request))
 
-        try:
-            # Encode message and calculate Content-Length in BYTES (not characters)
-            message = json.dumps(request)
-            message_bytes = message.encode("utf-8")
-            header = f"Content-Length: {len(message_bytes)}\r\n\r\n"
-            content = header.encode("utf-8") + message_bytes
+    def _submit(self, request: Dict[str, Any], timeout: Optional[float] = None) -> Future:
+        """
+        Send a JSON-RPC request without waiting for its response.
 
-            self.process.stdin.write(content)
-            self.process.stdin.flush()
+        Blocks while max_in_flight requests are already outstanding, expiring
+        overdue ones meanwhile.
 
-            # Read response
-            return self._read_response()
+        Args:
+            request: The request message
+            timeout: Seconds until the request is cancelled (default:
+                request_timeout)
 
+        Returns:
+            Future resolved with the response message (None if the request
+            failed, timed out or the server went away)
+        """
+        future: Future = Future()
+        if (
+            not self.process
+            or not self.process.stdin
+            or self.process.poll() is not None
+            or self._consecutive_timeouts >= self.max_timeouts
+        ):
+            future.set_result(None)
+            return future
+
+        while not self._window.acquire(timeout=self._until_next_deadline()):
+            self._expire_overdue()
+        deadline = time.monotonic() + (
+            self.request_timeout if timeout is None else timeout
+        )
+        with self._pending_lock:
+            self._pending[request["id"]] = (future, deadline)
+            self.requests_sent += 1
+        try:
+            self._write_message(request)
         except Exception as e:
             print(f"[LSP] Request failed: {e}")
-            return None
+            self._complete(request["id"], None)
+        return future
+
+    def _await(self, future: Future) -> Optional[Dict[str, Any]]:
+        """Wait for a submitted request, cancelling it once its deadline passes."""
+        while True:
+            try:
+                return future.result(timeout=self._until_next_deadline())
+            except FutureTimeoutError:
+                self._expire_overdue()
+
+    def _until_next_deadline(self) -> float:
+        """Seconds until the earliest pending request is due (at least 10 ms)."""
+        with self._pending_lock:
+            deadlines = [deadline for _, deadline in self._pending.values()]
+        if not deadlines:
+            return self.request_timeout
+        return max(0.01, min(deadlines) - time.monotonic())
+
+    def _expire_overdue(self):
+        """
+        Cancel requests past their deadline: $/cancelRequest tells the
+        server to drop the work, and the request answers None.
+        """
+        now = time.monotonic()
+        with self._pending_lock:
+            overdue = [
+                request_id
+                for request_id, (_, deadline) in self._pending.items()
+                if deadline <= now
+            ]
+        for request_id in overdue:
+            if self._complete(request_id, None):
+                self.timeouts += 1
+                self._consecutive_timeouts += 1
+                self._send_notification(
+                    {
+                        "jsonrpc": "2.0",
+                        "method": "$/cancelRequest",
+                        "params": {"id": request_id},
+                    }
+                )
 
     def _send_notification(self, notification: Dict[str, Any]):
         """Send JSON-RPC notification (no response expected)."""
@@ -301,62 +826,102 @@ class LSPClient:
             return
 
         try:
-            # Encode notification and calculate Content-Length in BYTES
-            message = json.dumps(notification)
-            message_bytes = message.encode("utf-8")
-            header = f"Content-Length: {len(message_bytes)}\r\n\r\n"
-            content = header.encode("utf-8") + message_bytes
-
-            self.process.stdin.write(content)
-            self.process.stdin.flush()
+            self._write_message(notification)
         except Exception as e:
             print(f"[LSP] Notification failed: {e}")
 
-    def _read_response(self) -> Optional[Dict[str, Any]]:
-        """Read JSON-RPC response from stdout, skipping server notifications."""
-        if not self.process or not self.process.stdout:
-            return None
+    def _write_message(self, message: Dict[str, Any]):
+        """Frame and write one message (requests, notifications and replies share stdin)."""
+        # Content-Length counts BYTES (not characters)
+        message_bytes = json.dumps(message).encode("utf-8")
+        header = f"Content-Length: {len(message_bytes)}\r\n\r\n"
+        with self._write_lock:
+            self.process.stdin.write(header.encode("utf-8") + message_bytes)
+            self.process.stdin.flush()
+
+    def _complete(self, request_id: Any, response: Optional[Dict[str, Any]]) -> bool:
+        """
+        Resolve a pending request's future and free its window slot.
+
+        Returns:
+            False if the request was no longer pending (a late response to a
+            cancelled request, or a cancellation racing the response)
+        """
+        with self._pending_lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is not None and response is not None:
+                self._consecutive_timeouts = 0
+        if entry is None:
+            return False
+        self._window.release()
+        entry[0].set_result(response)
+        return True
 
+    def _read_loop(self):
+        """
+        Reader thread: dispatch every message from the server.
+
+        Responses resolve their pending request; server-to-client requests
+        (e.g. workspace/configuration) get an empty reply so the server does
+        not wait on us; $/progress notifications update the indexing state
+        and other notifications are dropped. When the stream ends, requests
+        still pending resolve to None.
+        """
+        reader = MessageReader(self.process.stdout)
         try:
-            # Keep reading messages until we get a response (has 'id' field)
-            # Skip server notifications (no 'id' field)
             while True:
-                # Read headers until \r\n\r\n (binary mode)
-                headers = b""
-                while not headers.endswith(b"\r\n\r\n"):
-                    byte = self.process.stdout.read(1)
-                    if not byte:
-                        return None
-                    headers += byte
-
-                # Parse Content-Length from headers
-                length = None
-                for line in headers.decode("utf-8").split("\r\n"):
-                    if line.startswith("Content-Length:"):
-                        length = int(line.split(":")[1].strip())
-                        break
-
-                if length is None:
-                    return None
-
-                # Read exact number of bytes
-                body = self.process.stdout.read(length)
-                message = json.loads(body.decode("utf-8"))
-
-                # If this is a response (has 'id'), return it
-                # If it's a notification (no 'id'), skip and continue reading
-                if "id" in message:
-                    return message
-                # else: it's a server notification, skip it and read next message
-
+                message = reader.read_message()
+                if message is None:
+                    break
+                if "method" not in message:
+                    self._complete(message.get("id"), message)
+                elif "id" in message:
+                    self._reply_to_server(message)
+                elif message["method"] == "$/progress":
+                    self._track_progress(message.get("params") or {})
         except Exception as e:
             print(f"[LSP] Failed to read response: {e}")
-            return None
+        finally:
+            with self._pending_lock:
+                pending = list(self._pending)
+            for request_id in pending:
+                self._complete(request_id, None)
+            self._progress_idle.set()
+
+    def _track_progress(self, params: Dict[str, Any]):
+        """Follow work-done progress begin/end pairs by token."""
+        token = params.get("token")
+        kind = (params.get("value") or {}).get("kind")
+        if kind == "begin":
+            self._active_progress.add(token)
+            self._progress_idle.clear()
+        elif kind == "end":
+            self._active_progress.discard(token)
+            if not self._active_progress:
+                self._progress_idle.set()
+
+    def _reply_to_server(self, request: Dict[str, Any]):
+        """
+        Answer a server-to-client request. Configuration requests point the
+        "python" section at this interpreter, so imports resolve against the
+        environment running the scan; everything else gets an empty result.
+        """
+        result = None
+        if request["method"] == "workspace/configuration":
+            result = [
+                {"pythonPath": sys.executable} if item.get("section") == "python" else None
+                for item in request.get("params", {}).get("items", [])
+            ]
+        try:
+            self._write_message({"jsonrpc": "2.0", "id": request["id"], "result": result})
+        except Exception:
+            pass  # Server is going away; the reader will notice EOF
 
     def _next_id(self) -> int:
         """Generate next request ID."""
-        self.request_id += 1
-        return self.request_id
+        with self._pending_lock:
+            self.request_id += 1
+            return self.request_id
 
     def __enter__(self):
         """Context manager entry."""
@@ -0,0 +1,56 @@
+-- Migration to v0.5: Integer entity keys
+-- Purpose: Replace 36-byte UUID text keys with INTEGER PRIMARY KEY rowids.
+-- The UUID is kept once per entity in entities.uuid as the stable external key;
+-- parent_id, metadata.entity_id, relations.from_id and relations.to_id hold
+-- the compact integer key.
+-- Note: Applied by schema.py, which copies existing rows from the v0.4 tables.
+
+-- 1. ENTITIES table (Hierarchy + LSP enhancements)
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,       -- Internal key (rowid alias)
+    uuid TEXT NOT NULL UNIQUE,    -- Stable external key
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,           -- module, class, function
+    visibility TEXT NOT NULL,     -- public, private
+    parent_id INTEGER,            -- NULL for top-level, foreign key for nested
+    symbol_hash TEXT DEFAULT NULL,  -- LSP correlation (v0.3.1)
+    line_start INTEGER DEFAULT 0,   -- LSP line tracking (v0.3.1)
+    line_end INTEGER DEFAULT 0,     -- LSP line tracking (v0.3.1)
+    FOREIGN KEY (parent_id) REFERENCES entities(id) ON DELETE CASCADE
+);
+
+-- 2. METADATA table (Language-agnostic details + type hints)
+CREATE TABLE IF NOT EXISTS metadata (
+    entity_id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    raw_docstring TEXT,
+    signature TEXT,               -- Function/method signature
+    cmm_type TEXT,                -- Constructor, Method, Display, etc.
+    method_kind TEXT,             -- static, class, instance
+    type_hint TEXT DEFAULT NULL,  -- LSP type enrichment (v0.3.1)
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    FOREIGN KEY (entity_id) REFERENCES entities(id) ON DELETE CASCADE
+);
+
+-- 3. RELATIONS table (Dependencies + verification tracking)
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_id INTEGER NOT NULL,
+    to_id INTEGER,                -- NULL if unresolved (Lazy Linking)
+    to_name TEXT NOT NULL,        -- String name for lazy resolution
+    rel_type TEXT NOT NULL,       -- calls, inherits, imports, depends_on
+    is_verified INTEGER DEFAULT 0, -- LSP verification flag (v0.3.1)
+    FOREIGN KEY (from_id) REFERENCES entities(id) ON DELETE CASCADE,
+    FOREIGN KEY (to_id) REFERENCES entities(id) ON DELETE SET NULL
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_entities_parent ON entities(parent_id);
+CREATE INDEX IF NOT EXISTS idx_entities_symbol_hash ON entities(symbol_hash);
+CREATE INDEX IF NOT EXISTS idx_relations_from ON relations(from_id);
+CREATE INDEX IF NOT EXISTS idx_relations_to_name ON relations(to_name);
+CREATE INDEX IF NOT EXISTS idx_relations_verified ON relations(is_verified);
+
+-- Unique constraint for UPSERT support (Sprint 5.3)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_relations_unique ON relations(from_id, to_name, rel_type);
@@ -1,15 +1,27 @@
-from typing import Protocol, List, Dict, Any
-from tree_sitter import Parser, Language, Query, QueryCursor, Node
+from typing import Protocol, List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched
+from tree_sitter import Parser, Language, Query, QueryCursor, Node, Tree
 from tree_sitter_python import language
-from domain import CMMEntity
+from domain import CMMEntity, CallSite, ScanResult
+from functools import partial
 from normalizer import PythonNormalizer
+import hashlib
+import multiprocessing
 import os
+import traceback
+
+
+def _body_hash(def_node: Node) -> str:
+    """MD5 of a definition's source bytes (its Tree-sitter node range)."""
+    return hashlib.md5(def_node.text).hexdigest()
 
 
 class ParserPort(Protocol):
     """A port for a file parser that extracts CMM entities."""
 
-    def scan_file(self, file_path: str) -> CMMEntity:
+    def scan_file(self, file_path: str, source: Optional[bytes] = None) -> CMMEntity:
         """Scans a file and returns a CMMEntity."""
         ...
 
@@ -107,19 +119,50 @@ class TreeSitterParser(ParserPort):
 
         self.debug_mode = os.environ.get("CMM_DEBUG") == "1"
 
-    def extract_call_sites(self, file_path: str) -> List[Any]:
+    def _parse(self, file_path: str, source: Optional[bytes] = None) -> Tree:
+        """Parse a file's bytes, reading them from disk unless provided."""
+        if source is None:
+            with open(file_path, "rb") as f:
+                source = f.read()
+
+        return self.parser.parse(source)
+
+    def extract_call_sites(
+        self, file_path: str, source: Optional[bytes] = None
+    ) -> List[CallSite]:
         """
         Extract all function/method call sites with precise LSP-compatible locations.
 
-        This is a second parse specifically for LSP integration. Returns location
-        data that scan_file() discards for performance.
+        This is a second parse specifically for LSP integration. Prefer
+        scan_file_with_call_sites() when the entity tree is needed as well.
         """
-        from domain import CallSite
+        return self._collect_call_sites(self._parse(file_path, source), file_path)
 
-        with open(file_path, "r") as f:
-            content = f.read()
+    def scan_file(self, file_path: str, source: Optional[bytes] = None) -> CMMEntity:
+        """Scans a file and returns a CMMEntity.
 
-        tree = self.parser.parse(bytes(content, "utf8"))
+        Args:
+            source: File contents already loaded by the caller (read if omitted)
+        """
+        return self._build_cmm_entity(self._parse(file_path, source))
+
+    def scan_file_with_call_sites(
+        self, file_path: str, source: Optional[bytes] = None
+    ) -> ScanResult:
+        """
+        Scan a file and extract its LSP call sites from the same parse.
+
+        Equivalent to scan_file() followed by extract_call_sites(), at the
+        cost of a single read and a single Tree-sitter parse.
+        """
+        tree = self._parse(file_path, source)
+        return ScanResult(
+            cmm_entity=self._build_cmm_entity(tree),
+            call_sites=self._collect_call_sites(tree, file_path),
+        )
+
+    def _collect_call_sites(self, tree: Tree, file_path: str) -> List[CallSite]:
+        """Run the call query over a parsed tree and keep non-builtin calls."""
         cursor = QueryCursor(self.call_query)
         captures_dict = cursor.captures(tree.root_node)
 
@@ -133,12 +176,8 @@ class TreeSitterParser(ParserPort):
 
         return call_sites
 
-    def scan_file(self, file_path: str) -> CMMEntity:
-        """Scans a file and returns a CMMEntity."""
-        with open(file_path, "r") as f:
-            content = f.read()
-
-        tree = self.parser.parse(bytes(content, "utf8"))
+    def _build_cmm_entity(self, tree: Tree) -> CMMEntity:
+        """Build the normalized CMM entity tree from a parsed tree."""
         cursor = QueryCursor(self.cmm_query)
         captures_dict = cursor.captures(tree.root_node)
 
@@ -231,6 +270,7 @@ class TreeSitterParser(ParserPort):
             "name": class_name,
             "line_start": class_node.start_point[0],
             "line_end": class_node.end_point[0],
+            "body_hash": _body_hash(class_node),
             "methods": [],
             "docstring": "",
             "dependencies": [],
@@ -252,6 +292,7 @@ class TreeSitterParser(ParserPort):
             "name": function_name,
             "line_start": func_node.start_point[0],
             "line_end": func_node.end_point[0],
+            "body_hash": _body_hash(func_node),
             "docstring": "",
             "method_kind": "instance",
             "dependencies": [],
@@ -383,3 +424,85 @@ class TreeSitterParser(ParserPort):
                         entity["_is_nested"] = True
                     break
                 current = current.parent
+
+
+# ========== Parallel Scanning ==========
+
+# Each pool worker owns one parser (and its compiled queries), created once
+# by the pool initializer and reused for every file the worker receives.
+_worker_parser: Optional[TreeSitterParser] = None
+
+
+def _init_scan_worker():
+    """Process pool initializer: build this worker's TreeSitterParser."""
+    global _worker_parser
+    _worker_parser = TreeSitterParser()
+
+
+def _scan_in_worker(
+    file_path: str, source: bytes, with_call_sites: bool = False
+) -> Tuple[str, Optional[ScanResult], Optional[str]]:
+    """Scan one file inside a pool worker.
+
+    Exceptions are returned as formatted tracebacks instead of being raised,
+    so one broken file does not abort the whole pool.
+    """
+    try:
+        if with_call_sites:
+            result = _worker_parser.scan_file_with_call_sites(file_path, source)
+        else:
+            result = ScanResult(cmm_entity=_worker_parser.scan_file(file_path, source))
+        return file_path, result, None
+    except Exception:
+        return file_path, None, traceback.format_exc()
+
+
+def _scan_chunk_in_worker(
+    chunk: Tuple[Tuple[str, bytes], ...], with_call_sites: bool = False
+) -> List[Tuple[str, Optional[ScanResult], Optional[str]]]:
+    """Scan a batch of (file_path, source) pairs inside a pool worker."""
+    return [
+        _scan_in_worker(file_path, source, with_call_sites)
+        for file_path, source in chunk
+    ]
+
+
+def scan_files_parallel(
+    sources: Iterable[Tuple[str, bytes]],
+    workers: int,
+    with_call_sites: bool = False,
+    chunksize: int = 16,
+) -> Iterator[Tuple[str, Optional[ScanResult], Optional[str]]]:
+    """
+    Scan already-loaded files across a process pool, yielding results in input order.
+
+    Sources are consumed lazily: at most two chunks per worker are in flight,
+    so file contents are not all held in memory at once.
+
+    Args:
+        sources: (file_path, source bytes) pairs
+        workers: Number of worker processes
+        with_call_sites: Also extract LSP call sites from the same parse
+        chunksize: Files handed to a worker per round trip
+
+    Yields:
+        (file_path, scan_result, error) tuples; exactly one of scan_result
+        and error is None.
+    """
+    # "spawn" keeps workers independent of the parent's threads (e.g. the
+    # rich progress refresher), which a plain fork would copy mid-flight.
+    context = multiprocessing.get_context("spawn")
+    scan = partial(_scan_chunk_in_worker, with_call_sites=with_call_sites)
+    max_pending = workers * 2
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_scan_worker
+    ) as pool:
+        pending = deque()
+        for chunk in batched(sources, chunksize):
+            pending.append(pool.submit(scan, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
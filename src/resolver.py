@@ -1,6 +1,7 @@
 import sqlite3
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+from connection import connect
 
 
 @dataclass
@@ -33,7 +34,7 @@ class DependencyResolver:
         Returns:
             Dictionary mapping entity names to their resolved dependencies
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path, "readonly")
         cursor = conn.cursor()
 
         # 1. identifying all entities in this file from metadata
@@ -179,6 +180,24 @@ class DependencyResolver:
 
         return results
 
+    def get_name_index(self) -> Dict[str, List[int]]:
+        """
+        Ids of the entities carrying each name, for the whole project.
+
+        The exact-name match of _find_entity, done for every name at once so
+        callers can tell unique names from ambiguous ones without a query
+        per name. Unlike the lazy linker, no file is excluded: a call may
+        target an entity of the caller's own file.
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            index: Dict[str, List[int]] = {}
+            for entity_id, name in conn.execute("SELECT id, name FROM entities ORDER BY id"):
+                index.setdefault(name, []).append(entity_id)
+            return index
+        finally:
+            conn.close()
+
     def get_dependency_graph(self, file_path: str) -> Dict[str, Any]:
         """
         Build a dependency graph for a file.
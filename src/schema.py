@@ -0,0 +1,617 @@
+"""
+Schema Manager: versioned migrations for the CMM SQLite database.
+
+The applied schema version is tracked in PRAGMA user_version, so opening an
+up-to-date database costs a single pragma read. Migrations run once, in
+order, and upgrade existing rows in place (ALTER/rename/copy steps), so
+verified relations and type hints survive schema changes. Data backfills
+run in batches and report progress. An existing database is backed up
+before it is upgraded.
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from connection import connect
+
+MIGRATION_V04_PATH = Path(__file__).parent / "migration_v0.4.sql"
+MIGRATION_V05_PATH = Path(__file__).parent / "migration_v0.5.sql"
+
+BACKFILL_BATCH_SIZE = 500
+
+# progress(description, done, total)
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class SchemaVersionError(Exception):
+    """Raised when a database's schema version cannot be used as it is: newer
+    than this code knows, or older while upgrading is not allowed."""
+
+
+@dataclass
+class Migration:
+    """One schema step. apply() must be idempotent: it may be re-run if the
+    process dies before the new user_version is recorded."""
+
+    version: int
+    label: str  # Human-readable schema label (e.g. "v0.4")
+    description: str
+    apply: Callable[[sqlite3.Connection, Optional[ProgressCallback]], None]
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Add each missing column (name -> declaration) to a table."""
+    existing = _columns(conn, table)
+    for name, declaration in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+
+def _backfill_in_batches(
+    conn: sqlite3.Connection,
+    rows: List[tuple],
+    compute: Callable[[tuple], Optional[tuple]],
+    update_sql: str,
+    description: str,
+    progress: Optional[ProgressCallback],
+    batch_size: int = BACKFILL_BATCH_SIZE,
+):
+    """
+    Apply update_sql to rows in committed batches.
+
+    compute() maps a row to the update parameters, or None to leave it alone.
+    Committing per batch keeps the write lock short on large databases; a
+    re-run after an interruption simply recomputes the same values.
+    """
+    total = len(rows)
+    if progress:
+        progress(description, 0, total)
+
+    for start in range(0, total, batch_size):
+        batch = rows[start : start + batch_size]
+        params = [p for p in (compute(row) for row in batch) if p is not None]
+        conn.executemany(update_sql, params)
+        conn.commit()
+        if progress:
+            progress(description, start + len(batch), total)
+
+
+def _rename_v03_tables(conn: sqlite3.Connection):
+    """Rename v0.3/v0.3.1 tables to their v0.4 names and add missing columns."""
+    for old, new in (("files_v3", "files"), ("entities_v3", "entities")):
+        if _table_exists(conn, old) and not _table_exists(conn, new):
+            # SQLite rewrites FOREIGN KEY references to the renamed table
+            conn.execute(f"ALTER TABLE {old} RENAME TO {new}")
+
+    _ensure_columns(
+        conn,
+        "files",
+        {
+            "schema_version": "TEXT NOT NULL DEFAULT 'v0.3'",
+            "created_at": "TEXT NOT NULL DEFAULT ''",
+            "updated_at": "TEXT NOT NULL DEFAULT ''",
+        },
+    )
+    _ensure_columns(
+        conn,
+        "entities",
+        {
+            "symbol_hash": "TEXT DEFAULT NULL",
+            "line_start": "INTEGER DEFAULT 0",
+            "line_end": "INTEGER DEFAULT 0",
+        },
+    )
+    if _table_exists(conn, "metadata"):
+        _ensure_columns(conn, "metadata", {"type_hint": "TEXT DEFAULT NULL"})
+    if _table_exists(conn, "relations"):
+        _ensure_columns(conn, "relations", {"is_verified": "INTEGER DEFAULT 0"})
+        # The v0.4 unique index needs distinct (from_id, to_name, rel_type);
+        # among duplicates keep the verified row.
+        conn.execute("""
+            DELETE FROM relations
+            WHERE rowid NOT IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY from_id, to_name, rel_type
+                        ORDER BY is_verified DESC, rowid
+                    ) AS rank
+                    FROM relations
+                )
+                WHERE rank = 1
+            )
+        """)
+    conn.commit()
+
+
+def _create_v04_schema(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v1: the v0.4 base schema (files, entities, metadata, relations).
+
+    - New database: run migration_v0.4.sql as is.
+    - v0.3/v0.3.1 database (*_v3 tables): rename tables in place.
+    - Unversioned v0.4 database: only create missing objects.
+
+    In the last two cases the script's DROP TABLE statements are skipped, so
+    existing relations, verification flags and type hints survive.
+    """
+    schema_sql = MIGRATION_V04_PATH.read_text()
+
+    if _table_exists(conn, "files_v3") or _table_exists(conn, "entities_v3"):
+        if progress:
+            progress("Renaming v0.3 tables", 0, 1)
+        _rename_v03_tables(conn)
+        if progress:
+            progress("Renaming v0.3 tables", 1, 1)
+
+    if _table_exists(conn, "files"):
+        schema_sql = "\n".join(
+            line
+            for line in schema_sql.splitlines()
+            if not line.lstrip().upper().startswith("DROP TABLE")
+        )
+    conn.executescript(schema_sql)
+
+
+def _add_file_stat_columns(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v2: mtime/size/inode columns for the stat-based change detection.
+
+    Backfills the stat metadata of files whose content still matches the
+    stored hash, so the first scan after upgrading can skip them unread.
+    """
+    from storage import compute_file_hash
+
+    _ensure_columns(
+        conn, "files", {"mtime_ns": "INTEGER", "size": "INTEGER", "inode": "INTEGER"}
+    )
+    conn.commit()
+
+    def stat_if_unchanged(row: tuple) -> Optional[tuple]:
+        file_id, file_path, file_hash = row
+        try:
+            file_stat = os.stat(file_path)
+            if compute_file_hash(file_path) != file_hash:
+                return None
+        except OSError:
+            return None
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino, file_id
+
+    rows = conn.execute(
+        "SELECT id, file_path, file_hash FROM files WHERE mtime_ns IS NULL"
+    ).fetchall()
+    _backfill_in_batches(
+        conn,
+        rows,
+        stat_if_unchanged,
+        "UPDATE files SET mtime_ns = ?, size = ?, inode = ? WHERE id = ?",
+        "Backfilling file stat metadata",
+        progress,
+    )
+
+
+def _execute_statements(conn: sqlite3.Connection, sql: str):
+    """Run a SQL script statement by statement (executescript() would commit)."""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        if line.lstrip().startswith("--"):
+            continue
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+# Copy steps, in order: entities, parent links, metadata, relations
+_INTEGER_ID_COPY_STEPS = [
+    """
+        INSERT INTO entities (uuid, name, type, visibility, symbol_hash, line_start, line_end)
+        SELECT id, name, type, visibility, symbol_hash, line_start, line_end
+        FROM entities_v04 ORDER BY rowid
+    """,
+    """
+        UPDATE entities SET parent_id = (
+            SELECT p.id FROM entities_v04 o JOIN entities p ON p.uuid = o.parent_id
+            WHERE o.id = entities.uuid
+        )
+    """,
+    """
+        INSERT INTO metadata (entity_id, file_path, raw_docstring, signature, cmm_type,
+                              method_kind, type_hint, created_at, updated_at)
+        SELECT e.id, m.file_path, m.raw_docstring, m.signature, m.cmm_type,
+               m.method_kind, m.type_hint, m.created_at, m.updated_at
+        FROM metadata_v04 m JOIN entities e ON e.uuid = m.entity_id
+    """,
+    """
+        INSERT INTO relations (from_id, to_id, to_name, rel_type, is_verified)
+        SELECT f.id, t.id, r.to_name, r.rel_type, r.is_verified
+        FROM relations_v04 r
+        JOIN entities f ON f.uuid = r.from_id
+        LEFT JOIN entities t ON t.uuid = r.to_id
+        ORDER BY r.id
+    """,
+]
+
+
+def _use_integer_entity_ids(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v3: INTEGER PRIMARY KEY entity ids, the UUID kept as entities.uuid.
+
+    Rebuilds entities, metadata and relations in one transaction: the v0.4
+    tables are renamed aside, the v0.5 tables created, rows copied with
+    their text keys mapped to rowids, and the old tables dropped. Verified
+    relations and type hints are carried over.
+    """
+    if "uuid" in _columns(conn, "entities"):
+        return
+
+    tables = ("entities", "metadata", "relations")
+    total = len(_INTEGER_ID_COPY_STEPS)
+    conn.commit()
+    # Keep references in the renamed tables as they are
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("BEGIN")
+        for table in tables:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v04")
+        # Indexes move with their table; free the names for the new ones
+        old_indexes = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            "AND tbl_name IN ('entities_v04', 'metadata_v04', 'relations_v04')"
+        ).fetchall()
+        for (index_name,) in old_indexes:
+            conn.execute(f"DROP INDEX {index_name}")
+
+        _execute_statements(conn, MIGRATION_V05_PATH.read_text())
+
+        for done, sql in enumerate(_INTEGER_ID_COPY_STEPS):
+            if progress:
+                progress("Converting entity ids", done, total)
+            conn.execute(sql)
+
+        for table in reversed(tables):
+            conn.execute(f"DROP TABLE {table}_v04")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+
+    if progress:
+        progress("Converting entity ids", total, total)
+
+
+def _backfill_symbol_hashes(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v4: deterministic entities.symbol_hash (file path, qualified name, kind).
+
+    Re-scans match stored entities by this hash to keep their identity, so
+    existing rows get it computed the same way the scanner does.
+    """
+    from storage import compute_symbol_hash
+
+    rows = conn.execute("""
+        SELECT e.id, e.parent_id, e.name, e.type, e.line_start, m.file_path
+        FROM entities e
+        JOIN metadata m ON e.id = m.entity_id
+        WHERE e.symbol_hash IS NULL
+        ORDER BY e.id
+    """).fetchall()
+    parents = dict(conn.execute("SELECT id, parent_id FROM entities"))
+    names = dict(conn.execute("SELECT id, name FROM entities"))
+
+    def qualified_name(entity_id: int) -> str:
+        parts = []
+        while entity_id is not None:
+            parts.append(names[entity_id])
+            entity_id = parents.get(entity_id)
+        return ".".join(reversed(parts))
+
+    # Number redefinitions in source order, as the scanner does
+    occurrences: Dict[tuple, int] = {}
+    hashes = {}
+    for entity_id, _, _, kind, _, file_path in sorted(rows, key=lambda r: (r[5], r[4], r[0])):
+        name = qualified_name(entity_id)
+        key = (file_path, name, kind)
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        hashes[entity_id] = compute_symbol_hash(file_path, name, kind, occurrence)
+
+    _backfill_in_batches(
+        conn,
+        rows,
+        lambda row: (hashes[row[0]], row[0]),
+        "UPDATE entities SET symbol_hash = ? WHERE id = ?",
+        "Computing symbol hashes",
+        progress,
+    )
+
+
+def _index_metadata_file_path(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """v5: index metadata.file_path, used to load a file's stored entities for diffing."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_metadata_file_path ON metadata(file_path)"
+    )
+
+
+def _add_verification_columns(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v6: per-entity body hash and LSP verification state.
+
+    body_hash is the MD5 of the definition's source bytes; verified_hash and
+    verified_at record the body hash and time of the last LSP pass over the
+    entity's call sites, so Pass 2 can skip entities that did not change.
+    """
+    _ensure_columns(
+        conn,
+        "entities",
+        {
+            "body_hash": "TEXT DEFAULT NULL",
+            "verified_hash": "TEXT DEFAULT NULL",
+            "verified_at": "TEXT DEFAULT NULL",
+        },
+    )
+
+
+def _create_call_sites_table(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v7: exact position of every call site, keyed by its enclosing entity.
+
+    Written by the syntax scan so the LSP pass reads call sites from the
+    database instead of re-parsing. Stored file hashes are cleared so the
+    next scan re-parses every file once and fills the table; entity ids are
+    preserved by the symbol_hash diff.
+    """
+    if _table_exists(conn, "call_sites"):
+        return
+    conn.execute(
+        """
+        CREATE TABLE call_sites (
+            id INTEGER PRIMARY KEY,
+            entity_id INTEGER NOT NULL,
+            callee_name TEXT NOT NULL,
+            line INTEGER NOT NULL,        -- 0-based (LSP convention)
+            character INTEGER NOT NULL,   -- 0-based column
+            FOREIGN KEY (entity_id) REFERENCES entities(id) ON DELETE CASCADE
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_call_sites_entity ON call_sites(entity_id)"
+    )
+    conn.execute("UPDATE files SET file_hash = '', mtime_ns = NULL")
+
+
+def _add_type_hint_hash(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v8: body hash an entity had when its type hint was captured.
+
+    A stored type hint is reused across runs (no hover) while it matches the
+    entity's current body_hash. Existing hints have no hash and are
+    refreshed once.
+    """
+    _ensure_columns(conn, "metadata", {"type_hint_hash": "TEXT DEFAULT NULL"})
+
+
+def _create_definition_cache_table(
+    conn: sqlite3.Connection, progress: Optional[ProgressCallback] = None
+):
+    """
+    v9: LSP definition results of call sites, reused across runs.
+
+    An entry holds while both the calling file and the file the definition
+    lies in still have the hashes recorded with it.
+    """
+    if _table_exists(conn, "definition_cache"):
+        return
+    conn.execute(
+        """
+        CREATE TABLE definition_cache (
+            caller_path TEXT NOT NULL,
+            line INTEGER NOT NULL,        -- call site, 0-based
+            character INTEGER NOT NULL,
+            caller_hash TEXT NOT NULL,
+            target_path TEXT NOT NULL,
+            target_line INTEGER NOT NULL,
+            target_character INTEGER NOT NULL,
+            target_hash TEXT NOT NULL,
+            PRIMARY KEY (caller_path, line, character)
+        )
+    """
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "v0.4", "Base schema", _create_v04_schema),
+    Migration(2, "v0.4.1", "File stat columns", _add_file_stat_columns),
+    Migration(3, "v0.5", "Integer entity ids", _use_integer_entity_ids),
+    Migration(4, "v0.5.1", "Deterministic symbol hashes", _backfill_symbol_hashes),
+    Migration(5, "v0.5.2", "Metadata file path index", _index_metadata_file_path),
+    Migration(6, "v0.5.3", "Entity body hashes", _add_verification_columns),
+    Migration(7, "v0.5.4", "Call sites table", _create_call_sites_table),
+    Migration(8, "v0.5.5", "Type hint hashes", _add_type_hint_hash),
+    Migration(9, "v0.5.6", "Definition cache", _create_definition_cache_table),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def version_for_label(label: str) -> int:
+    """Map a schema label (e.g. "v0.4") to its version number."""
+    for migration in MIGRATIONS:
+        if migration.label == label:
+            return migration.version
+    known = ", ".join(m.label for m in MIGRATIONS)
+    raise ValueError(f"Unknown schema version '{label}' (known: {known})")
+
+
+def label_for_version(version: int) -> str:
+    """Map a version number to its schema label ("unversioned" for 0)."""
+    for migration in MIGRATIONS:
+        if migration.version == version:
+            return migration.label
+    return "unversioned" if version == 0 else f"#{version}"
+
+
+class SchemaManager:
+    """Applies pending migrations to a database, tracked via PRAGMA user_version."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def current_version(self) -> int:
+        """Return the schema version recorded in the database (0 if unversioned)."""
+        conn = connect(self.db_path, "readonly")
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    def is_new(self) -> bool:
+        """True if the database does not exist yet or has no tables."""
+        if not os.path.exists(self.db_path):
+            return True
+        conn = connect(self.db_path, "readonly")
+        try:
+            return conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+        finally:
+            conn.close()
+
+    def backup(self, version_label: str) -> str:
+        """
+        Copy the database next to itself, including pages still in the WAL.
+
+        Args:
+            version_label: Schema label for the backup filename (e.g. 'v0.4')
+
+        Returns:
+            Path to the backup file
+        """
+        backup_path = f"{self.db_path}.{version_label}.backup"
+        source = connect(self.db_path, "readonly")
+        target = sqlite3.connect(backup_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        return backup_path
+
+    def restore(self, backup_path: str):
+        """Overwrite the database with a backup taken by backup()."""
+        source = sqlite3.connect(backup_path)
+        target = connect(self.db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def ensure_current(self, upgrade: bool = True) -> List[Migration]:
+        """
+        Bring the database up to SCHEMA_VERSION (see upgrade()).
+
+        A new database is created directly. An existing database that is
+        behind is backed up first (see backup()) and restored if a
+        migration fails.
+
+        Args:
+            upgrade: If False, an existing database that is behind is left
+                untouched and SchemaVersionError is raised instead
+
+        Returns:
+            The migrations that were applied (empty if already current)
+
+        Raises:
+            SchemaVersionError: If the database is newer than this code, or
+                behind while upgrade is False
+        """
+        if self.is_new():
+            return self.upgrade()
+        version = self.current_version()
+        if version >= SCHEMA_VERSION:
+            return self.upgrade()  # Raises if newer
+
+        label = label_for_version(version)
+        if not upgrade:
+            raise SchemaVersionError(
+                f"Database {self.db_path} has schema {label}, older than "
+                f"{label_for_version(SCHEMA_VERSION)}; run `parser migrate` first"
+            )
+        backup_path = self.backup(label)
+        try:
+            return self.upgrade()
+        except Exception:
+            self.restore(backup_path)
+            raise
+
+    def upgrade(
+        self,
+        target: int = SCHEMA_VERSION,
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[Migration]:
+        """
+        Apply pending migrations in order, up to and including target.
+
+        Args:
+            target: Schema version to stop at
+            progress: Optional callback for batched backfill progress
+
+        Returns:
+            The migrations that were applied (empty if already current)
+
+        Raises:
+            SchemaVersionError: If the database is newer than this code
+        """
+        conn = connect(self.db_path, "bulk-load")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise SchemaVersionError(
+                    f"Database {self.db_path} has schema version {version}, "
+                    f"newer than supported version {SCHEMA_VERSION}"
+                )
+            if version >= target:
+                return []
+
+            applied = []
+            for migration in MIGRATIONS:
+                if migration.version <= version or migration.version > target:
+                    continue
+                migration.apply(conn, progress)
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+                conn.commit()
+                applied.append(migration)
+            return applied
+        finally:
+            conn.close()
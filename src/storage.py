@@ -1,10 +1,136 @@
+import os
 import sqlite3
 import hashlib
+import time
 import uuid
-from typing import Protocol, Optional, Dict, Any, List
-from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Protocol, Optional, Dict, Any, Iterable, List, Tuple
 from datetime import datetime
-from domain import CMMEntity
+from domain import CallSite, CMMEntity
+from connection import connect
+from schema import SchemaManager
+
+
+def compute_content_hash(content: bytes) -> str:
+    """Compute MD5 hash of already-loaded file contents."""
+    return hashlib.md5(content).hexdigest()
+
+
+def compute_file_hash(file_path: str) -> str:
+    """Compute MD5 hash of a file's contents."""
+    with open(file_path, "rb") as f:
+        return compute_content_hash(f.read())
+
+
+@dataclass
+class FileState:
+    """Stored change-detection fingerprint of a scanned file."""
+
+    file_hash: str
+    mtime_ns: Optional[int] = None
+    size: Optional[int] = None
+    inode: Optional[int] = None
+
+    def matches_stat(self, file_stat: os.stat_result) -> bool:
+        """True if the file's stat metadata is unchanged since it was stored."""
+        return (
+            self.mtime_ns == file_stat.st_mtime_ns
+            and self.size == file_stat.st_size
+            and self.inode == file_stat.st_ino
+        )
+
+
+def _stat_columns(
+    file_stat: Optional[os.stat_result],
+) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """Split a stat result into (mtime_ns, size, inode) column values."""
+    if file_stat is None:
+        return None, None, None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+def compute_symbol_hash(
+    file_path: str, qualified_name: str, kind: str, occurrence: int = 0
+) -> str:
+    """
+    Deterministic identity of an entity: SHA256 of file path, qualified name
+    and kind. occurrence > 0 disambiguates redefinitions of the same name
+    (e.g. a function defined in both branches of an if).
+    """
+    key = f"{file_path}#{qualified_name}#{kind}"
+    if occurrence:
+        key += f"#{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _EntityRow:
+    """One parsed entity with its metadata and outgoing relations."""
+
+    name: str
+    type: str
+    visibility: str
+    qualified_name: str
+    line_start: int
+    line_end: int
+    raw_docstring: Optional[str]
+    cmm_type: str
+    method_kind: Optional[str]
+    body_hash: Optional[str] = None  # MD5 of the definition's source bytes
+    parent: Optional["_EntityRow"] = None
+    relations: List[Tuple[str, str]] = field(default_factory=list)  # (to_name, rel_type)
+    symbol_hash: str = ""
+    id: Optional[int] = None  # Assigned when matched or inserted
+    uuid: Optional[str] = None
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        return self.parent.id if self.parent else None
+
+    def entity_values(self) -> tuple:
+        """Column values of the entities row (as stored, without keys)."""
+        return (
+            self.name,
+            self.type,
+            self.visibility,
+            self.parent_id,
+            self.line_start,
+            self.line_end,
+            self.body_hash,
+        )
+
+    def metadata_values(self) -> tuple:
+        """Parsed column values of the metadata row."""
+        return self.raw_docstring, self.cmm_type, self.method_kind
+
+
+def _locate_call_sites(
+    rows: List[_EntityRow], call_sites: List[CallSite]
+) -> List[Tuple[int, CallSite]]:
+    """
+    Pair each call site with the id of its innermost enclosing entity.
+
+    One sweep over entities and sites sorted by line, with a stack of the
+    entities open at the current line. Sites outside every entity are dropped.
+    """
+    entities = sorted(rows, key=lambda r: (r.line_start, -r.line_end))
+    located: List[Tuple[int, CallSite]] = []
+    open_entities: List[_EntityRow] = []
+    next_entity = 0
+
+    for site in sorted(call_sites, key=lambda s: (s.line, s.character)):
+        while next_entity < len(entities) and entities[next_entity].line_start <= site.line:
+            entity = entities[next_entity]
+            while open_entities and open_entities[-1].line_end < entity.line_start:
+                open_entities.pop()
+            open_entities.append(entity)
+            next_entity += 1
+        # Entities nest, so the ones that ended are on top of the stack
+        while open_entities and open_entities[-1].line_end < site.line:
+            open_entities.pop()
+        if open_entities:
+            located.append((open_entities[-1].id, site))
+    return located
 
 
 class StoragePort(Protocol):
@@ -18,7 +144,14 @@ class StoragePort(Protocol):
         """Retrieves a file's CMM entities from storage."""
         ...
 
-    def upsert_file(self, file_path: str, cmm_entity: CMMEntity) -> None:
+    def upsert_file(
+        self,
+        file_path: str,
+        cmm_entity: CMMEntity,
+        file_hash: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None,
+        call_sites: Optional[List[CallSite]] = None,
+    ) -> None:
         """Updates or inserts a file's CMM entities based on file hash."""
         ...
 
@@ -26,16 +159,17 @@ class StoragePort(Protocol):
 class SQLiteStorage(StoragePort):
     """A storage adapter that uses SQLite to persist CMM entities."""
 
-    def __init__(self, db_path: str = "./cmm.db"):
+    def __init__(self, db_path: str = "./cmm.db", upgrade: bool = True):
         self.db_path = db_path
-        self._init_db()
+        self._external_hashes: Dict[str, Optional[str]] = {}
+        self._init_db(upgrade)
 
     def get_hierarchical_intent(self) -> List[Dict[str, Any]]:
         """
         Retrieves the hierarchical intent structure.
         Returns a list of root (module) entities, each containing their children.
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path, "readonly")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
@@ -110,7 +244,7 @@ class SQLiteStorage(StoragePort):
         Returns:
             List of root modules with nested children and relations
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path, "readonly")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -156,34 +290,17 @@ class SQLiteStorage(StoragePort):
             conn.close()
 
 
-    def _init_db(self):
-        """Initialize the database schema using v0.4 migration script."""
-        migration_path = Path(__file__).parent / "migration_v0.4.sql"
-
-        # Fallback if file doesn't exist (e.g. running from different context)
-        if not migration_path.exists():
-            # In production, we might embed the SQL string here
-            # For now, we expect the file to exist as per plan
-            print(f"Warning: Migration script not found at {migration_path}")
-            return
-
-        with open(migration_path, "r") as f:
-            schema_sql = f.read()
-
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Enable foreign keys for this connection (and future ones)
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        # Execute migration script (creates tables if not exist)
-        cursor.executescript(schema_sql)
+    def _init_db(self, upgrade: bool = True):
+        """
+        Bring the database schema up to date (a no-op for current databases).
 
-        conn.commit()
-        conn.close()
+        With upgrade=False (read-only commands), an outdated database raises
+        SchemaVersionError instead of being migrated.
+        """
+        SchemaManager(self.db_path).ensure_current(upgrade)
 
     def save_verified_relation(
-        self, from_id: str, to_id: str, rel_type: str, is_verified: bool = True
+        self, from_id: int, to_id: int, rel_type: str, is_verified: bool = True
     ):
         """
         Save or update a verified relation.
@@ -192,7 +309,7 @@ class SQLiteStorage(StoragePort):
         - If relation (from_id, to_name) exists: UPDATE to_id and is_verified
         - If new: INSERT with is_verified=True
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         conn.execute("PRAGMA foreign_keys = ON;")
         cursor = conn.cursor()
 
@@ -228,15 +345,18 @@ class SQLiteStorage(StoragePort):
         finally:
             conn.close()
 
-    def save_type_hint(self, entity_id: str, type_hint: str):
+    def save_type_hint(self, entity_id: int, type_hint: str):
         """
         Save or update type hint for an entity.
 
+        The entity's current body hash is stored with it, see
+        get_current_type_hint_ids().
+
         Args:
-            entity_id: Entity UUID
+            entity_id: Entity id
             type_hint: Type signature (e.g., "(x: int, y: int) -> int")
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         conn.execute("PRAGMA foreign_keys = ON;")
         cursor = conn.cursor()
 
@@ -244,10 +364,11 @@ class SQLiteStorage(StoragePort):
             cursor.execute(
                 """
                 UPDATE metadata
-                SET type_hint = ?
+                SET type_hint = ?,
+                    type_hint_hash = (SELECT body_hash FROM entities WHERE id = ?)
                 WHERE entity_id = ?
             """,
-                (type_hint, entity_id),
+                (type_hint, entity_id, entity_id),
             )
 
             conn.commit()
@@ -257,19 +378,299 @@ class SQLiteStorage(StoragePort):
         finally:
             conn.close()
 
+    def get_current_type_hint_ids(self) -> set:
+        """
+        Ids of entities whose stored type hint was captured from their
+        current body, so hovering them again would return the same hint.
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute(
+                """
+                SELECT e.id
+                FROM entities e
+                JOIN metadata m ON e.id = m.entity_id
+                WHERE m.type_hint IS NOT NULL AND m.type_hint_hash = e.body_hash
+            """
+            )
+            return {row[0] for row in cursor}
+        finally:
+            conn.close()
+
+    def get_entities_to_verify(self) -> Dict[str, set]:
+        """
+        Find entities whose call sites need (re-)resolution by the LSP pass.
+
+        An entity is stale if it was never verified, if its body changed
+        since it was last verified, or if a verified relation of it points
+        into a file that changed since then (or at an entity that is gone).
+
+        Returns:
+            Mapping of file path to the ids of its stale entities
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute("""
+                SELECT e.id, m.file_path
+                FROM entities e
+                JOIN metadata m ON e.id = m.entity_id
+                WHERE e.verified_at IS NULL OR e.verified_hash IS NOT e.body_hash
+                UNION
+                SELECT e.id, m.file_path
+                FROM entities e
+                JOIN metadata m ON e.id = m.entity_id
+                JOIN relations r ON r.from_id = e.id AND r.is_verified = 1
+                LEFT JOIN metadata tm ON tm.entity_id = r.to_id
+                LEFT JOIN files tf ON tf.file_path = tm.file_path
+                WHERE r.to_id IS NULL OR tf.updated_at > e.verified_at
+            """)
+            stale: Dict[str, set] = {}
+            for entity_id, file_path in cursor:
+                stale.setdefault(file_path, set()).add(entity_id)
+            return stale
+        finally:
+            conn.close()
+
+    def get_verification_priorities(self, stale: Dict[str, set]) -> Dict[str, float]:
+        """
+        Rank files with stale entities by what verifying them is worth.
+
+        Each stale entity scores 1 plus, per relation, the number of
+        relations pointing at that callee name in the project (names no
+        entity carries, such as library calls, count 0). Public entities
+        count twice, and so do files changed since the last LSP pass.
+
+        Args:
+            stale: Result of get_entities_to_verify
+
+        Returns:
+            Mapping of file path to its priority (higher first)
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            references = dict(
+                conn.execute("""
+                    SELECT to_name, COUNT(*) FROM relations
+                    WHERE to_name IN (SELECT name FROM entities)
+                    GROUP BY to_name
+                """)
+            )
+            last_pass = conn.execute(
+                "SELECT MAX(verified_at) FROM entities"
+            ).fetchone()[0]
+            cursor = conn.execute("""
+                SELECT m.file_path, e.id, e.visibility, f.updated_at, r.to_name
+                FROM entities e
+                JOIN metadata m ON e.id = m.entity_id
+                JOIN files f ON f.file_path = m.file_path
+                LEFT JOIN relations r ON r.from_id = e.id
+            """)
+            scores: Dict[Tuple[str, int], float] = {}
+            changed = set()
+            for file_path, entity_id, visibility, updated_at, to_name in cursor:
+                if entity_id not in stale.get(file_path, ()):
+                    continue
+                weight = 2 if visibility == "public" else 1
+                key = (file_path, entity_id)
+                scores[key] = scores.get(key, weight) + weight * references.get(
+                    to_name, 0
+                )
+                if last_pass is None or updated_at > last_pass:
+                    changed.add(file_path)
+
+            priorities = {file_path: 0.0 for file_path in stale}
+            for (file_path, _), score in scores.items():
+                priorities[file_path] += score
+            for file_path in changed:
+                priorities[file_path] *= 2
+            return priorities
+        finally:
+            conn.close()
+
+    def mark_verified(self, entity_ids: Iterable[int]):
+        """Record that the LSP pass resolved these entities' current bodies."""
+        now = datetime.now().isoformat()
+        conn = connect(self.db_path)
+        try:
+            conn.executemany(
+                "UPDATE entities SET verified_hash = body_hash, verified_at = ? WHERE id = ?",
+                [(now, entity_id) for entity_id in entity_ids],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _current_hash(self, conn: sqlite3.Connection, path: str) -> Optional[str]:
+        """
+        Current content hash of a definition's file: the stored hash for
+        scanned files, otherwise the file is hashed once per storage object
+        (definitions in the standard library or site-packages).
+        """
+        row = conn.execute(
+            "SELECT file_hash FROM files WHERE file_path = ?", (path,)
+        ).fetchone()
+        if row:
+            return row[0]
+        if path not in self._external_hashes:
+            try:
+                self._external_hashes[path] = compute_file_hash(path)
+            except OSError:
+                self._external_hashes[path] = None
+        return self._external_hashes[path]
+
+    def get_cached_definitions(
+        self, file_path: str
+    ) -> Dict[Tuple[int, int], Tuple[str, int, int]]:
+        """
+        Definitions of a file's call sites recorded by earlier LSP runs.
+
+        Only entries whose calling file and definition file both still have
+        the hashes they were recorded with are returned.
+
+        Returns:
+            Mapping of call site (line, character) to the definition's
+            (URI, line, character)
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute(
+                """
+                SELECT d.line, d.character, d.target_path, d.target_line,
+                       d.target_character, d.target_hash
+                FROM definition_cache d
+                JOIN files f ON f.file_path = d.caller_path AND f.file_hash = d.caller_hash
+                WHERE d.caller_path = ?
+            """,
+                (file_path,),
+            )
+            definitions = {}
+            for line, character, path, target_line, target_character, target_hash in (
+                cursor.fetchall()
+            ):
+                if self._current_hash(conn, path) == target_hash:
+                    definitions[(line, character)] = (
+                        f"file://{path}",
+                        target_line,
+                        target_character,
+                    )
+            return definitions
+        finally:
+            conn.close()
+
+    def save_definitions(
+        self, file_path: str, definitions: List[Tuple[int, int, str, int, int]]
+    ):
+        """
+        Record LSP definition results of a file's call sites (see
+        get_cached_definitions). Entries recorded for an older version of
+        the file are dropped.
+
+        Args:
+            file_path: Path of the calling file
+            definitions: (line, character, definition URI, definition line,
+                definition character) per call site
+        """
+        conn = connect(self.db_path)
+        try:
+            row = conn.execute(
+                "SELECT file_hash FROM files WHERE file_path = ?", (file_path,)
+            ).fetchone()
+            if not row:
+                return
+            caller_hash = row[0]
+            conn.execute(
+                "DELETE FROM definition_cache WHERE caller_path = ? AND caller_hash != ?",
+                (file_path, caller_hash),
+            )
+            rows = []
+            for line, character, uri, target_line, target_character in definitions:
+                target_path = uri[7:] if uri.startswith("file://") else uri
+                target_hash = self._current_hash(conn, target_path)
+                if target_hash:
+                    rows.append(
+                        (
+                            file_path,
+                            line,
+                            character,
+                            caller_hash,
+                            target_path,
+                            target_line,
+                            target_character,
+                            target_hash,
+                        )
+                    )
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO definition_cache
+                    (caller_path, line, character, caller_hash, target_path,
+                     target_line, target_character, target_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                rows,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
     def _compute_file_hash(self, file_path: str) -> str:
         """Compute MD5 hash of a file's contents."""
-        hasher = hashlib.md5()
-        with open(file_path, "rb") as f:
-            hasher.update(f.read())
-        return hasher.hexdigest()
+        return compute_file_hash(file_path)
 
-    def save_file(self, file_path: str, cmm_entity: CMMEntity) -> None:
-        """Saves a file's CMM entities to storage (v0.3 Schema)."""
-        file_hash = self._compute_file_hash(file_path)
+    def get_file_states(self) -> Dict[str, FileState]:
+        """
+        Return the stored change-detection fingerprint of every scanned file.
+
+        Lets a scan skip unchanged files before paying for a parse.
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute(
+                "SELECT file_path, file_hash, mtime_ns, size, inode FROM files"
+            )
+            return {row[0]: FileState(*row[1:]) for row in cursor}
+        finally:
+            conn.close()
+
+    def update_file_stats(self, file_stats: List[Tuple[str, os.stat_result]]):
+        """
+        Refresh stored stat metadata of files whose content did not change.
+
+        Called for files that were touched (e.g. by a checkout) but hash the
+        same, so the next scan can skip them on stat metadata alone.
+        """
+        if not file_stats:
+            return
+
+        conn = connect(self.db_path)
+        try:
+            conn.executemany(
+                "UPDATE files SET mtime_ns = ?, size = ?, inode = ? WHERE file_path = ?",
+                [(*_stat_columns(st), file_path) for file_path, st in file_stats],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_file(
+        self,
+        file_path: str,
+        cmm_entity: CMMEntity,
+        file_hash: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None,
+        call_sites: Optional[List[CallSite]] = None,
+    ) -> None:
+        """Saves a file's CMM entities to storage (v0.3 Schema).
+
+        Args:
+            file_hash: Precomputed content hash (computed from disk if omitted)
+            file_stat: Stat result taken before hashing, for the mtime/size fast path
+            call_sites: Call sites from the same parse (see _write_call_sites)
+        """
+        if file_hash is None:
+            file_hash = self._compute_file_hash(file_path)
         now = datetime.now().isoformat()
 
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         conn.execute("PRAGMA foreign_keys = ON;")
         cursor = conn.cursor()
 
@@ -277,27 +678,33 @@ class SQLiteStorage(StoragePort):
             # 1. Insert into files
             cursor.execute(
                 """
-                INSERT INTO files (file_path, file_hash, schema_version, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO files (file_path, file_hash, schema_version, created_at, updated_at,
+                                   mtime_ns, size, inode)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-                (file_path, file_hash, cmm_entity.schema_version, now, now),
+                (
+                    file_path,
+                    file_hash,
+                    cmm_entity.schema_version,
+                    now,
+                    now,
+                    *_stat_columns(file_stat),
+                ),
             )
 
             # 2. Save Entity Hierarchy
             # We don't have a 'file_id' FK in entities directly, we track file via METADATA table
             # Top-level entities have parent_id = NULL
-
-            for entity in cmm_entity.entities:
-                self._save_entity_recursive(
-                    cursor, entity, file_path, now, parent_id=None
-                )
+            rows = self._collect_file_rows(cmm_entity.entities, file_path)
+            self._insert_entities(cursor, rows, file_path, now)
+            self._write_call_sites(cursor, rows, file_path, call_sites)
 
             conn.commit()
         except sqlite3.IntegrityError:
             # File already exists, rollback and use upsert logic
             conn.rollback()
             conn.close()
-            self.upsert_file(file_path, cmm_entity)
+            self.upsert_file(file_path, cmm_entity, file_hash, file_stat, call_sites)
             return
         except Exception as e:
             conn.rollback()
@@ -305,16 +712,292 @@ class SQLiteStorage(StoragePort):
         finally:
             conn.close()
 
-    def _save_entity_recursive(
+    def _collect_file_rows(
+        self, entities: List[Dict[str, Any]], file_path: str
+    ) -> List[_EntityRow]:
+        """Flatten a file's entity tree (pre-order) and assign symbol hashes."""
+        rows: List[_EntityRow] = []
+        for entity in entities:
+            self._collect_entity_rows(entity, None, rows)
+
+        # Redefinitions share (qualified name, kind): number them in source order
+        occurrences: Dict[Tuple[str, str], int] = {}
+        for row in sorted(rows, key=lambda r: r.line_start):
+            key = (row.qualified_name, row.type)
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            row.symbol_hash = compute_symbol_hash(
+                file_path, row.qualified_name, row.type, occurrence
+            )
+        return rows
+
+    def _insert_entities(
         self,
         cursor: sqlite3.Cursor,
-        entity: Dict[str, Any],
+        rows: List[_EntityRow],
+        file_path: str,
+        now: str,
+    ):
+        """Insert entity rows (and their metadata/relations) with one executemany() per table."""
+        # Integer keys are assigned up front so children can reference
+        # parents without a round trip per row (we hold the write lock)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM entities")
+        next_id = cursor.fetchone()[0]
+        for row in rows:
+            row.id = next_id
+            row.uuid = str(uuid.uuid4())
+            next_id += 1
+
+        # Parents precede their children in rows (pre-order)
+        cursor.executemany(
+            """
+            INSERT INTO entities (id, uuid, symbol_hash, name, type, visibility,
+                                  parent_id, line_start, line_end, body_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            [(row.id, row.uuid, row.symbol_hash, *row.entity_values()) for row in rows],
+        )
+        # Signature is not parsed yet, leaving blank
+        cursor.executemany(
+            """
+            INSERT INTO metadata (entity_id, file_path, raw_docstring, signature, cmm_type, method_kind, created_at, updated_at)
+            VALUES (?, ?, ?, '', ?, ?, ?, ?)
+        """,
+            [
+                (
+                    row.id,
+                    file_path,
+                    row.raw_docstring,
+                    row.cmm_type,
+                    row.method_kind,
+                    now,
+                    now,
+                )
+                for row in rows
+            ],
+        )
+        # Insert relations with to_id=NULL (Lazy Resolution)
+        cursor.executemany(
+            """
+            INSERT INTO relations (from_id, to_name, rel_type)
+            VALUES (?, ?, ?)
+        """,
+            [(row.id, *relation) for row in rows for relation in row.relations],
+        )
+
+    def _sync_entities(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[_EntityRow],
         file_path: str,
         now: str,
-        parent_id: Optional[str],
+    ):
+        """
+        Reconcile a changed file's stored entities with its new parse.
+
+        Entities are matched by symbol_hash. Matched entities keep their id
+        and uuid, so relations pointing into this file (including
+        LSP-verified ones) and stored type hints survive the re-scan. Only
+        the differences are written: matched rows are updated only if a
+        column changed, entities that disappeared are deleted (cascading to
+        their metadata and relations), new ones are inserted, and outgoing
+        relations are diffed as a set.
+        """
+        cursor.execute(
+            """
+            SELECT e.symbol_hash, e.id, e.uuid,
+                   e.name, e.type, e.visibility, e.parent_id, e.line_start, e.line_end,
+                   e.body_hash, m.raw_docstring, m.cmm_type, m.method_kind
+            FROM entities e
+            JOIN metadata m ON e.id = m.entity_id
+            WHERE m.file_path = ?
+        """,
+            (file_path,),
+        )
+        stored = {}
+        stale_ids = set()
+        for symbol_hash, eid, euuid, *values in cursor:
+            stored[symbol_hash] = (eid, euuid, tuple(values[:7]), tuple(values[7:]))
+            stale_ids.add(eid)
+
+        matched, new = [], []
+        for row in rows:
+            if row.symbol_hash in stored:
+                row.id, row.uuid, _, _ = stored[row.symbol_hash]
+                stale_ids.discard(row.id)
+                matched.append(row)
+            else:
+                new.append(row)
+
+        # New entities first: a matched entity may move under a new parent.
+        # Parents of new entities are matched or earlier in pre-order.
+        self._insert_entities(cursor, new, file_path, now)
+
+        changed_entities = [
+            row for row in matched if row.entity_values() != stored[row.symbol_hash][2]
+        ]
+        changed_metadata = [
+            row for row in matched if row.metadata_values() != stored[row.symbol_hash][3]
+        ]
+        cursor.executemany(
+            """
+            UPDATE entities
+            SET name = ?, type = ?, visibility = ?, parent_id = ?,
+                line_start = ?, line_end = ?, body_hash = ?
+            WHERE id = ?
+        """,
+            [(*row.entity_values(), row.id) for row in changed_entities],
+        )
+        # type_hint and created_at are kept
+        cursor.executemany(
+            """
+            UPDATE metadata
+            SET raw_docstring = ?, cmm_type = ?, method_kind = ?, updated_at = ?
+            WHERE entity_id = ?
+        """,
+            [(*row.metadata_values(), now, row.id) for row in changed_metadata],
+        )
+        # Cascades to metadata, outgoing relations and any stale children
+        cursor.executemany(
+            "DELETE FROM entities WHERE id = ?", [(eid,) for eid in stale_ids]
+        )
+
+        # Outgoing relations: keep rows that are still parsed (with their
+        # to_id/is_verified), drop the rest, add the missing ones. A verified
+        # row names the definition, not the call (an import alias), so it is
+        # kept while its entity's body is unchanged: the entity is not stale
+        # and would not be resolved again to restore it
+        parsed = {(row.id, *relation) for row in matched for relation in row.relations}
+        unchanged_bodies = {
+            row.id for row in matched if row.body_hash == stored[row.symbol_hash][2][6]
+        }
+        cursor.execute(
+            """
+            SELECT r.id, r.from_id, r.to_name, r.rel_type, r.is_verified
+            FROM relations r
+            JOIN metadata m ON r.from_id = m.entity_id
+            WHERE m.file_path = ?
+        """,
+            (file_path,),
+        )
+        existing, kept_verified = {}, set()
+        for rel_id, from_id, to_name, rel_type, is_verified in cursor.fetchall():
+            existing[(from_id, to_name, rel_type)] = rel_id
+            if is_verified and from_id in unchanged_bodies:
+                kept_verified.add(rel_id)
+        new_ids = {row.id for row in new}
+        removed_relations = [
+            (rel_id,)
+            for key, rel_id in existing.items()
+            if key not in parsed and key[0] not in new_ids and rel_id not in kept_verified
+        ]
+        added_relations = [key for key in parsed if key not in existing]
+        cursor.executemany("DELETE FROM relations WHERE id = ?", removed_relations)
+        cursor.executemany(
+            "INSERT INTO relations (from_id, to_name, rel_type) VALUES (?, ?, ?)",
+            added_relations,
+        )
+
+    def _write_call_sites(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[_EntityRow],
+        file_path: str,
+        call_sites: Optional[List[CallSite]],
+    ):
+        """
+        Store a file's call sites, each under its innermost enclosing entity.
+
+        Sites outside every entity (module level) are not stored. The stored
+        set is diffed against the new one, so an unchanged site keeps its row.
+        Passing None stores no sites for the file.
+        """
+        parsed = [
+            (entity_id, site.name, site.line, site.character)
+            for entity_id, site in _locate_call_sites(rows, call_sites or [])
+        ]
+        cursor.execute(
+            """
+            SELECT c.id, c.entity_id, c.callee_name, c.line, c.character
+            FROM call_sites c
+            JOIN metadata m ON c.entity_id = m.entity_id
+            WHERE m.file_path = ?
+        """,
+            (file_path,),
+        )
+        existing = {tuple(values): site_id for site_id, *values in cursor.fetchall()}
+        parsed_keys = set(parsed)
+        cursor.executemany(
+            "DELETE FROM call_sites WHERE id = ?",
+            [(site_id,) for key, site_id in existing.items() if key not in parsed_keys],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO call_sites (entity_id, callee_name, line, character)
+            VALUES (?, ?, ?, ?)
+        """,
+            [key for key in parsed if key not in existing],
+        )
+
+    def get_call_sites(self, file_path: str) -> List[Tuple[int, CallSite]]:
+        """
+        Load the call sites stored for a file by the last syntax scan.
+
+        Returns:
+            (enclosing entity id, call site) pairs in source order
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute(
+                """
+                SELECT c.entity_id, c.callee_name, c.line, c.character
+                FROM call_sites c
+                JOIN metadata m ON c.entity_id = m.entity_id
+                WHERE m.file_path = ?
+                ORDER BY c.line, c.character
+            """,
+                (file_path,),
+            )
+            file_uri = f"file://{file_path}"
+            return [
+                (entity_id, CallSite(name, line, character, file_uri))
+                for entity_id, name, line, character in cursor
+            ]
+        finally:
+            conn.close()
+
+    def get_entity_lines(self, file_path: str) -> Dict[int, Tuple[str, str, int]]:
+        """
+        Name, type and first line (0-based) of every entity in a file.
+
+        Returns:
+            Mapping of entity id to (name, type, line_start)
+        """
+        conn = connect(self.db_path, "readonly")
+        try:
+            cursor = conn.execute(
+                """
+                SELECT e.id, e.name, e.type, e.line_start
+                FROM entities e
+                JOIN metadata m ON e.id = m.entity_id
+                WHERE m.file_path = ?
+            """,
+                (file_path,),
+            )
+            return {
+                entity_id: (name, kind, line) for entity_id, name, kind, line in cursor
+            }
+        finally:
+            conn.close()
+
+    def _collect_entity_rows(
+        self,
+        entity: Dict[str, Any],
+        parent: Optional[_EntityRow],
+        rows: List[_EntityRow],
         depth: int = 0,
     ):
-        """Recursively save an entity and its children.
+        """Recursively collect the rows of an entity and its children.
         
         Args:
             depth: Current recursion depth (safety limit: 100)
@@ -329,51 +1012,23 @@ class SQLiteStorage(StoragePort):
             )
             return
 
-        # Generate new UUID for this entity
-        entity_id = str(uuid.uuid4())
-
-        # Extract fields
         name = entity.get("name", "unknown")
-        entity_type = entity.get("type", "unknown")
-        visibility = entity.get("visibility", "public")
-        line_start = entity.get("line_start", 0)
-        line_end = entity.get("line_end", 0)
-
-        # 1. Insert into entities
-        cursor.execute(
-            """
-            INSERT INTO entities (id, name, type, visibility, parent_id, line_start, line_end)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-            (entity_id, name, entity_type, visibility, parent_id, line_start, line_end),
-        )
-
-        # 2. Insert into metadata
-        raw_docstring = entity.get("docstring", "")
-        cmm_type = entity.get("cmm_type", "")
-        method_kind = entity.get("method_kind")  # Optional
-
-        # Signature is not parsed yet, leaving blank or extracting if available (future)
-        signature = ""
-
-        cursor.execute(
-            """
-            INSERT INTO metadata (entity_id, file_path, raw_docstring, signature, cmm_type, method_kind, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                entity_id,
-                file_path,
-                raw_docstring,
-                signature,
-                cmm_type,
-                method_kind,
-                now,
-                now,
-            ),
+        row = _EntityRow(
+            name=name,
+            type=entity.get("type", "unknown"),
+            visibility=entity.get("visibility", "public"),
+            qualified_name=f"{parent.qualified_name}.{name}" if parent else name,
+            line_start=entity.get("line_start", 0),
+            line_end=entity.get("line_end", 0),
+            raw_docstring=entity.get("docstring", ""),
+            cmm_type=entity.get("cmm_type", ""),
+            method_kind=entity.get("method_kind"),  # Optional
+            body_hash=entity.get("body_hash"),
+            parent=parent,
         )
+        rows.append(row)
 
-        # 3. Insert into relations (Dependencies)
+        # Relations (Dependencies)
         # Deduplicate dependencies to avoid UNIQUE constraint violations
         dependencies = entity.get("dependencies", [])
         seen_relations = set()
@@ -392,35 +1047,34 @@ class SQLiteStorage(StoragePort):
             else:
                 continue
 
-            # Insert relation with to_id=NULL (Lazy Resolution)
             # Skip if we've already seen this (dep_name, rel_type) pair
             if dep_name:
                 relation_key = (dep_name, rel_type)
                 if relation_key not in seen_relations:
                     seen_relations.add(relation_key)
-                    cursor.execute(
-                        """
-                        INSERT INTO relations (from_id, to_name, rel_type)
-                        VALUES (?, ?, ?)
-                    """,
-                        (entity_id, dep_name, rel_type),
-                    )
+                    row.relations.append(relation_key)
 
-        # 4. Recursively save children (methods)
+        # Recursively collect children (methods)
         methods = entity.get("methods", [])
         for method in methods:
-            self._save_entity_recursive(
-                cursor, method, file_path, now, parent_id=entity_id, depth=depth + 1
-            )
+            self._collect_entity_rows(method, row, rows, depth=depth + 1)
 
-    def upsert_file(self, file_path: str, cmm_entity: CMMEntity) -> None:
-        """Updates or inserts a file's CMM entities based on file hash."""
-        file_hash = self._compute_file_hash(file_path)
-        now = datetime.now().isoformat()
+    def _write_file(
+        self,
+        cursor: sqlite3.Cursor,
+        file_path: str,
+        cmm_entity: CMMEntity,
+        file_hash: str,
+        file_stat: Optional[os.stat_result],
+        call_sites: Optional[List[CallSite]] = None,
+    ) -> bool:
+        """
+        Upsert one file's rows through an open cursor (no commit).
 
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA foreign_keys = ON;")
-        cursor = conn.cursor()
+        Returns:
+            False if the stored hash matched and entities were left untouched
+        """
+        now = datetime.now().isoformat()
 
         # Check existing file
         cursor.execute(
@@ -428,65 +1082,100 @@ class SQLiteStorage(StoragePort):
         )
         row = cursor.fetchone()
 
-        if row:
-            file_db_id, existing_hash = row
-            if existing_hash == file_hash:
-                conn.close()
-                return  # No changes
-
-            # Update file record
+        if row is None:
             cursor.execute(
                 """
-                UPDATE files 
-                SET file_hash = ?, schema_version = ?, updated_at = ?
-                WHERE id = ?
+                INSERT INTO files (file_path, file_hash, schema_version, created_at, updated_at,
+                                   mtime_ns, size, inode)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-                (file_hash, cmm_entity.schema_version, now, file_db_id),
+                (
+                    file_path,
+                    file_hash,
+                    cmm_entity.schema_version,
+                    now,
+                    now,
+                    *_stat_columns(file_stat),
+                ),
             )
+            rows = self._collect_file_rows(cmm_entity.entities, file_path)
+            self._insert_entities(cursor, rows, file_path, now)
+            self._write_call_sites(cursor, rows, file_path, call_sites)
+            return True
+
+        file_db_id, existing_hash = row
+        if existing_hash == file_hash:
+            if file_stat is not None:
+                # Content unchanged, but keep the stat fast path current
+                cursor.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ?, inode = ? WHERE id = ?",
+                    (*_stat_columns(file_stat), file_db_id),
+                )
+            return False  # No changes
 
-            # Delete old entities for this file
-            # Since we have ON DELETE CASCADE on metadata(entity_id) -> entities(id),
-            # we need to find all entities belonging to this file and delete them from entities.
-            # But entities doesn't have file_id. metadata has file_path.
+        # Update file record
+        cursor.execute(
+            """
+            UPDATE files 
+            SET file_hash = ?, schema_version = ?, updated_at = ?,
+                mtime_ns = ?, size = ?, inode = ?
+            WHERE id = ?
+        """,
+            (
+                file_hash,
+                cmm_entity.schema_version,
+                now,
+                *_stat_columns(file_stat),
+                file_db_id,
+            ),
+        )
 
-            # Find definitions in this file
-            cursor.execute(
-                "SELECT entity_id FROM metadata WHERE file_path = ?", (file_path,)
-            )
-            entity_ids = [r[0] for r in cursor.fetchall()]
+        rows = self._collect_file_rows(cmm_entity.entities, file_path)
+        self._sync_entities(cursor, rows, file_path, now)
+        self._write_call_sites(cursor, rows, file_path, call_sites)
+        return True
 
-            if entity_ids:
-                # Delete from entities. This triggers CASCADE delete on metadata and relations(from_id)
-                # We need to be careful about parent/child. Deleting parent deletes child (ON DELETE CASCADE in entities).
-                # So we just need to delete the entities found.
-                # Ideally, deleting top-level entities cascades down.
-                # Just deleting all IDs found in metadata should work, as long as we don't double-delete.
-                # Alternatively: delete from entities where id in (...)
+    def upsert_file(
+        self,
+        file_path: str,
+        cmm_entity: CMMEntity,
+        file_hash: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None,
+        call_sites: Optional[List[CallSite]] = None,
+    ) -> None:
+        """Updates or inserts a file's CMM entities based on file hash.
 
-                placeholders = ",".join("?" for _ in entity_ids)
-                cursor.execute(
-                    f"DELETE FROM entities WHERE id IN ({placeholders})", entity_ids
-                )
+        Args:
+            file_hash: Precomputed content hash (computed from disk if omitted)
+            file_stat: Stat result taken before hashing, for the mtime/size fast path
+            call_sites: Call sites from the same parse (see _write_call_sites)
+        """
+        if file_hash is None:
+            file_hash = self._compute_file_hash(file_path)
 
-            # Insert new entities
-            for entity in cmm_entity.entities:
-                self._save_entity_recursive(
-                    cursor, entity, file_path, now, parent_id=None
-                )
+        conn = connect(self.db_path)
+        conn.execute("PRAGMA foreign_keys = ON;")
 
+        try:
+            self._write_file(
+                conn.cursor(), file_path, cmm_entity, file_hash, file_stat, call_sites
+            )
             conn.commit()
-        else:
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
             conn.close()
-            # Delegating to save_file but careful about recursion if save_file calls upsert.
-            # Save_file calls upsert only on IntegrityError (duplicate file_path).
-            # Here we know file doesn't exist (if row is None), so calling save_file is safe.
-            self.save_file(file_path, cmm_entity)
 
-        conn.close()
+    def bulk_writer(
+        self, commit_every: int = 500, commit_interval: float = 5.0
+    ) -> "BulkWriter":
+        """Open a batched writer session for whole-directory scans."""
+        return BulkWriter(self, commit_every, commit_interval)
 
     def get_file(self, file_path: str) -> Optional[CMMEntity]:
         """Retrieves a file's CMM entities from storage (reconstructed from v0.3 schema)."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path, "readonly")
         cursor = conn.cursor()
 
         # Check file existence
@@ -577,3 +1266,105 @@ class SQLiteStorage(StoragePort):
         # Sort top level? Maybe not needed.
 
         return CMMEntity(schema_version=schema_version, entities=top_level_entities)
+
+
+class BulkWriter:
+    """
+    Batched writer session for whole-directory scans.
+
+    Holds one connection for the whole session and writes each file's
+    entities, metadata and relations with executemany(). Files are grouped
+    into transactions committed every `commit_every` files or every
+    `commit_interval` seconds, whichever comes first. Each file is written
+    inside its own savepoint, so a failing file rolls back alone.
+
+    Usage:
+        with storage.bulk_writer() as writer:
+            writer.upsert_file(file_path, cmm_entity, file_hash, file_stat, call_sites)
+    """
+
+    def __init__(
+        self,
+        storage: SQLiteStorage,
+        commit_every: int = 500,
+        commit_interval: float = 5.0,
+    ):
+        self.storage = storage
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.conn: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self._last_commit = 0.0
+
+    def __enter__(self) -> "BulkWriter":
+        # Autocommit mode: transactions are managed explicitly below
+        self.conn = connect(
+            self.storage.db_path, "bulk-load", isolation_level=None
+        )
+        self.conn.execute("PRAGMA foreign_keys = ON;")
+        self._begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Every file written so far is complete (savepoints), so keep them
+        try:
+            self.conn.execute("COMMIT")
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def upsert_file(
+        self,
+        file_path: str,
+        cmm_entity: CMMEntity,
+        file_hash: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None,
+        call_sites: Optional[List[CallSite]] = None,
+    ) -> None:
+        """Queue a file's upsert into the current batch (same semantics as SQLiteStorage.upsert_file)."""
+        if file_hash is None:
+            file_hash = self.storage._compute_file_hash(file_path)
+
+        cursor = self.conn.cursor()
+        cursor.execute("SAVEPOINT file_write")
+        try:
+            self.storage._write_file(
+                cursor, file_path, cmm_entity, file_hash, file_stat, call_sites
+            )
+        except Exception:
+            cursor.execute("ROLLBACK TO file_write")
+            raise
+        finally:
+            cursor.execute("RELEASE file_write")
+
+        self._pending += 1
+        self._maybe_commit()
+
+    def update_file_stats(self, file_stats: List[Tuple[str, os.stat_result]]):
+        """Refresh stat metadata of unchanged files within the current batch."""
+        if not file_stats:
+            return
+
+        self.conn.executemany(
+            "UPDATE files SET mtime_ns = ?, size = ?, inode = ? WHERE file_path = ?",
+            [(*_stat_columns(st), file_path) for file_path, st in file_stats],
+        )
+        self._pending += len(file_stats)
+        self._maybe_commit()
+
+    def flush(self):
+        """Commit the current batch now and start a new one."""
+        self.conn.execute("COMMIT")
+        self._begin()
+
+    def _begin(self):
+        self.conn.execute("BEGIN")
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def _maybe_commit(self):
+        if (
+            self._pending >= self.commit_every
+            or time.monotonic() - self._last_commit >= self.commit_interval
+        ):
+            self.flush()
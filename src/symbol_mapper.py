@@ -1,14 +1,13 @@
 """
-Symbol Mapper: Correlates LSP locations to CMM entity UUIDs.
+Symbol Mapper: Correlates LSP locations to CMM entity ids.
 
 Provides mapping between LSP file locations and database entity IDs,
 with caching to minimize database queries.
 """
 
-import hashlib
-import sqlite3
 from typing import Optional, Dict, Tuple, List
 from dataclasses import dataclass
+from connection import connect
 from lsp_client import Location
 
 
@@ -16,7 +15,7 @@ from lsp_client import Location
 class Entity:
     """Simplified entity representation for mapper."""
 
-    id: str
+    id: int
     name: str
     file_path: str
     line_start: int
@@ -24,7 +23,7 @@ class Entity:
 
 
 class SymbolMapper:
-    """Maps LSP locations to CMM entity UUIDs."""
+    """Maps LSP locations to CMM entity ids."""
 
     def __init__(self, storage):
         """
@@ -34,9 +33,8 @@ class SymbolMapper:
             storage: SQLiteStorage instance for database queries
         """
         self.storage = storage
-        self.conn = sqlite3.connect(storage.db_path)
-        self._location_cache: Dict[Tuple[str, int], str] = {}
-        self._symbol_hash_cache: Dict[str, str] = {}
+        self.conn = connect(storage.db_path)
+        self._location_cache: Dict[Tuple[str, int], int] = {}
         self._file_entity_cache: Dict[str, List[Entity]] = {}  # NEW
 
     def __del__(self):
@@ -44,15 +42,19 @@ class SymbolMapper:
         if hasattr(self, "conn"):
             self.conn.close()
 
-    def find_by_location(self, location: Location) -> Optional[str]:
+    def find_by_location(self, location: Location) -> Optional[int]:
         """
-        Find entity UUID by LSP location.
+        Find the entity defined at an LSP location.
+
+        A definition inside an entity's body that is not itself an entity
+        (a local variable, a parameter, an attribute) maps to None rather
+        than to the enclosing entity.
 
         Args:
             location: LSP Location with file URI and line number
 
         Returns:
-            Entity UUID or None if not found
+            Entity id or None if not found
         """
         # Convert file URI to path
         file_path = self._uri_to_path(location.uri)
@@ -71,38 +73,13 @@ class SymbolMapper:
 
         return entity_id
 
-    def generate_symbol_hash(self, file_uri: str, qualified_name: str) -> str:
+    def cache_location_to_uuid(self, location: Location, entity_id: int):
         """
-        Generate unique symbol hash for deduplication.
-
-        Args:
-            file_uri: File URI (e.g., "file:///path/to/file.py")
-            qualified_name: Fully qualified name (e.g., "MyClass.my_method")
-
-        Returns:
-            SHA256 hash as hex string
-        """
-        cache_key = f"{file_uri}#{qualified_name}"
-
-        if cache_key in self._symbol_hash_cache:
-            return self._symbol_hash_cache[cache_key]
-
-        # Create hash from URI + qualified name
-        hash_input = f"{file_uri}#{qualified_name}".encode("utf-8")
-        symbol_hash = hashlib.sha256(hash_input).hexdigest()
-
-        # Cache result
-        self._symbol_hash_cache[cache_key] = symbol_hash
-
-        return symbol_hash
-
-    def cache_location_to_uuid(self, location: Location, entity_id: str):
-        """
-        Cache a location-to-UUID mapping.
+        Cache a location-to-entity-id mapping.
 
         Args:
             location: LSP Location
-            entity_id: Entity UUID
+            entity_id: Entity id
         """
         file_path = self._uri_to_path(location.uri)
         cache_key = (file_path, location.line)
@@ -111,7 +88,6 @@ class SymbolMapper:
     def clear_cache(self):
         """Clear all cached mappings."""
         self._location_cache.clear()
-        self._symbol_hash_cache.clear()
 
     def _uri_to_path(self, uri: str) -> str:
         """
@@ -127,7 +103,7 @@ class SymbolMapper:
             return uri[7:]  # Remove 'file://' prefix
         return uri
 
-    def _query_entity_at_location(self, file_path: str, line: int) -> Optional[str]:
+    def _query_entity_at_location(self, file_path: str, line: int) -> Optional[int]:
         """
         Query database for entity at given file location.
 
@@ -136,14 +112,15 @@ class SymbolMapper:
             line: Line number (0-based from LSP, need to handle conversion)
 
         Returns:
-            Entity UUID or None
+            Entity id or None
         """
         # Note: LSP uses 0-based line numbers, but we might store 1-based
         # This implementation assumes 0-based storage; adjust if needed
 
         cursor = self.conn.cursor()
 
-        # Query for entity that contains this line
+        # Query for entity whose definition starts on this line (the
+        # def/class line, where Pyright points at its name)
         # Join entities with metadata to get file_path
         cursor.execute(
             """
@@ -151,39 +128,19 @@ class SymbolMapper:
             FROM entities e
             JOIN metadata m ON e.id = m.entity_id
             WHERE m.file_path = ?
-              AND e.line_start <= ?
-              AND e.line_end >= ?
+              AND e.line_start = ?
             ORDER BY (e.line_end - e.line_start) ASC
             LIMIT 1
         """,
-            (file_path, line, line),
+            (file_path, line),
         )
 
         result = cursor.fetchone()
         return result[0] if result else None
 
-    def update_symbol_hash(self, entity_id: str, symbol_hash: str):
-        """
-        Update symbol_hash for an entity in the database.
-
-        Args:
-            entity_id: Entity UUID
-            symbol_hash: Generated symbol hash
-        """
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            UPDATE entities
-            SET symbol_hash = ?
-            WHERE id = ?
-        """,
-            (symbol_hash, entity_id),
-        )
-        self.conn.commit()
-
-    def find_enclosing_entity(self, file_path: str, line: int) -> Optional[str]:
+    def find_enclosing_entity(self, file_path: str, line: int) -> Optional[int]:
         """
-        Find the entity UUID that contains the given line.
+        Find the entity id that contains the given line.
 
         Used to determine the "from_id" for a call relation.
 
@@ -192,7 +149,7 @@ class SymbolMapper:
             line: Line number (0-based, LSP convention)
 
         Returns:
-            Entity UUID or None if line is outside any entity
+            Entity id or None if line is outside any entity
         """
         # Load all entities for this file (cached)
         if file_path not in self._file_entity_cache:
@@ -55,6 +55,19 @@ class TestBodyTraversal(unittest.TestCase):
 
         self.assertIn("MyClass", call_names)
 
+    def test_scan_with_call_sites_matches_separate_passes(self):
+        result = self.parser.scan_file_with_call_sites(self.test_file)
+
+        self.assertEqual(result.cmm_entity, self.parser.scan_file(self.test_file))
+        position = lambda site: (site.line, site.character)
+        self.assertEqual(
+            sorted(result.call_sites, key=position),
+            sorted(self.parser.extract_call_sites(self.test_file), key=position),
+        )
+        call_names = {site.name for site in result.call_sites}
+        self.assertIn("helper", call_names)
+        self.assertNotIn("print", call_names)
+
 
 if __name__ == "__main__":
     unittest.main()
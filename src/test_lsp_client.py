@@ -4,14 +4,24 @@ Basic integration test for LSP client.
 Tests Pyright communication and fallback behavior.
 """
 
+import io
+import json
 import os
+import subprocess
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from lsp_client import LSPClient, Location, TypeInfo
+from lsp_client import (
+    NO_ANSWER,
+    STDERR_TAIL_LINES,
+    LSPClient,
+    Location,
+    MessageReader,
+    TypeInfo,
+)
 
 
 def test_lsp_availability():
@@ -82,6 +92,190 @@ def test_location_parsing():
     print("✓ Location list parsing works")
 
 
+# Reads three requests, answers a configuration request first, then
+# replies in reverse order with each request's line as the definition line.
+FAKE_SERVER = r"""
+import json, sys
+
+def read():
+    length = int(sys.stdin.buffer.readline().split(b":")[1])
+    sys.stdin.buffer.readline()
+    return json.loads(sys.stdin.buffer.read(length))
+
+def write(message):
+    body = json.dumps(message).encode()
+    sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    sys.stdout.buffer.flush()
+
+requests = [read() for _ in range(3)]
+write({"jsonrpc": "2.0", "method": "window/logMessage", "params": {}})
+write({"jsonrpc": "2.0", "id": "cfg", "method": "workspace/configuration",
+       "params": {"items": [{}, {}]}})
+reply = read()
+assert reply == {"jsonrpc": "2.0", "id": "cfg", "result": [None, None]}, reply
+for request in reversed(requests):
+    line = request["params"]["position"]["line"]
+    write({"jsonrpc": "2.0", "id": request["id"], "result": {
+        "uri": "file:///def.py", "range": {"start": {"line": line, "character": 0}}}})
+"""
+
+
+def test_pipelined_responses_matched_by_id():
+    """Out-of-order responses resolve the request with the same id."""
+    client = LSPClient(workspace_root=os.getcwd(), max_in_flight=3)
+    client._attach(
+        subprocess.Popen(
+            [sys.executable, "-c", FAKE_SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+    )
+    client._initialized = True
+
+    locations = client.get_definitions(
+        [("file:///use.py", line, 4) for line in (10, 20, 30)]
+    )
+    assert [loc.line for loc in locations] == [10, 20, 30]
+
+    # Server exited: later requests go unanswered instead of hanging
+    client.process.wait(timeout=5)
+    client._reader.join(timeout=5)
+    assert client.get_definition("file:///use.py", 40, 4) is NO_ANSWER
+    print("✓ Pipelined responses matched by id")
+
+
+# Floods stderr (a full, undrained pipe would block it), answers the first of
+# two requests and never the second, then expects the second to be cancelled.
+STALLING_SERVER = r"""
+import json, sys
+
+def read():
+    length = int(sys.stdin.buffer.readline().split(b":")[1])
+    sys.stdin.buffer.readline()
+    return json.loads(sys.stdin.buffer.read(length))
+
+def answer(request):
+    body = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {
+        "uri": "file:///def.py", "range": {"start": {"line": 1, "character": 0}}}}).encode()
+    sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    sys.stdout.buffer.flush()
+
+for i in range(20000):
+    sys.stderr.write("noisy log line %d\n" % i)
+sys.stderr.flush()
+first, second = read(), read()
+answer(first)
+cancel = read()
+assert cancel["method"] == "$/cancelRequest", cancel
+assert cancel["params"]["id"] == second["id"], cancel
+answer(read())
+"""
+
+
+def test_overdue_requests_are_cancelled():
+    """A lost response costs request_timeout; stderr is drained meanwhile."""
+    client = LSPClient(workspace_root=os.getcwd(), request_timeout=0.5)
+    client._attach(
+        subprocess.Popen(
+            [sys.executable, "-c", STALLING_SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    )
+    client._initialized = True
+
+    locations = client.get_definitions([("file:///use.py", line, 4) for line in (1, 2)])
+    assert locations[0] is not None and locations[1] is NO_ANSWER
+    assert client.timeouts == 1
+    assert client.recycle_reason() is None
+
+    # Answered only if the server received the cancellation first
+    assert client.get_definition("file:///use.py", 3, 4) is not None
+    assert client.stderr_tail().endswith("noisy log line 19999")
+    assert len(client.stderr_tail().splitlines()) == STDERR_TAIL_LINES
+    client._kill()
+    print("✓ Overdue requests cancelled")
+
+
+def test_stalled_server_is_left_to_the_caller_to_restart():
+    """After max_timeouts in a row, requests fail fast and recycle_reason says why."""
+    client = LSPClient(workspace_root=os.getcwd(), request_timeout=0.5, max_timeouts=1)
+    client._attach(
+        subprocess.Popen(
+            [sys.executable, "-c", STALLING_SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    )
+    client._initialized = True
+
+    locations = client.get_definitions([("file:///use.py", line, 4) for line in (1, 2)])
+    assert locations[1] is NO_ANSWER
+    assert client.recycle_reason() == "1 request(s) in a row timed out"
+    sent = client.requests_sent
+    assert client.get_definition("file:///use.py", 3, 4) is NO_ANSWER
+    assert client.requests_sent == sent and client.restarts == 0
+    client._kill()
+    print("✓ Stalled server left to the caller")
+
+
+def test_open_documents_are_bounded():
+    """Beyond max_open_documents, the least recently used document is closed."""
+    client = LSPClient(workspace_root=os.getcwd(), max_open_documents=2, max_files=3)
+    client._initialized = True
+    sent = []
+    client._send_notification = sent.append
+
+    for name in ("a", "b", "a", "c"):
+        client.open_document(f"file:///{name}.py", "")
+
+    closed = [
+        m["params"]["textDocument"]["uri"]
+        for m in sent
+        if m["method"] == "textDocument/didClose"
+    ]
+    assert closed == ["file:///b.py"]
+    assert list(client._open_documents) == ["file:///a.py", "file:///c.py"]
+    assert client.documents_opened == 3
+    assert client.recycle_reason() == "server exited"  # no process attached
+    print("✓ Open documents bounded")
+
+
+def test_message_reader_framing():
+    """Buffered framing: extra headers, UTF-8 bodies, truncated final message."""
+    first = json.dumps({"id": 1, "result": "naïve"}).encode("utf-8")
+    second = json.dumps({"method": "window/logMessage"}).encode("utf-8")
+    stream = io.BytesIO(
+        b"Content-Length: %d\r\n\r\n" % len(first)
+        + first
+        + b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n"
+        + b"Content-Length: %d\r\n\r\n" % len(second)
+        + second
+        + b"Content-Length: 100\r\n\r\n{\"id\""
+    )
+
+    reader = MessageReader(stream)
+    assert reader.read_message() == {"id": 1, "result": "naïve"}
+    assert reader.read_message() == {"method": "window/logMessage"}
+    assert reader.read_message() is None
+    print("✓ Message framing works")
+
+
+def test_ready_waits_for_progress_to_end():
+    """wait_until_ready() blocks while a $/progress token is open."""
+    client = LSPClient(workspace_root=os.getcwd())
+    client._track_progress({"token": "index", "value": {"kind": "begin"}})
+    client._track_progress({"token": "index", "value": {"kind": "report"}})
+    assert client.wait_until_ready(timeout=0.05) is False
+
+    client._track_progress({"token": "index", "value": {"kind": "end"}})
+    assert client.wait_until_ready(timeout=0.05) is True
+    assert client.indexing_seconds is not None
+    print("✓ Readiness follows $/progress")
+
+
 def test_type_info_parsing():
     """Test TypeInfo dataclass parsing."""
     # Test markdown string
@@ -104,6 +298,9 @@ if __name__ == "__main__":
         test_lsp_availability()
         test_location_parsing()
         test_type_info_parsing()
+        test_message_reader_framing()
+        test_ready_waits_for_progress_to_end()
+        test_pipelined_responses_matched_by_id()
         test_lsp_lifecycle()
         test_lsp_context_manager()
 
@@ -1,22 +1,41 @@
 import unittest
 import sqlite3
+import glob
 import os
-from domain import CMMEntity
-from storage import SQLiteStorage
+from unittest import mock
+from connection import connect
+from domain import CallSite, CMMEntity
+from schema import (
+    MIGRATION_V04_PATH,
+    MIGRATIONS,
+    SCHEMA_VERSION,
+    SchemaManager,
+    SchemaVersionError,
+)
+from storage import SQLiteStorage, compute_file_hash
 
 
 class TestSQLiteStorageV3(unittest.TestCase):
     def setUp(self):
         self.db_path = "test_cmm.db"
         # Ensure clean slate
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
+        self._remove_database()
 
         self.storage = SQLiteStorage(self.db_path)
 
     def tearDown(self):
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
+        self._remove_database()
+
+    def _remove_database(self):
+        """Delete the test database, its WAL sidecar files and migration backups."""
+        for path in (
+            self.db_path,
+            self.db_path + "-wal",
+            self.db_path + "-shm",
+            *glob.glob(self.db_path + ".*.backup"),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_schema_creation(self):
         """Verify that v0.3 tables are created."""
@@ -146,6 +165,549 @@ class TestSQLiteStorageV3(unittest.TestCase):
         if os.path.exists("dummy_update.py"):
             os.remove("dummy_update.py")
 
+    def test_rescan_keeps_identity_of_unchanged_entities(self):
+        """Matched entities keep their ids, so inbound verified relations survive."""
+
+        def module(methods, extra=()):
+            return CMMEntity(
+                schema_version="v0.3",
+                entities=[
+                    {
+                        "name": "Service",
+                        "type": "class",
+                        "methods": [
+                            {"name": name, "type": "function", "line_start": line}
+                            for line, name in enumerate(methods)
+                        ],
+                    },
+                    *extra,
+                ],
+            )
+
+        caller = CMMEntity(
+            schema_version="v0.3",
+            entities=[
+                {
+                    "name": "main",
+                    "type": "function",
+                    "dependencies": [{"name": "run", "rel_type": "calls"}],
+                }
+            ],
+        )
+        self.storage.save_file("/tmp/service.py", module(["run", "stop"]), file_hash="h1")
+        self.storage.save_file("/tmp/main.py", caller, file_hash="m1")
+
+        conn = sqlite3.connect(self.db_path)
+        ids = dict(conn.execute("SELECT name, id FROM entities"))
+        conn.close()
+        self.storage.save_verified_relation(ids["main"], ids["run"], "calls")
+        self.storage.save_type_hint(ids["run"], "(self) -> None")
+
+        # Edit: stop() removed, a duplicate helper() pair added
+        helpers = [
+            {"name": "helper", "type": "function", "line_start": 10},
+            {"name": "helper", "type": "function", "line_start": 20},
+        ]
+        self.storage.upsert_file(
+            "/tmp/service.py", module(["run"], helpers), file_hash="h2"
+        )
+
+        conn = sqlite3.connect(self.db_path)
+        after = conn.execute("SELECT name, id, symbol_hash FROM entities").fetchall()
+        self.assertEqual(
+            sorted(name for name, _, _ in after), ["Service", "helper", "helper", "main", "run"]
+        )
+        self.assertEqual(dict((n, i) for n, i, _ in after)["run"], ids["run"])
+        self.assertEqual(len({h for _, _, h in after}), 5)
+        self.assertEqual(
+            conn.execute(
+                "SELECT to_id, is_verified FROM relations WHERE from_id = ?", (ids["main"],)
+            ).fetchall(),
+            [(ids["run"], 1)],
+        )
+        self.assertEqual(
+            conn.execute(
+                "SELECT type_hint FROM metadata WHERE entity_id = ?", (ids["run"],)
+            ).fetchone()[0],
+            "(self) -> None",
+        )
+        conn.close()
+
+    def test_rescan_keeps_verified_relations_of_unchanged_bodies(self):
+        """An aliased call's verified relation survives edits elsewhere in the file."""
+
+        def module(g_body):
+            # f calls bar through `from b import bar as foo`
+            return CMMEntity(
+                schema_version="v0.3",
+                entities=[
+                    {
+                        "name": "f",
+                        "type": "function",
+                        "body_hash": "f1",
+                        "dependencies": [{"name": "foo", "rel_type": "calls"}],
+                    },
+                    {"name": "g", "type": "function", "body_hash": g_body},
+                ],
+            )
+
+        target = CMMEntity(
+            schema_version="v0.3", entities=[{"name": "bar", "type": "function"}]
+        )
+        self.storage.save_file("/tmp/b.py", target, file_hash="b1")
+        self.storage.save_file("/tmp/a.py", module("g1"), file_hash="a1")
+        conn = sqlite3.connect(self.db_path)
+        ids = dict(conn.execute("SELECT name, id FROM entities"))
+        conn.close()
+        self.storage.save_verified_relation(ids["f"], ids["bar"], "calls")
+        self.storage.mark_verified(ids.values())
+
+        def verified_relations():
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute(
+                "SELECT from_id, to_id FROM relations WHERE is_verified = 1"
+            ).fetchall()
+            conn.close()
+            return rows
+
+        # Editing g leaves f verified, so its relation must stay
+        self.storage.upsert_file("/tmp/a.py", module("g2"), file_hash="a2")
+        self.assertEqual(verified_relations(), [(ids["f"], ids["bar"])])
+        self.assertEqual(self.storage.get_entities_to_verify(), {"/tmp/a.py": {ids["g"]}})
+
+    def test_rescan_writes_only_changed_rows(self):
+        """Editing one function rewrites its rows only, not the whole file."""
+
+        def module(docstring):
+            return CMMEntity(
+                schema_version="v0.3",
+                entities=[
+                    {
+                        "name": f"func_{i}",
+                        "type": "function",
+                        "docstring": docstring if i == 3 else "",
+                        "line_start": 10 * i,
+                        "line_end": 10 * i + 5,
+                        "dependencies": [{"name": "helper", "rel_type": "calls"}],
+                    }
+                    for i in range(50)
+                ],
+            )
+
+        self.storage.save_file("/tmp/big.py", module("old"), file_hash="h1")
+
+        conn = connect(self.db_path)
+        conn.execute("PRAGMA foreign_keys = ON")
+        changed = self.storage._write_file(
+            conn.cursor(), "/tmp/big.py", module("new"), "h2", None
+        )
+        conn.commit()
+        self.assertTrue(changed)
+        # files row + one metadata row
+        self.assertEqual(conn.total_changes, 2)
+        conn.close()
+
+        entities = self.storage.get_file("/tmp/big.py").entities
+        docstrings = {e["name"]: e["docstring"] for e in entities}
+        self.assertEqual(docstrings["func_3"], "new")
+
+    def test_call_sites_are_stored_under_enclosing_entity(self):
+        """Call sites map to the innermost entity; module-level calls are dropped."""
+        file_path = "/tmp/sites.py"
+        module = CMMEntity(
+            schema_version="v0.3",
+            entities=[
+                {
+                    "name": "Service",
+                    "type": "class",
+                    "line_start": 0,
+                    "line_end": 10,
+                    "methods": [
+                        {"name": "run", "type": "function", "line_start": 2, "line_end": 4},
+                        {"name": "stop", "type": "function", "line_start": 6, "line_end": 8},
+                    ],
+                },
+            ],
+        )
+        uri = f"file://{file_path}"
+        sites = [
+            CallSite("setup", 12, 0, uri),
+            CallSite("start", 3, 8, uri),
+            CallSite("Base", 5, 4, uri),
+            CallSite("close", 7, 8, uri),
+        ]
+        self.storage.save_file(file_path, module, file_hash="h1", call_sites=sites)
+
+        conn = sqlite3.connect(self.db_path)
+        ids = dict(conn.execute("SELECT name, id FROM entities"))
+        conn.close()
+        self.assertEqual(
+            [(eid, site.name) for eid, site in self.storage.get_call_sites(file_path)],
+            [(ids["run"], "start"), (ids["Service"], "Base"), (ids["stop"], "close")],
+        )
+
+        # Re-scan: an unchanged site keeps its row, a removed one is deleted
+        conn = sqlite3.connect(self.db_path)
+        site_id = conn.execute(
+            "SELECT id FROM call_sites WHERE callee_name = 'start'"
+        ).fetchone()[0]
+        self.storage.upsert_file(file_path, module, file_hash="h2", call_sites=sites[:2])
+        self.assertEqual(
+            conn.execute("SELECT id, callee_name FROM call_sites").fetchall(),
+            [(site_id, "start")],
+        )
+        conn.close()
+
+    def test_type_hint_is_current_until_body_changes(self):
+        """A stored type hint only counts as current for the body it was hovered on."""
+
+        def module(body_hash):
+            return CMMEntity(
+                schema_version="v0.3",
+                entities=[{"name": "run", "type": "function", "body_hash": body_hash}],
+            )
+
+        self.storage.save_file("/tmp/hint.py", module("b1"), file_hash="h1")
+        conn = sqlite3.connect(self.db_path)
+        run_id = conn.execute("SELECT id FROM entities").fetchone()[0]
+        conn.close()
+        self.assertEqual(self.storage.get_current_type_hint_ids(), set())
+
+        self.storage.save_type_hint(run_id, "() -> None")
+        self.assertEqual(self.storage.get_current_type_hint_ids(), {run_id})
+
+        self.storage.upsert_file("/tmp/hint.py", module("b2"), file_hash="h2")
+        self.assertEqual(self.storage.get_current_type_hint_ids(), set())
+
+    def test_cached_definitions_follow_file_hashes(self):
+        """A cached definition holds until the caller or the target file changes."""
+        empty = CMMEntity(schema_version="v0.3", entities=[])
+        self.storage.save_file("/tmp/caller.py", empty, file_hash="c1")
+        self.storage.save_file("/tmp/target.py", empty, file_hash="t1")
+        self.storage.save_definitions(
+            "/tmp/caller.py",
+            [(3, 4, "file:///tmp/target.py", 10, 4), (5, 0, "file:///missing.py", 1, 0)],
+        )
+        self.assertEqual(
+            self.storage.get_cached_definitions("/tmp/caller.py"),
+            {(3, 4): ("file:///tmp/target.py", 10, 4)},
+        )
+
+        self.storage.upsert_file("/tmp/target.py", empty, file_hash="t2")
+        self.assertEqual(self.storage.get_cached_definitions("/tmp/caller.py"), {})
+
+        self.storage.save_definitions(
+            "/tmp/caller.py", [(3, 4, "file:///tmp/target.py", 11, 4)]
+        )
+        self.storage.upsert_file("/tmp/caller.py", empty, file_hash="c2")
+        self.assertEqual(self.storage.get_cached_definitions("/tmp/caller.py"), {})
+
+    def test_verification_priorities_favor_referenced_public_code(self):
+        """Calls into much-referenced names and public entities rank first."""
+        def calls(name, visibility):
+            return CMMEntity(
+                schema_version="v0.3",
+                entities=[
+                    {
+                        "name": name,
+                        "type": "function",
+                        "visibility": visibility,
+                        "dependencies": [{"name": "helper", "rel_type": "calls"}],
+                    }
+                ],
+            )
+
+        self.storage.save_file(
+            "/tmp/helper.py",
+            CMMEntity(
+                schema_version="v0.3",
+                entities=[{"name": "helper", "type": "function"}],
+            ),
+            file_hash="h1",
+        )
+        self.storage.save_file("/tmp/public.py", calls("run", "public"), file_hash="p1")
+        self.storage.save_file("/tmp/private.py", calls("_run", "private"), file_hash="q1")
+        self.storage.save_file(
+            "/tmp/external.py",
+            CMMEntity(
+                schema_version="v0.3",
+                entities=[
+                    {
+                        "name": "log",
+                        "type": "function",
+                        "dependencies": [{"name": "print", "rel_type": "calls"}],
+                    }
+                ],
+            ),
+            file_hash="e1",
+        )
+
+        stale = self.storage.get_entities_to_verify()
+        priorities = self.storage.get_verification_priorities(stale)
+        ranked = sorted(priorities, key=priorities.get, reverse=True)
+        self.assertEqual(ranked[:2], ["/tmp/public.py", "/tmp/private.py"])
+        # print is carried by no entity: it adds nothing
+        self.assertEqual(priorities["/tmp/external.py"], priorities["/tmp/helper.py"])
+
+    def test_bulk_writer_batches_files(self):
+        """Bulk writer session stores files like upsert_file, in batches."""
+        cmm = CMMEntity(
+            schema_version="v0.3",
+            entities=[
+                {
+                    "name": "Bulk",
+                    "type": "class",
+                    "dependencies": [{"name": "Base", "rel_type": "inherits"}],
+                    "methods": [{"name": "run", "type": "function"}],
+                }
+            ],
+        )
+
+        with self.storage.bulk_writer(commit_every=2) as writer:
+            for i in range(3):
+                writer.upsert_file(f"/bulk/file_{i}.py", cmm, file_hash=f"h{i}")
+
+            # A failing file is rolled back alone
+            with self.assertRaises(AttributeError):
+                writer.upsert_file("/bulk/broken.py", None, file_hash="hx")
+
+            # Unchanged hash: entities are left untouched
+            writer.upsert_file("/bulk/file_0.py", cmm, file_hash="h0")
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_path FROM files ORDER BY file_path")
+        self.assertEqual(
+            [r[0] for r in cursor.fetchall()],
+            ["/bulk/file_0.py", "/bulk/file_1.py", "/bulk/file_2.py"],
+        )
+        cursor.execute("SELECT COUNT(*) FROM entities")
+        self.assertEqual(cursor.fetchone()[0], 6)
+        cursor.execute("SELECT COUNT(*) FROM relations")
+        self.assertEqual(cursor.fetchone()[0], 3)
+        conn.close()
+
+        retrieved = self.storage.get_file("/bulk/file_1.py")
+        self.assertEqual(retrieved.entities[0]["methods"][0]["name"], "run")
+
+    def test_reopen_keeps_relations(self):
+        """Opening an existing database must not re-run destructive DDL."""
+        cmm = CMMEntity(
+            schema_version="v0.3",
+            entities=[
+                {
+                    "name": "Caller",
+                    "type": "function",
+                    "dependencies": [{"name": "callee", "rel_type": "calls"}],
+                }
+            ],
+        )
+        self.storage.save_file("/keep/me.py", cmm, file_hash="h")
+
+        reopened = SQLiteStorage(self.db_path)
+        self.assertEqual(SchemaManager(self.db_path).current_version(), SCHEMA_VERSION)
+        self.assertEqual(SchemaManager(self.db_path).ensure_current(), [])
+
+        retrieved = reopened.get_file("/keep/me.py")
+        self.assertEqual(retrieved.entities[0]["dependencies"][0]["name"], "callee")
+
+    def test_reads_run_while_bulk_writer_is_open(self):
+        """WAL mode lets readonly connections read during a bulk load."""
+        cmm = CMMEntity(
+            schema_version="v0.3",
+            entities=[{"name": "f", "type": "function", "visibility": "public"}],
+        )
+        self.storage.save_file("/tmp/a.py", cmm, file_hash="a")
+
+        with self.storage.bulk_writer() as writer:
+            writer.upsert_file("/tmp/b.py", cmm, file_hash="b")
+            # Uncommitted batch is invisible, committed data readable
+            self.assertEqual(set(self.storage.get_file_states()), {"/tmp/a.py"})
+            reader = connect(self.db_path, "readonly")
+            self.assertEqual(reader.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.execute("DELETE FROM files")
+            reader.close()
+
+        self.assertEqual(set(self.storage.get_file_states()), {"/tmp/a.py", "/tmp/b.py"})
+
+    def test_unknown_storage_profile(self):
+        with self.assertRaises(ValueError):
+            connect(self.db_path, "turbo")
+
+    def test_unversioned_database_is_upgraded_in_place(self):
+        """A pre-versioning v0.4 database keeps its rows and gets stamped."""
+        self._remove_database()
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(MIGRATION_V04_PATH.read_text())
+        conn.execute(
+            "INSERT INTO files (file_path, file_hash, created_at, updated_at) "
+            "VALUES ('/old.py', 'h', 'now', 'now')"
+        )
+        conn.execute(
+            "INSERT INTO entities (id, name, type, visibility) "
+            "VALUES ('e1', 'old', 'function', 'public')"
+        )
+        conn.execute(
+            "INSERT INTO relations (from_id, to_name, rel_type, is_verified) "
+            "VALUES ('e1', 'target', 'calls', 1)"
+        )
+        conn.commit()
+        conn.close()
+
+        # Read-only users refuse to migrate
+        with self.assertRaises(SchemaVersionError):
+            SQLiteStorage(self.db_path, upgrade=False)
+        self.assertEqual(SchemaManager(self.db_path).current_version(), 0)
+
+        SQLiteStorage(self.db_path)
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM relations").fetchone()[0], 1)
+        backup = sqlite3.connect(self.db_path + ".unversioned.backup")
+        self.assertEqual(backup.execute("PRAGMA user_version").fetchone()[0], 0)
+        self.assertEqual(backup.execute("SELECT COUNT(*) FROM files").fetchone()[0], 1)
+        backup.close()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+        self.assertTrue({"mtime_ns", "size", "inode"} <= columns)
+        conn.close()
+
+    def test_failed_upgrade_restores_backup(self):
+        """A migration error leaves the database as it was before the upgrade."""
+        self._remove_database()
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(MIGRATION_V04_PATH.read_text())
+        conn.execute(
+            "INSERT INTO files (file_path, file_hash, created_at, updated_at) "
+            "VALUES ('/old.py', 'h', 'now', 'now')"
+        )
+        conn.commit()
+        conn.close()
+
+        with mock.patch.object(MIGRATIONS[1], "apply", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                SQLiteStorage(self.db_path)
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 0)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+        self.assertNotIn("mtime_ns", columns)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM files").fetchone()[0], 1)
+        conn.close()
+
+    def test_v03_database_is_migrated_in_place(self):
+        """v0.3.1 tables are renamed and keep verified relations and type hints."""
+        self._remove_database()
+        source_path = self.db_path + ".src.py"
+        with open(source_path, "w") as f:
+            f.write("def old():\n    pass\n")
+        self.addCleanup(os.remove, source_path)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE files_v3 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT UNIQUE NOT NULL,
+                file_hash TEXT NOT NULL
+            );
+            CREATE TABLE entities_v3 (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                visibility TEXT NOT NULL,
+                parent_id TEXT,
+                symbol_hash TEXT DEFAULT NULL,
+                FOREIGN KEY (parent_id) REFERENCES entities_v3(id) ON DELETE CASCADE
+            );
+            CREATE TABLE metadata (
+                entity_id TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                raw_docstring TEXT,
+                signature TEXT,
+                cmm_type TEXT,
+                method_kind TEXT,
+                type_hint TEXT DEFAULT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (entity_id) REFERENCES entities_v3(id) ON DELETE CASCADE
+            );
+            CREATE TABLE relations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_id TEXT NOT NULL,
+                to_id TEXT,
+                to_name TEXT NOT NULL,
+                rel_type TEXT NOT NULL,
+                is_verified INTEGER DEFAULT 0,
+                FOREIGN KEY (from_id) REFERENCES entities_v3(id) ON DELETE CASCADE
+            );
+        """)
+        file_hash = compute_file_hash(source_path)
+        conn.execute(
+            "INSERT INTO files_v3 (file_path, file_hash) VALUES (?, ?)",
+            (source_path, file_hash),
+        )
+        conn.execute(
+            "INSERT INTO entities_v3 (id, name, type, visibility) "
+            "VALUES ('e1', 'old', 'function', 'public')"
+        )
+        conn.execute(
+            "INSERT INTO entities_v3 (id, name, type, visibility, parent_id) "
+            "VALUES ('e2', 'inner', 'function', 'public', 'e1')"
+        )
+        conn.execute(
+            "INSERT INTO metadata (entity_id, file_path, type_hint, created_at, updated_at) "
+            "VALUES ('e1', ?, '() -> None', 'then', 'then')",
+            (source_path,),
+        )
+        # Duplicate relation: only the verified row may survive
+        conn.execute(
+            "INSERT INTO relations (from_id, to_name, rel_type, is_verified) "
+            "VALUES ('e1', 'target', 'calls', 0)"
+        )
+        conn.execute(
+            "INSERT INTO relations (from_id, to_id, to_name, rel_type, is_verified) "
+            "VALUES ('e1', 'e1', 'target', 'calls', 1)"
+        )
+        conn.commit()
+        conn.close()
+
+        reports = []
+        applied = SchemaManager(self.db_path).upgrade(
+            progress=lambda *args: reports.append(args)
+        )
+        self.assertEqual([m.version for m in applied], list(range(1, SCHEMA_VERSION + 1)))
+        self.assertIn(("Backfilling file stat metadata", 1, 1), reports)
+
+        conn = sqlite3.connect(self.db_path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn("files_v3", tables)
+        self.assertNotIn("entities_v3", tables)
+        entity_id = conn.execute("SELECT id FROM entities WHERE uuid = 'e1'").fetchone()[0]
+        self.assertEqual(
+            conn.execute("SELECT parent_id FROM entities WHERE uuid = 'e2'").fetchone()[0],
+            entity_id,
+        )
+        self.assertEqual(
+            conn.execute("SELECT from_id, to_id, is_verified FROM relations").fetchall(),
+            [(entity_id, entity_id, 1)],
+        )
+        self.assertEqual(
+            conn.execute(
+                "SELECT type_hint FROM metadata WHERE entity_id = ?", (entity_id,)
+            ).fetchone()[0],
+            "() -> None",
+        )
+        # The call_sites migration forces a re-parse on the next scan
+        self.assertEqual(
+            conn.execute("SELECT file_hash, mtime_ns FROM files").fetchone(), ("", None)
+        )
+        # Foreign keys now point at the renamed table
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("DELETE FROM entities WHERE id = ?", (entity_id,))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0], 0)
+        conn.close()
+
 
 if __name__ == "__main__":
     unittest.main()
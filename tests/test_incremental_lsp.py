@@ -0,0 +1,268 @@
+import sqlite3
+import subprocess
+
+import pytest
+from typer.testing import CliRunner
+from cli import parser_app
+
+
+MODULE_A = """
+class Calculator:
+    def add(self, a, b):
+        return a + b
+"""
+
+MODULE_B = """
+from module_a import Calculator
+
+def use_calculator():
+    calc = Calculator()
+    return calc.add(1, 2)
+
+def unrelated():
+    return len([])
+"""
+
+
+@pytest.fixture(autouse=True)
+def require_pyright():
+    try:
+        subprocess.run(
+            ["python", "-m", "pyright", "--version"], capture_output=True, check=True
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        pytest.skip("Pyright not installed")
+
+
+def _scan(workspace, db_path, *options):
+    runner = CliRunner()
+    result = runner.invoke(
+        parser_app,
+        ["scan", str(workspace), "--db-path", str(db_path), "--enable-lsp", *options],
+    )
+    assert result.exit_code == 0, result.stdout
+    return result.stdout
+
+
+def _verified_at(db_path):
+    conn = sqlite3.connect(str(db_path))
+    rows = dict(conn.execute("SELECT name, verified_at FROM entities"))
+    conn.close()
+    return rows
+
+
+def test_lsp_pass_only_reverifies_changed_entities(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    db_path = tmp_path / "cmm.db"
+
+    output = _scan(workspace, db_path)
+    assert "0 relations verified" not in output
+    first = _verified_at(db_path)
+    assert all(first.values())
+
+    # Nothing changed: Pyright is not even started
+    output = _scan(workspace, db_path)
+    assert "all entities already verified" in output
+    assert _verified_at(db_path) == first
+
+    # Editing unrelated() re-verifies it alone
+    (workspace / "module_b.py").write_text(MODULE_B.replace("len([])", "len([1])"))
+    _scan(workspace, db_path)
+    second = _verified_at(db_path)
+    changed = {name for name in second if second[name] != first[name]}
+    assert changed == {"unrelated"}
+
+    # Changing the callee's file re-verifies its callers too
+    (workspace / "module_a.py").write_text(MODULE_A + "\n\ndef extra():\n    pass\n")
+    _scan(workspace, db_path)
+    third = _verified_at(db_path)
+    changed = {name for name in third if third.get(name) != second.get(name)}
+    assert changed == {"use_calculator", "extra"}
+
+
+def _verified_relations(db_path, is_verified=1):
+    conn = sqlite3.connect(str(db_path))
+    rows = conn.execute(
+        """
+        SELECT f.name, t.name FROM relations r
+        JOIN entities f ON r.from_id = f.id
+        JOIN entities t ON r.to_id = t.id
+        WHERE r.is_verified = ?
+    """,
+        (is_verified,),
+    ).fetchall()
+    conn.close()
+    return sorted(rows)
+
+
+def test_lsp_workers_match_single_server(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    (workspace / "module_c.py").write_text(MODULE_B.replace("use_calculator", "use_again"))
+
+    single, pooled = tmp_path / "single.db", tmp_path / "pooled.db"
+    _scan(workspace, single)
+    output = _scan(workspace, pooled, "--lsp-workers", "2")
+    assert "Starting 2 Pyright server(s)" in output
+
+    assert _verified_relations(pooled) == _verified_relations(single)
+    assert ("use_again", "add") in _verified_relations(pooled)
+    assert all(_verified_at(pooled).values())
+
+
+def test_cached_definitions_replay_without_pyright(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    db_path = tmp_path / "cmm.db"
+
+    _scan(workspace, db_path)
+    relations = _verified_relations(db_path)
+
+    # Forget verification state: every lookup is answered from the cache
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("UPDATE entities SET verified_at = NULL")
+    conn.execute("UPDATE relations SET is_verified = 0")
+    conn.commit()
+    conn.close()
+
+    output = _scan(workspace, db_path)
+    assert "Pyright not started" in output
+    assert _verified_relations(db_path) == relations
+    assert all(_verified_at(db_path).values())
+
+    # A changed callee file invalidates the entries pointing into it
+    (workspace / "module_a.py").write_text("\n" + MODULE_A)
+    output = _scan(workspace, db_path)
+    assert "Pyright ready" in output
+    assert _verified_relations(db_path) == relations
+
+
+def test_cached_definitions_replay_when_pyright_is_missing(tmp_path, monkeypatch):
+    from lsp_client import LSPClient
+
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    db_path = tmp_path / "cmm.db"
+
+    _scan(workspace, db_path)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("UPDATE entities SET verified_at = NULL")
+    conn.commit()
+    conn.close()
+    (workspace / "module_c.py").write_text(MODULE_B.replace("use_calculator", "use_again"))
+
+    monkeypatch.setattr(LSPClient, "is_available", lambda self: False)
+    output = _scan(workspace, db_path)
+    assert "Pyright not available" in output
+    assert "no LSP server: 1 file(s) left for the next run" in output
+    verified_at = _verified_at(db_path)
+    assert verified_at["use_calculator"] and not verified_at["use_again"]
+
+
+def test_call_hierarchy_strategy_matches_definitions(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+
+    per_site, hierarchy = tmp_path / "per_site.db", tmp_path / "hierarchy.db"
+    _scan(workspace, per_site)
+    _scan(workspace, hierarchy, "--lsp-strategy", "call-hierarchy")
+
+    assert ("use_calculator", "add") in _verified_relations(hierarchy)
+    assert _verified_relations(hierarchy) == _verified_relations(per_site)
+
+
+def test_triage_links_unique_names_without_pyright(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+
+    # Calculator and add are unique names, calc is no entity at all
+    db_path = tmp_path / "triage.db"
+    output = _scan(workspace, db_path, "--lsp-triage", "--triage-audit-rate", "0")
+    assert "Pyright not started" in output
+    assert "2 unique, 1 external, 0 ambiguous" in output
+    # Name matches are linked, but not as verified relations
+    shortcuts = {("use_calculator", "Calculator"), ("use_calculator", "add")}
+    assert shortcuts <= set(_verified_relations(db_path, is_verified=0))
+    assert not shortcuts & set(_verified_relations(db_path))
+
+    # Auditing every shortcut looks them up and compares
+    output = _scan(
+        workspace, tmp_path / "audit.db", "--lsp-triage", "--triage-audit-rate", "1"
+    )
+    assert "Audit: 2/2 sampled shortcut(s) match Pyright" in output
+
+
+def test_lsp_budget_defers_files_to_the_next_run(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    db_path = tmp_path / "cmm.db"
+
+    # Spent before the first lookup: module_b is left for the next run
+    # (module_a has no call sites and needs no server)
+    output = _scan(workspace, db_path, "--lsp-budget", "0.001")
+    assert "LSP budget used up: 1 file(s) left for the next run" in output
+    verified_at = _verified_at(db_path)
+    assert verified_at["add"] and not verified_at["use_calculator"]
+
+    output = _scan(workspace, db_path)
+    assert "left for the next run" not in output
+    assert ("use_calculator", "add") in _verified_relations(db_path)
+    assert all(_verified_at(db_path).values())
+
+
+def test_unanswered_lookups_leave_entities_stale(tmp_path, monkeypatch):
+    from lsp_client import NO_ANSWER, LSPClient
+
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    db_path = tmp_path / "cmm.db"
+
+    # Every lookup times out, as with a stalled or very slow server
+    monkeypatch.setattr(
+        LSPClient, "get_definitions", lambda self, positions: [NO_ANSWER] * len(positions)
+    )
+    output = _scan(workspace, db_path)
+    assert "3 call site(s) unanswered" in output
+    assert "0 lookups failed" in output
+    verified_at = _verified_at(db_path)
+    assert verified_at["add"] and verified_at["unrelated"]  # no call sites
+    assert not verified_at["use_calculator"]
+
+    monkeypatch.undo()
+    output = _scan(workspace, db_path)
+    assert "all entities already verified" not in output
+    assert ("use_calculator", "add") in _verified_relations(db_path)
+    assert all(_verified_at(db_path).values())
+
+
+def test_non_utf8_file_is_resolved(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    # The only file needing Pyright, so also the readiness probe
+    (workspace / "module_b.py").write_bytes(
+        "# café\n".encode("latin-1") + MODULE_B.encode()
+    )
+    db_path = tmp_path / "cmm.db"
+
+    output = _scan(workspace, db_path)
+    assert "failed to resolve" not in output
+    assert ("use_calculator", "add") in _verified_relations(db_path)
+    assert all(_verified_at(db_path).values())
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+
+from typer.testing import CliRunner
+from cli import parser_app
+
+
+def _scan(workspace, db_path):
+    runner = CliRunner()
+    result = runner.invoke(
+        parser_app, ["scan", str(workspace), "--db-path", str(db_path)]
+    )
+    assert result.exit_code == 0, result.stdout
+    return result.stdout
+
+
+def test_rescan_skips_unchanged_files(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("def alpha():\n    return 1\n")
+    (workspace / "b.py").write_text("def beta():\n    return 2\n")
+    db_path = tmp_path / "cmm.db"
+
+    output = _scan(workspace, db_path)
+    assert "2 file(s) scanned" in output
+    assert "skipped" not in output
+
+    output = _scan(workspace, db_path)
+    assert "0 file(s) scanned" in output
+    assert "2 unchanged file(s) skipped" in output
+
+    (workspace / "b.py").write_text("def gamma():\n    return 3\n")
+    output = _scan(workspace, db_path)
+    assert "1 file(s) scanned" in output
+    assert "1 unchanged file(s) skipped" in output
+
+    conn = sqlite3.connect(str(db_path))
+    names = {row[0] for row in conn.execute("SELECT name FROM entities")}
+    conn.close()
+    assert names == {"alpha", "gamma"}
+
+
+def test_rescan_trusts_unchanged_stat_metadata(tmp_path, monkeypatch):
+    import cli
+
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    source = workspace / "a.py"
+    source.write_text("def alpha():\n    return 1\n")
+    db_path = tmp_path / "cmm.db"
+    _scan(workspace, db_path)
+
+    hashed = []
+    real_hash = cli.compute_content_hash
+
+    def counting_hash(content):
+        hashed.append(content)
+        return real_hash(content)
+
+    monkeypatch.setattr(cli, "compute_content_hash", counting_hash)
+
+    # Unchanged stat metadata: the file is not even read
+    output = _scan(workspace, db_path)
+    assert "1 unchanged file(s) skipped" in output
+    assert hashed == []
+
+    # Touched but identical: hashed once, then trusted again
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    output = _scan(workspace, db_path)
+    assert "1 unchanged file(s) skipped" in output
+    assert len(hashed) == 1
+    _scan(workspace, db_path)
+    assert len(hashed) == 1
+
+    # --verify-hash always hashes
+    runner = CliRunner()
+    result = runner.invoke(
+        parser_app,
+        ["scan", str(workspace), "--db-path", str(db_path), "--verify-hash"],
+    )
+    assert "1 unchanged file(s) skipped" in result.stdout
+    assert len(hashed) == 2
+
+    # Changed: hashed once, and that hash is the one stored
+    source.write_text("def alpha():\n    return 2\n")
+    output = _scan(workspace, db_path)
+    assert "1 file(s) scanned" in output
+    assert len(hashed) == 3
+    conn = sqlite3.connect(str(db_path))
+    stored_hash = conn.execute("SELECT file_hash FROM files").fetchone()[0]
+    conn.close()
+    assert stored_hash == real_hash(source.read_bytes())
+
+
+def test_unknown_lsp_strategy_is_rejected_before_scanning(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("def alpha():\n    return 1\n")
+    db_path = tmp_path / "cmm.db"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        parser_app,
+        ["scan", str(workspace), "--db-path", str(db_path), "--lsp-strategy", "guess"],
+    )
+    assert result.exit_code == 1
+    assert "Unknown LSP strategy 'guess'" in result.stdout
+    assert not db_path.exists()
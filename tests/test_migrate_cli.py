@@ -0,0 +1,46 @@
+import sqlite3
+
+from typer.testing import CliRunner
+from cli import parser_app
+
+
+def _entity_names(db_path):
+    conn = sqlite3.connect(str(db_path))
+    names = {row[0] for row in conn.execute("SELECT name FROM entities")}
+    conn.close()
+    return names
+
+
+def _migrate(db_path, scan_path, *options):
+    runner = CliRunner()
+    result = runner.invoke(
+        parser_app,
+        ["migrate", "--db-path", str(db_path), "--scan-path", str(scan_path), *options],
+    )
+    assert result.exit_code == 0, result.stdout
+    return result.stdout
+
+
+def test_migrate_creates_missing_database_by_scanning(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("def alpha():\n    return 1\n")
+    db_path = tmp_path / "new.db"
+
+    output = _migrate(db_path, workspace)
+    assert "Creating new" in output
+    assert "1 file(s) scanned" in output
+    assert "Pass 2" not in output
+    assert _entity_names(db_path) == {"alpha"}
+
+
+def test_migrate_from_v02_rescans(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("def alpha():\n    return 1\n")
+    db_path = tmp_path / "old.db"
+    sqlite3.connect(str(db_path)).close()
+
+    output = _migrate(db_path, workspace, "--from", "v0.2", "--to", "v0.3")
+    assert "Migration complete" in output
+    assert _entity_names(db_path) == {"alpha"}
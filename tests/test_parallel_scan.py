@@ -0,0 +1,100 @@
+import sqlite3
+from pathlib import Path
+
+from typer.testing import CliRunner
+from cli import parser_app
+
+
+MODULE_A = """
+class Calculator:
+    '''Adds things.'''
+
+    def add(self, a, b):
+        return helper(a) + b
+
+    @staticmethod
+    def zero():
+        return 0
+
+
+def helper(x):
+    return x
+"""
+
+MODULE_B = """
+from module_a import Calculator
+
+def use_calculator():
+    calc = Calculator()
+    return calc.add(1, 2)
+"""
+
+
+def _snapshot(db_path: Path):
+    """Collect ID-independent content of a scanned database."""
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.file_path, e.name, e.type, e.visibility, e.line_start, e.line_end,
+               m.raw_docstring, m.cmm_type, m.method_kind, p.name
+        FROM entities e
+        JOIN metadata m ON e.id = m.entity_id
+        LEFT JOIN entities p ON e.parent_id = p.id
+    """)
+    entities = sorted(cursor.fetchall(), key=repr)
+    cursor.execute("""
+        SELECT e.name, r.to_name, r.rel_type
+        FROM relations r
+        JOIN entities e ON r.from_id = e.id
+    """)
+    relations = sorted(cursor.fetchall())
+    conn.close()
+    return entities, relations
+
+
+def test_parallel_scan_matches_serial_scan(tmp_path):
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "module_a.py").write_text(MODULE_A)
+    (workspace / "module_b.py").write_text(MODULE_B)
+    (workspace / "broken.py").mkdir()  # Matches the glob but cannot be read
+
+    runner = CliRunner()
+    snapshots = []
+    for workers in ("1", "2"):
+        db_path = tmp_path / f"cmm_{workers}.db"
+        result = runner.invoke(
+            parser_app,
+            ["scan", str(workspace), "--db-path", str(db_path), "--workers", workers],
+        )
+        assert result.exit_code == 0, result.stdout
+        assert "2 file(s) scanned" in result.stdout
+        assert "1 file(s) had errors" in result.stdout
+        snapshots.append(_snapshot(db_path))
+
+    serial, parallel = snapshots
+    assert serial == parallel
+    assert len(serial[0]) == 5
+
+
+def test_writes_queued_as_a_worker_exits_are_applied():
+    import queue
+    from cli import _drain_writes
+
+    applied, writes = [], queue.Queue()
+
+    class Storage:
+        def mark_verified(self, entity_ids):
+            applied.append(entity_ids)
+
+    class ExitingWorker:
+        """Already reported dead, but its last write lands while it is joined."""
+
+        def is_alive(self):
+            return False
+
+        def join(self):
+            writes.put(("mark_verified", ({1, 2},), {}))
+
+    _drain_writes(Storage(), writes, [ExitingWorker()])
+    assert applied == [{1, 2}]